@@ -0,0 +1,195 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from column_store import season_of
+from training import booster_params, MAX_BIN
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web', 'api'))
+from value_bets import EV_VALUE, STATUS_LABELS, expected_value, value_level, kelly_fraction
+
+# --- BACKTEST WALK-FORWARD (ESTRATÉGIA DE VALOR) ---
+# Para cada período (época ou mês) o modelo 1X2 é treinado só com os jogos anteriores (janela
+# a crescer) e prevê os jogos desse período. Os treinos de cada período são independentes e
+# correm em processos à parte. Depois, todos os jogos fora da amostra são avaliados de uma vez
+# (arrays, sem loop por jogo) com a mesma regra do scanner do site (value_bets.py): aposta no
+# resultado com maior EV contra as odds B365 guardadas se EV > min_ev, stake fixo ou Kelly.
+# Relatório por liga: ROI, taxa de acerto, log-loss, Brier e calibração (ECE).
+
+ODDS_COLUMNS = ['B365A', 'B365D', 'B365H']  # pela ordem das classes: 0=Away, 1=Draw, 2=Home
+RESULT_CODES = {'A': 0, 'D': 1, 'H': 2}
+BACKTEST_PARAMS = {'n_estimators': 200, 'max_depth': 3, 'learning_rate': 0.01, 'subsample': 0.8}
+
+
+def walk_forward_periods(dates, freq='season', start=None):
+    # [(rótulo, início, fim)] dos índices de teste, com as linhas ordenadas por data.
+    # freq: 'season' (época que começa em agosto) ou 'month'; start: primeiro período testado
+    dates = pd.Series(pd.to_datetime(dates)).reset_index(drop=True)
+    if freq == 'season':
+        labels = pd.Series(season_of(dates))
+    elif freq == 'month':
+        labels = dates.dt.to_period('M').astype(str)
+    else:
+        raise ValueError(f"freq desconhecida: {freq} (usar 'season' ou 'month')")
+    bounds = np.flatnonzero(labels.ne(labels.shift()).to_numpy())
+    ends = np.append(bounds[1:], len(labels))
+    periods = [(labels.iloc[b], int(b), int(e)) for b, e in zip(bounds, ends)]
+    if start is not None:
+        periods = [p for p in periods if p[0] >= start]
+    return [p for p in periods if p[1] > 0]  # o primeiro período não tem treino
+
+
+# Dados partilhados pelos processos de treino (um envio por processo, não por período)
+_shared = {}
+
+
+def _init_worker(X, y, weights, features):
+    _shared.update(X=X, y=y, weights=weights, features=features)
+
+
+def _fit_predict(task):
+    train_end, test_start, test_end, params, nthread, random_state = task
+    X, y, w = _shared['X'], _shared['y'], _shared['weights']
+    bp, rounds = booster_params(params, 'multi:softprob', nthread, random_state, MAX_BIN)
+    dtrain = xgb.QuantileDMatrix(X[:train_end], label=y[:train_end], weight=None if w is None else w[:train_end],
+                                 max_bin=MAX_BIN, feature_names=_shared['features'])
+    booster = xgb.train(bp, dtrain, rounds)
+    return booster.inplace_predict(X[test_start:test_end])
+
+
+def walk_forward_predict(df_ready, features, params=BACKTEST_PARAMS, freq='season', start=None, draw_weight=1.15,
+                         n_workers=None, random_state=42):
+    # Probabilidades fora da amostra (N x 3, NaN nos jogos do primeiro período) para df_ready
+    # ordenado por data, e os períodos usados
+    X = np.ascontiguousarray(df_ready[features].to_numpy(dtype=np.float32))
+    y = df_ready['FTR'].astype(object).map(RESULT_CODES).to_numpy(dtype=np.int32)
+    weights = np.where(y == RESULT_CODES['D'], draw_weight, 1.0) if draw_weight else None
+    periods = walk_forward_periods(df_ready['Date'], freq, start)
+
+    cpus = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers or cpus, len(periods)))
+    nthread = max(1, cpus // n_workers)
+    # Os períodos mais recentes (mais jogos de treino) primeiro, para equilibrar os processos
+    tasks = sorted(((b, b, e, params, nthread, random_state) for _, b, e in periods), key=lambda t: -t[0])
+    probs = np.full((len(X), 3), np.nan)
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(X, y, weights, list(features))) as pool:
+        for task, proba in zip(tasks, pool.map(_fit_predict, tasks)):
+            probs[task[1]:task[2]] = proba
+    return probs, periods
+
+
+def score_bets(probs, odds, y, min_ev=EV_VALUE, staking='flat', kelly_scale=0.25):
+    # Todos os jogos de uma vez: mercado escolhido (maior EV), stake, lucro e acerto
+    probs, odds = np.asarray(probs, dtype=np.float64), np.asarray(odds, dtype=np.float64)
+    valid = (odds > 1).all(axis=1) & np.isfinite(probs).all(axis=1)
+    ev = np.where(valid[:, None], expected_value(probs, np.where(odds > 1, odds, np.nan)), -np.inf)
+    pick = ev.argmax(axis=1)
+    rows = np.arange(len(pick))
+    pick_ev, pick_odd, pick_prob = ev[rows, pick], odds[rows, pick], probs[rows, pick]
+    bet = valid & (pick_ev > min_ev)
+    if staking == 'flat':
+        stake = bet.astype(np.float64)
+    elif staking == 'kelly':
+        stake = np.where(bet, kelly_scale * kelly_fraction(pick_prob, pick_odd), 0.0)
+    else:
+        raise ValueError(f"staking desconhecido: {staking} (usar 'flat' ou 'kelly')")
+    won = bet & (pick == y)
+    profit = np.where(won, stake * (pick_odd - 1), -stake)
+    return {'pick': pick, 'ev': pick_ev, 'level': np.where(valid, value_level(pick_ev), -1), 'bet': bet,
+            'stake': stake, 'won': won, 'profit': profit}
+
+
+def calibration_table(probs, y, bins=10):
+    # Fiabilidade: todas as probabilidades (3 por jogo) por intervalo vs frequência observada
+    probs = np.asarray(probs, dtype=np.float64)
+    hit = (np.arange(probs.shape[1])[None, :] == np.asarray(y)[:, None]).ravel()
+    p = probs.ravel()
+    idx = np.minimum((p * bins).astype(np.int64), bins - 1)
+    count = np.bincount(idx, minlength=bins)
+    with np.errstate(invalid='ignore'):
+        table = pd.DataFrame({'bin': [f"{i / bins:.1f}-{(i + 1) / bins:.1f}" for i in range(bins)], 'count': count,
+                              'predicted': np.bincount(idx, p, bins) / count,
+                              'observed': np.bincount(idx, hit, bins) / count})
+    return table[table['count'] > 0].reset_index(drop=True)
+
+
+def _group_metrics(groups, probs, y, bets, bins=10):
+    # Métricas por grupo com bincount (sem loop por jogo)
+    codes, labels = pd.factorize(groups, sort=True)
+    n = len(labels)
+    add = lambda values: np.bincount(codes, np.asarray(values, dtype=np.float64), n)
+    rows = np.arange(len(y))
+    p_true = np.clip(probs[rows, y], 1e-15, 1.0)
+    onehot = np.arange(3)[None, :] == y[:, None]
+    brier = ((probs - onehot) ** 2).sum(axis=1)
+
+    # ECE: |previsto - observado| por intervalo de probabilidade, pesado pelo nº de casos, por grupo
+    p = probs.ravel()
+    cell = np.repeat(codes, 3) * bins + np.minimum((p * bins).astype(np.int64), bins - 1)
+    count = np.bincount(cell, minlength=n * bins)
+    gap = np.abs(np.bincount(cell, p, n * bins) - np.bincount(cell, onehot.ravel(), n * bins))
+    ece = gap.reshape(n, bins).sum(axis=1) / np.maximum(count.reshape(n, bins).sum(axis=1), 1)
+
+    matches = np.bincount(codes, minlength=n)
+    staked, profit = add(bets['stake']), add(bets['profit'])
+    n_bets = add(bets['bet'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({
+            'matches': matches, 'bets': n_bets.astype(np.int64), 'staked': staked, 'profit': profit,
+            'roi': profit / staked, 'hit_rate': add(bets['won']) / n_bets,
+            'log_loss': add(-np.log(p_true)) / matches, 'brier': add(brier) / matches, 'ece': ece,
+        }, index=pd.Index(labels, name='group'))
+
+
+def backtest_report(frame, probs, bets, by='Div', bins=10):
+    # Por liga (ou outra coluna) + linha TOTAL
+    y = frame['FTR'].astype(object).map(RESULT_CODES).to_numpy(dtype=np.int64)
+    groups = frame[by]
+    groups = groups.array if isinstance(groups.dtype, pd.CategoricalDtype) else groups.astype(object).to_numpy()
+    per_group = _group_metrics(groups, probs, y, bets, bins)
+    total = _group_metrics(np.zeros(len(y), dtype=np.int64), probs, y, bets, bins)
+    total.index = pd.Index(['TOTAL'], name='group')
+    return pd.concat([per_group, total])
+
+
+def run_backtest(df_ready, features, params=BACKTEST_PARAMS, freq='season', start=None, min_ev=EV_VALUE,
+                 staking='flat', kelly_scale=0.25, n_workers=None, bins=10):
+    # Devolve {'bets': jogos fora da amostra com probabilidades e apostas, 'leagues': relatório por
+    # liga, 'levels': relatório por estado do scanner, 'calibration': tabela de fiabilidade, ...}
+    t0 = time.perf_counter()
+    frame = df_ready.sort_values('Date', kind='stable').reset_index(drop=True)
+    probs, periods = walk_forward_predict(frame, features, params, freq, start, n_workers=n_workers)
+    t_train = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    tested = np.isfinite(probs).all(axis=1) & frame['FTR'].astype(object).isin(list(RESULT_CODES)).to_numpy()
+    frame, probs = frame[tested].reset_index(drop=True), probs[tested]
+    odds = frame[ODDS_COLUMNS].to_numpy(dtype=np.float64) if set(ODDS_COLUMNS) <= set(frame.columns) \
+        else np.full((len(frame), 3), np.nan)
+    y = frame['FTR'].astype(object).map(RESULT_CODES).to_numpy(dtype=np.int64)
+    bets = score_bets(probs, odds, y, min_ev, staking, kelly_scale)
+    leagues = backtest_report(frame, probs, bets, 'Div', bins)
+    labels = ('sem odds',) + STATUS_LABELS
+    status = pd.Categorical.from_codes(bets['level'] + 1, labels)  # pela ordem do scanner
+    levels = backtest_report(frame.assign(Status=status), probs, bets, 'Status', bins)
+
+    out = frame[['Date', 'Div', 'HomeTeam', 'AwayTeam', 'FTR']].copy()
+    out[['P_Away', 'P_Draw', 'P_Home']] = probs
+    out['Pick'] = np.array(['A', 'D', 'H'])[bets['pick']]
+    for col in ('ev', 'bet', 'stake', 'won', 'profit'):
+        out[col.capitalize()] = bets[col]
+    return {'bets': out, 'leagues': leagues, 'levels': levels, 'calibration': calibration_table(probs, y, bins),
+            'periods': [p[0] for p in periods], 'train_seconds': t_train,
+            'score_seconds': time.perf_counter() - t1, 'seconds': time.perf_counter() - t0}
+
+
+def print_backtest(result):
+    total = result['leagues'].loc['TOTAL']
+    print(f"📊 Backtest walk-forward: {len(result['periods'])} períodos ({result['periods'][0]} a {result['periods'][-1]}), "
+          f"{int(total['matches'])} jogos fora da amostra, {int(total['bets'])} apostas | ROI {total['roi']:+.1%} | "
+          f"acerto {total['hit_rate']:.1%} | log-loss {total['log_loss']:.4f} | ECE {total['ece']:.3f} "
+          f"({result['seconds']:.0f}s: treinos {result['train_seconds']:.0f}s, avaliação {result['score_seconds'] * 1000:.0f}ms)")
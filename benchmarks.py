@@ -0,0 +1,1467 @@
+# --- BENCHMARKS (ANTES vs DEPOIS) ---
+# Uso: python benchmarks.py [nome ...]   (sem argumentos corre todos)
+# Usa o europe_football_full.csv se existir; caso contrário gera uma época sintética
+# com o mesmo formato (ligas de 20 equipas, ida e volta, várias jornadas por dia).
+import os
+import sys
+import time
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+
+from data_utils import DATA_FILE, compute_standings, EloEngine
+from rolling_features import STAT_PAIRS, attach_rolling_features
+from team_names import TEAM_ALIASES
+
+
+def timeit(fn, *args, repeat=1, **kwargs):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args, **kwargs)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, result
+
+
+def synthetic_matches(seasons=range(2014, 2025), divisions=('E0', 'E1', 'D1', 'SP1', 'F1', 'I1', 'P1', 'N1'), seed=42,
+                      calendar='round_robin'):
+    # calendar='round_robin' (por omissão): cada equipa joga uma vez por jornada e a Champions tem
+    #   jornadas próprias, logo (Date, Team) é único. As referências legacy_* juntam por Date/Team
+    #   (merge das médias móveis), e no calendário aleatório ~11% dos pares (Date, Team) repetem-se
+    #   (uma equipa joga 2x no mesmo dia), o que duplica linhas e torna a comparação falsa.
+    # calendar='random': todos os pares baralhados por jornada, sem esse cuidado; dá os mesmos dados
+    #   que o gerador tinha antes do calendário de ida e volta (números antigos comparáveis).
+    rng = np.random.default_rng(seed)
+    rows = []
+    for season in seasons:
+        for div in divisions:
+            start = pd.Timestamp(f"{season}-08-10")
+            if calendar == 'random':
+                teams = [f"{div}_Team_{i}" for i in range(20)]
+                fixtures = [(h, a) for h in teams for a in teams if h != a]
+                rng.shuffle(fixtures)
+                for k, (h, a) in enumerate(fixtures):
+                    rows.append((start + pd.Timedelta(days=7 * (k // 10) + k % 3), div, h, a))
+                continue
+            # Calendário de ida e volta pelo método do círculo (cada equipa joga 1x por jornada)
+            teams = list(rng.permutation([f"{div}_Team_{i}" for i in range(20)]))
+            for r in range(38):
+                rot = [teams[0]] + teams[1:][r % 19:] + teams[1:][:r % 19]
+                for j in range(10):
+                    h, a = rot[j], rot[19 - j]
+                    if r >= 19: h, a = a, h
+                    rows.append((start + pd.Timedelta(days=7 * r + j % 3), div, h, a))
+        if calendar == 'random':
+            # Champions: as 4 primeiras de cada liga, sem calendário fixo
+            cl_teams = [f"{div}_Team_{i}" for div in divisions for i in range(4)]
+            for k in range(96):
+                h, a = rng.choice(cl_teams, 2, replace=False)
+                rows.append((pd.Timestamp(f"{season}-09-15") + pd.Timedelta(days=7 * (k // 16) + 1), 'CL', h, a))
+            continue
+        # Champions: as 4 primeiras de cada liga, 6 jornadas a meio da semana
+        cl_teams = np.array([f"{div}_Team_{i}" for div in divisions for i in range(4)])
+        for r in range(6):
+            pairs = rng.permutation(cl_teams).reshape(-1, 2)
+            for h, a in pairs:
+                rows.append((start + pd.Timedelta(days=35 + 7 * r + 4), 'CL', h, a))
+    df = pd.DataFrame(rows, columns=['Date', 'Div', 'HomeTeam', 'AwayTeam'])
+    n = len(df)
+    df['FTHG'] = rng.poisson(1.5, n); df['FTAG'] = rng.poisson(1.1, n)
+    df['FTR'] = np.where(df['FTHG'] > df['FTAG'], 'H', np.where(df['FTHG'] < df['FTAG'], 'A', 'D'))
+    df['HTHG'] = rng.binomial(df['FTHG'], 0.45); df['HTAG'] = rng.binomial(df['FTAG'], 0.45)
+    for h, a, lam in [('HS', 'AS', 12), ('HST', 'AST', 4.5), ('HC', 'AC', 5), ('HF', 'AF', 11), ('HY', 'AY', 1.8), ('HR', 'AR', 0.07)]:
+        df[h] = rng.poisson(lam, n); df[a] = rng.poisson(lam * 0.9, n)
+    df['Home_xG'] = rng.gamma(3, 0.5, n); df['Away_xG'] = rng.gamma(3, 0.4, n)
+    df['B365H'] = rng.uniform(1.3, 6, n).round(2); df['B365D'] = rng.uniform(2.8, 4.5, n).round(2); df['B365A'] = rng.uniform(1.3, 8, n).round(2)
+    return df.sort_values('Date').reset_index(drop=True)
+
+
+def load_matches():
+    if os.path.exists(DATA_FILE):
+        df = pd.read_csv(DATA_FILE, low_memory=False)
+        df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce')
+        df = df.dropna(subset=['Date', 'FTR'])
+    else:
+        print(f"⚠️ {DATA_FILE} não encontrado: a usar dados sintéticos.")
+        df = synthetic_matches()
+    df = df.sort_values('Date').reset_index(drop=True)
+    df['Season'] = np.where(df['Date'].dt.month > 7, df['Date'].dt.year, df['Date'].dt.year - 1)
+    return df
+
+
+# --- REFERÊNCIAS (IMPLEMENTAÇÕES ORIGINAIS DO NOTEBOOK) ---
+def legacy_standings(df):
+    df = df.copy()
+    standings = {}
+    df['Home_Pts'] = 0; df['Away_Pts'] = 0
+    df['Home_Pos'] = 10; df['Away_Pos'] = 10
+    for i, row in df.iterrows():
+        season = row['Season']; div = row['Div']
+        h, a, res = row['HomeTeam'], row['AwayTeam'], row['FTR']
+        if season not in standings: standings[season] = {}
+        if div not in standings[season]: standings[season][div] = {}
+        if h not in standings[season][div]: standings[season][div][h] = {'pts': 0, 'games': 0}
+        if a not in standings[season][div]: standings[season][div][a] = {'pts': 0, 'games': 0}
+        df.at[i, 'Home_Pts'] = standings[season][div][h]['pts']
+        df.at[i, 'Away_Pts'] = standings[season][div][a]['pts']
+        if div != 'CL':
+            teams_sorted = sorted(standings[season][div].items(), key=lambda x: x[1]['pts'], reverse=True)
+            ranks = {t: r+1 for r, (t, data) in enumerate(teams_sorted)}
+            df.at[i, 'Home_Pos'] = ranks.get(h, 10)
+            df.at[i, 'Away_Pos'] = ranks.get(a, 10)
+        else:
+            df.at[i, 'Home_Pos'] = 1
+            df.at[i, 'Away_Pos'] = 1
+        pts_h = 3 if res == 'H' else 1 if res == 'D' else 0
+        pts_a = 3 if res == 'A' else 1 if res == 'D' else 0
+        standings[season][div][h]['pts'] += pts_h
+        standings[season][div][a]['pts'] += pts_a
+        standings[season][div][h]['games'] += 1
+        standings[season][div][a]['games'] += 1
+    return df[['Home_Pts', 'Away_Pts', 'Home_Pos', 'Away_Pos']]
+
+
+def legacy_elo(df):
+    df = df.copy()
+    df['HomeElo'] = 1500.0; df['AwayElo'] = 1500.0
+    elo_dict = {}
+    for i, row in df.iterrows():
+        h, a, res = row['HomeTeam'], row['AwayTeam'], row['FTR']
+        h_elo = elo_dict.get(h, 1500); a_elo = elo_dict.get(a, 1500)
+        df.at[i, 'HomeElo'] = h_elo; df.at[i, 'AwayElo'] = a_elo
+        actual = 1 if res == 'H' else 0.5 if res == 'D' else 0
+        exp = 1 / (1 + 10**((a_elo - h_elo)/400))
+        elo_dict[h] = h_elo + 20 * (actual - exp)
+        elo_dict[a] = a_elo - 20 * (actual - exp)
+    return df[['HomeElo', 'AwayElo']], elo_dict
+
+
+def legacy_rolling(df):
+    long_stats = []
+    for _, row in df.iterrows():
+        rec_h = {'Date': row['Date'], 'Team': row['HomeTeam']}
+        rec_a = {'Date': row['Date'], 'Team': row['AwayTeam']}
+        for col_h, col_a, name in STAT_PAIRS:
+            if col_h in df.columns and col_a in df.columns:
+                rec_h[name] = row[col_h]
+                rec_a[name] = row[col_a]
+        res = row['FTR']
+        rec_h['Points'] = 3 if res == 'H' else (1 if res == 'D' else 0)
+        rec_a['Points'] = 3 if res == 'A' else (1 if res == 'D' else 0)
+        long_stats.append(rec_h)
+        long_stats.append(rec_a)
+    df_long = pd.DataFrame(long_stats).sort_values(['Team', 'Date'])
+    cols_to_roll = [c for c in df_long.columns if c not in ['Date', 'Team']]
+    for col in cols_to_roll:
+        df_long[f'Avg_{col}_5'] = df_long.groupby('Team')[col].transform(lambda x: x.shift(1).rolling(5, min_periods=3).mean()).fillna(0)
+    if 'Shots' in cols_to_roll and 'Shots_Target' in cols_to_roll:
+         df_long['Avg_Accuracy_5'] = np.where(df_long['Avg_Shots_5']>0, df_long['Avg_Shots_Target_5']/df_long['Avg_Shots_5'], 0)
+    if 'Goals_Scored' in cols_to_roll and 'Shots_Target' in cols_to_roll:
+         df_long['Avg_Conversion_5'] = np.where(df_long['Avg_Shots_Target_5']>0, df_long['Avg_Goals_Scored_5']/df_long['Avg_Shots_Target_5'], 0)
+    cols_calculated = ['Date', 'Team'] + [c for c in df_long.columns if 'Avg_' in c]
+    df = df.merge(df_long[cols_calculated], left_on=['Date', 'HomeTeam'], right_on=['Date', 'Team'], how='left').drop(columns=['Team'])
+    df.rename(columns={c: f"Home_{c}" for c in cols_calculated if c not in ['Date', 'Team']}, inplace=True)
+    df = df.merge(df_long[cols_calculated], left_on=['Date', 'AwayTeam'], right_on=['Date', 'Team'], how='left').drop(columns=['Team'])
+    df.rename(columns={c: f"Away_{c}" for c in cols_calculated if c not in ['Date', 'Team']}, inplace=True)
+    return df
+
+
+def legacy_clean_team_name(name):
+    # O clean_team_name original reconstruía o dict (~200 entradas) em cada chamada
+    name_map = dict(TEAM_ALIASES)
+    return name_map.get(name, name)
+
+
+# --- BENCHMARKS ---
+def bench_standings(df):
+    cols = ['Home_Pts', 'Away_Pts', 'Home_Pos', 'Away_Pos']
+    t_old, old = timeit(legacy_standings, df)
+    t_new, new = timeit(compute_standings, df, repeat=3)
+    identical = old[cols].equals(new[cols])
+    print(f"📊 Standings ({len(df)} jogos): loop {t_old:.2f}s | vetorizado {t_new:.3f}s | "
+          f"{t_old / t_new:.0f}x | colunas idênticas: {identical}")
+    return identical
+
+
+def bench_elo(df):
+    t_old, (old, old_dict) = timeit(legacy_elo, df)
+    engine = EloEngine()
+    t_fit, new = timeit(engine.fit, df, repeat=3)
+    same_fit = np.allclose(old.to_numpy(), new.loc[old.index].to_numpy()) and np.allclose(
+        [old_dict[t] for t in engine.teams], engine.ratings)
+
+    # Atualização incremental: estado até à última semana, gravado e recarregado
+    cutoff = df['Date'].max() - pd.Timedelta(days=7)
+    partial = EloEngine()
+    partial.fit(df[df['Date'] <= cutoff])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'elo_state.npz')
+        partial.save(path)
+        size = os.path.getsize(path)
+        reloaded = EloEngine.load(path)
+    new_rows = int((df['Date'] > cutoff).sum())
+    t_upd, _ = timeit(reloaded.update, df)  # recebe tudo, aplica só o que é novo
+    same_update = np.allclose(reloaded.ratings, engine.ratings)
+    print(f"📊 Elo ({len(df)} jogos): loop {t_old:.2f}s | fit {t_fit:.3f}s | "
+          f"update ({new_rows} novos) {t_upd * 1000:.1f}ms | estado {size / 1024:.1f} KB | "
+          f"fit idêntico: {same_fit} | update == replay: {same_update}")
+    return same_fit and same_update
+
+
+def bench_rolling(df):
+    t_old, old = timeit(legacy_rolling, df)
+    t_new, new = timeit(attach_rolling_features, df, repeat=3)
+    t_multi, multi = timeit(attach_rolling_features, df, windows=(5, 10, 'season'), repeat=3)
+    cols = [c for c in old.columns if 'Avg_' in c]
+    same_cols = list(old.columns) == list(new.columns)
+    max_diff = float(np.abs(old[cols].to_numpy() - new[cols].to_numpy()).max())
+    print(f"📊 Rolling ({len(df)} jogos, {len(cols)} colunas): iterrows+lambda {t_old:.2f}s | "
+          f"kernel {t_new:.3f}s ({t_old / t_new:.0f}x) | janelas 5/10/época {t_multi:.3f}s | "
+          f"mesmas colunas: {same_cols} | dif. máx {max_diff:.1e}")
+    return same_cols and max_diff < 1e-9
+
+
+@contextlib.contextmanager
+def prediction_memo_off(api):
+    # Mede o caminho completo (features + modelos), sem o memo de previsões à frente
+    from prediction_memo import PredictionMemo
+    memo, api.prediction_memo = api.prediction_memo, PredictionMemo(maxsize=0)
+    try: yield
+    finally: api.prediction_memo = memo
+
+
+def bench_predict(df, n=200):
+    # Latência do /api/predict com o football_brain.pkl real (web/api já está no sys.path via data_utils)
+    import index as api
+    hist, feats = api.models.history_frame(), api.models.features
+    index = api.get_feature_index()
+    fixture = {'home_team': 'Arsenal', 'away_team': 'Chelsea', 'division': 'E0', 'date': '2025-12-20',
+               'odd_h': 2.1, 'odd_d': 3.4, 'odd_a': 3.6, 'odd_1x': 1.3, 'odd_12': 1.3, 'odd_x2': 1.7}
+
+    def legacy_features():
+        # Caminho antigo: filtrar o histórico por equipa + médias por feature + DataFrame de 1 linha
+        input_data = {}
+        for team in (fixture['home_team'], fixture['away_team']):
+            games = hist[(hist['HomeTeam'] == team) | (hist['AwayTeam'] == team)]
+            stats = games.iloc[-1].to_dict() if not games.empty else {}
+            for f in feats:
+                input_data.setdefault(f, stats[f] if f in stats else (hist[f].mean() if f in hist else 0))
+        input_data['Div_Code'] = api.models.divisions.index(fixture['division'])
+        return pd.DataFrame([input_data])[feats]
+
+    def models(X):
+        api.models.model('model_goals_h').predict(X); api.models.model('model_goals_a').predict(X)
+        api.models.model('model_multi').predict_proba(X); api.models.model('model_shield').predict_proba(X)
+
+    t_old_feat, X_old = timeit(lambda: [legacy_features() for _ in range(n)][-1])
+    t_new_feat, X_new = timeit(lambda: [index.build_row(fixture['home_team'], fixture['away_team'], div='E0') for _ in range(n)][-1])
+    t_old_model, _ = timeit(lambda: [models(X_old) for _ in range(n)])
+    t_new_model, _ = timeit(lambda: [models(X_new) for _ in range(n)])
+    client = api.app.test_client()
+    with prediction_memo_off(api):
+        client.post('/api/predict', json=fixture)
+        t_endpoint, _ = timeit(lambda: [client.post('/api/predict', json=fixture) for _ in range(n)])
+    ms = lambda t: t / n * 1000
+    print(f"📊 Predict ({len(hist)} linhas de histórico): features {ms(t_old_feat):.2f}ms -> {ms(t_new_feat):.3f}ms | "
+          f"4 modelos DataFrame {ms(t_old_model):.2f}ms -> ndarray {ms(t_new_model):.2f}ms | "
+          f"/api/predict completo {ms(t_endpoint):.2f}ms")
+    return True
+
+
+def bench_batch(df, n_matches=40, repeat=20):
+    # Um sábado de 40 jogos: 40 pedidos /api/predict vs 1 pedido /api/predict/batch
+    import index as api
+    client = api.app.test_client()
+    teams = list(api.get_feature_index().teams)[:2 * n_matches]
+    fixtures = [{'home_team': teams[2 * i], 'away_team': teams[2 * i + 1], 'division': 'E0',
+                 'odd_h': 2.1, 'odd_d': 3.4, 'odd_a': 3.6} for i in range(n_matches)]
+    with prediction_memo_off(api):
+        client.post('/api/predict/batch', json=fixtures)
+        t_single, _ = timeit(lambda: [client.post('/api/predict', json=f) for f in fixtures], repeat=repeat)
+        t_batch, _ = timeit(lambda: client.post('/api/predict/batch', json=fixtures), repeat=repeat)
+        t_one, _ = timeit(lambda: client.post('/api/predict', json=fixtures[0]), repeat=repeat)
+    print(f"📊 Batch ({n_matches} jogos): {n_matches}x /api/predict {t_single * 1000:.1f}ms | "
+          f"/api/predict/batch {t_batch * 1000:.1f}ms | 1 jogo {t_one * 1000:.1f}ms")
+    return True
+
+
+def odds_stub_server(delay=0.3, slow=(), errors=(), slow_delay=2.0, games=None):
+    # Stub local da The Odds API: latência fixa, ligas lentas e ligas com erro 500
+    # (games: {sport_key: [jogos]} a servir; lido em cada pedido, dá para mexer nas odds)
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        calls = []
+
+        def do_GET(self):
+            key = self.path.split('/sports/')[1].split('/')[0]
+            Handler.calls.append(key)
+            time.sleep(slow_delay if key in slow else delay)
+            if key in errors:
+                self.send_response(500); self.end_headers(); return
+            body = json.dumps(games.get(key, []) if games is not None else [
+                {'id': f'{key}_1', 'sport_title': key, 'commence_time': '2025-12-20T15:00:00Z',
+                 'home_team': 'A', 'away_team': 'B', 'bookmakers': []}]).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('x-requests-remaining', '400'); self.send_header('x-requests-used', '100')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, Handler.calls
+
+
+def bench_odds(df):
+    import io
+    import requests
+    import index as api
+    from odds_client import OddsClient
+
+    keys = api.SUPPORTED_LEAGUES
+    server, calls = odds_stub_server(slow=keys[:1], errors=keys[1:2])
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    def legacy():
+        out = {}
+        for key in keys:
+            res = requests.get(f"{base}/sports/{key}/odds", params={'apiKey': 'x'})
+            out[key] = res.json() if res.status_code == 200 else []
+        return out
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t_old, _ = timeit(legacy)
+        cache = {}
+        client = OddsClient('x', cache, ttl=60, base_url=base, max_workers=6, timeout=(1, 1))
+        t_cold, cold = timeit(client.get_leagues, keys)
+        for entry in cache.values():
+            entry['ts'] -= 3600  # tudo expirado
+        t_stale, stale = timeit(client.get_leagues, keys)
+        time.sleep(1.5)  # deixar a revalidação em segundo plano terminar
+    ok = sum(1 for v in cold.values() if v)
+    print(f"📊 Odds ({len(keys)} ligas, 0.3s/pedido, 1 lenta, 1 erro 500): sequencial {t_old:.2f}s | "
+          f"paralelo a frio {t_cold:.2f}s ({ok} ligas ok) | expirado c/ stale-while-revalidate "
+          f"{t_stale * 1000:.1f}ms ({len(stale)} ligas servidas) | pedidos ao stub {len(calls)}")
+    server.shutdown()
+    return ok == len(keys) - 2
+
+
+def bench_fixtures(df, games_per_league=300, n=200):
+    # /api/fixtures e /api/odds: varrer a api_cache em cada pedido vs índice por id/data
+    import index as api
+    from fixture_store import FixtureStore
+    rng = np.random.default_rng(0)
+    cache = {}
+    for key in api.SUPPORTED_LEAGUES:
+        games = []
+        for i in range(games_per_league):
+            ts = pd.Timestamp('2025-08-01') + pd.Timedelta(hours=int(rng.integers(0, 24 * 300)))
+            books = [{'title': t, 'markets': [{'key': 'h2h', 'outcomes': [
+                {'name': f'H{i}', 'price': 2.0}, {'name': f'A{i}', 'price': 3.5}, {'name': 'Draw', 'price': 3.2}]}]}
+                for t in ('Unibet', 'Betclic', 'Pinnacle')]
+            games.append({'id': f'{key}_{i}', 'sport_title': key, 'commence_time': ts.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                          'home_team': f'H{i}', 'away_team': f'A{i}', 'bookmakers': books})
+        cache[key] = {'data': games, 'ts': 1.0}
+    day = cache[api.SUPPORTED_LEAGUES[0]]['data'][0]['commence_time'][:10]
+    last_id = f'{api.SUPPORTED_LEAGUES[-1]}_{games_per_league - 1}'
+
+    def legacy_fixtures():
+        rows = [api.build_fixture_row(k, g) for k in api.SUPPORTED_LEAGUES for g in cache[k]['data']
+                if g['commence_time'].split('T')[0] == day]
+        return sorted(rows, key=lambda x: x['match_time'])
+
+    def legacy_odds():
+        for k in cache:
+            for g in cache[k]['data']:
+                if g['id'] == last_id: return g
+
+    store = FixtureStore(api.SUPPORTED_LEAGUES, api.build_fixture_row)
+    t_build, _ = timeit(lambda: [store.update_league(k, e['data'], e['ts']) for k, e in cache.items()])
+    same = legacy_fixtures() == store.fixtures_on(day)
+    t_old_fx, _ = timeit(lambda: [legacy_fixtures() for _ in range(n)])
+    t_new_fx, _ = timeit(lambda: [store.fixtures_on(day) for _ in range(n)])
+    t_old_odds, _ = timeit(lambda: [legacy_odds() for _ in range(n)])
+    t_new_odds, _ = timeit(lambda: [store.get(last_id) for _ in range(n)])
+    us = lambda t: t / n * 1e6
+    print(f"📊 Fixtures ({len(cache) * games_per_league} jogos em cache): indexar {t_build * 1000:.1f}ms (1x por atualização) | "
+          f"jogos do dia {us(t_old_fx):.0f}µs -> {us(t_new_fx):.2f}µs | odds por id {us(t_old_odds):.0f}µs -> "
+          f"{us(t_new_odds):.2f}µs | mesmas linhas: {same}")
+    return same
+
+
+def _shared_cache_worker(base, db, keys, barrier, out):
+    import io
+    from cache_backend import TieredCache, SQLiteCache
+    from odds_client import OddsClient
+    cache = TieredCache(60, shared=SQLiteCache(db))
+    client = OddsClient('x', cache, ttl=60, base_url=base, timeout=(1, 5))
+    barrier.wait()
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        leagues = client.get_leagues(keys)
+        out.put((time.perf_counter() - t0, sum(1 for v in leagues.values() if v), client.stats['upstream_calls'], cache.snapshot_stats()))
+
+
+def bench_shared_cache(df, workers=4):
+    # N processos (como os workers do gunicorn) a arrancar ao mesmo tempo com a cache vazia
+    import multiprocessing as mp
+    import index as api
+    keys = api.SUPPORTED_LEAGUES
+    server, calls = odds_stub_server(delay=0.3)
+    base = f"http://127.0.0.1:{server.server_port}"
+    ctx = mp.get_context('fork')
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'cache.sqlite3')
+        barrier, out = ctx.Barrier(workers), ctx.Queue()
+        procs = [ctx.Process(target=_shared_cache_worker, args=(base, db, keys, barrier, out)) for _ in range(workers)]
+        for p in procs: p.start()
+        results = [out.get(timeout=60) for _ in procs]
+        for p in procs: p.join()
+    served = [r[1] for r in results]
+    lock_waits = sum(r[3]['lock_waits'] for r in results)
+    print(f"📊 Cache partilhada ({workers} workers, {len(keys)} ligas): pedidos à API {len(calls)} "
+          f"(sem partilha seriam {workers * len(keys)}) | ligas servidas por worker {served} | "
+          f"esperas por lock {lock_waits} | tempo máx {max(r[0] for r in results):.2f}s")
+    server.shutdown()
+    return len(calls) == len(keys)
+
+
+def legacy_score_matrix(exp_h, exp_a, max_goals=6):
+    # Loop antigo do predict(): 72 chamadas a poisson.pmf + BTTS à parte
+    from scipy.stats import poisson
+    score_matrix = np.zeros((max_goals, max_goals))
+    for h in range(max_goals):
+        for a in range(max_goals):
+            score_matrix[h, a] = poisson.pmf(h, exp_h) * poisson.pmf(a, exp_a)
+    prob_btts = (1 - poisson.pmf(0, exp_h)) * (1 - poisson.pmf(0, exp_a))
+    return score_matrix, prob_btts
+
+
+def bench_score_grid(df, n=200, batch=1000):
+    from score_grid import score_grid, derive_markets
+    rng = np.random.default_rng(0)
+    lam_h, lam_a = rng.uniform(0.3, 3.0, batch), rng.uniform(0.3, 3.0, batch)
+
+    def vectorized(lh, la):
+        grid = score_grid(lh, la)
+        return grid, derive_markets(grid)
+
+    t_old, (old_grid, old_btts) = timeit(lambda: [legacy_score_matrix(lam_h[i], lam_a[i]) for i in range(n)][-1])
+    t_one, (grid, markets) = timeit(lambda: [vectorized(lam_h[i:i + 1], lam_a[i:i + 1]) for i in range(n)][-1], repeat=3)
+    t_batch, (grids, _) = timeit(vectorized, lam_h, lam_a, repeat=3)
+    diff = max(np.abs(grid[0, :6, :6] - old_grid).max(), abs(markets['btts'][0] - old_btts))
+    us = lambda t, k: t / k * 1e6
+    print(f"📊 Matriz de resultados + mercados: loop scipy {us(t_old, n):.0f}µs/jogo (só 6x6 + BTTS) | "
+          f"vetorizado 1 jogo {us(t_one, n):.0f}µs | lote de {batch} {us(t_batch, batch):.1f}µs/jogo "
+          f"(1X2, O/U, BTTS, AH, placar) | dif. máx {diff:.1e}")
+    return diff < 1e-12
+
+
+def football_data_stub_server(files, delay=0.05, errors=()):
+    # Stub local do football-data.co.uk: /mmz4281/<época>/<div>.csv com ETag / Last-Modified
+    # (304 se o cliente já tiver a versão atual), 404 para partições que não existem e 500 nas de errors
+    import hashlib
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        calls = []
+
+        def do_GET(self):
+            key = self.path.split('/mmz4281/')[1].rsplit('.csv', 1)[0]
+            time.sleep(delay)
+            body = files.get(key)
+            if key in errors: status = 500
+            elif body is None: status = 404
+            else:
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                status = 304 if self.headers.get('If-None-Match') == etag else 200
+            Handler.calls.append((key, status))
+            self.send_response(status)
+            if status in (200, 304):
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', 'Mon, 06 Oct 2025 08:00:00 GMT')
+            if status == 200:
+                self.send_header('Content-Type', 'text/csv')
+                self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if status == 200: self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, Handler.calls
+
+
+def bench_football_data(df, seasons=11, delay=0.05):
+    # Download inicial, atualização semanal (só a época atual, pedidos condicionais) e uma
+    # partição da época atual alterada, contra um stub com latência fixa por pedido.
+    import io
+    from football_data import FD_DIVISIONS, season_code, sync_partitions, load_partitions
+    today = pd.Timestamp.today()
+    current = today.year if today.month >= 7 else today.year - 1
+    first = current - seasons + 1
+
+    # Épocas sintéticas deslocadas para terminar na época atual
+    games = synthetic_matches(seasons=range(first, current + 1))
+    games = games[games['Div'] != 'CL']
+    games['Season'] = np.where(games['Date'].dt.month > 7, games['Date'].dt.year, games['Date'].dt.year - 1)
+    files = {}
+    for (season, div), g in games.groupby(['Season', 'Div']):
+        out = g.drop(columns='Season').assign(Date=g['Date'].dt.strftime('%d/%m/%Y'))
+        files[f"{season_code(season)}/{div}"] = out[['Div'] + [c for c in out.columns if c != 'Div']].to_csv(index=False).encode()
+    partitions = seasons * len(FD_DIVISIONS)
+
+    server, calls = football_data_stub_server(files, delay=delay, errors={f"{season_code(current - 3)}/E0"})
+    base = f"http://127.0.0.1:{server.server_port}/mmz4281"
+
+    def legacy():
+        # Loop original: um pd.read_csv(url) de cada vez (sem o time.sleep(0.5) entre pedidos)
+        dfs = []
+        for year in range(first, current + 1):
+            for div in FD_DIVISIONS:
+                try: dfs.append(pd.read_csv(f"{base}/{season_code(year)}/{div}.csv"))
+                except: pass
+        return len(dfs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sync = lambda: sync_partitions(first, current, cache_dir=tmp, base_url=base, max_workers=8)
+        t_legacy, _ = timeit(legacy)
+        del calls[:]
+        t_cold, cold = timeit(sync)
+        n_cold = len(calls); del calls[:]
+        t_week, week = timeit(sync)
+        n_week = len(calls); del calls[:]
+        key = f"{season_code(current)}/E0"
+        files[key] = files[key] + files[key].split(b'\n', 1)[1]  # nova jornada na época atual
+        t_changed, changed = timeit(sync)
+        n_changed = len(calls)
+        loaded = load_partitions(first, current, cache_dir=tmp)
+    server.shutdown()
+
+    print(f"📊 Football-Data ({partitions} partições, {delay * 1000:.0f}ms/pedido): sequencial {t_legacy:.2f}s "
+          f"(+{partitions * 0.5:.0f}s de sleep) -> paralelo {t_cold:.2f}s ({n_cold} pedidos, falhadas: {sorted(cold['failed'])}) | "
+          f"semanal {t_week:.2f}s com {n_week} pedidos ({len(week['not_modified'])} x 304, {len(week['downloaded'])} novas) | "
+          f"1 ficheiro alterado: {n_changed} pedidos, {len(changed['downloaded'])} descarregado")
+    # Tudo o que o stub serve (com a partição alterada) exceto a que falha
+    expected = sum(body.count(b'\n') - 1 for k, body in files.items() if k not in cold['failed'])
+    return changed['downloaded'] == [key] and not week['downloaded'] and len(loaded) == expected
+
+
+def understat_html(games, league):
+    # Página no formato do Understat: datesData = JSON.parse('\\x5B\\x7B...') com tudo hex-escapado
+    import json
+    data = [{'id': str(i), 'isResult': True, 'datetime': f"{d:%Y-%m-%d} 20:00:00",
+             'h': {'id': '1', 'title': h, 'short_title': h[:3]}, 'a': {'id': '2', 'title': a, 'short_title': a[:3]},
+             'goals': {'h': str(fh), 'a': str(fa)}, 'xG': {'h': f"{xh:.5f}", 'a': f"{xa:.5f}"},
+             'forecast': {'w': '0.5', 'd': '0.3', 'l': '0.2'}}
+            for i, (d, h, a, fh, fa, xh, xa) in enumerate(games[['Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'Home_xG', 'Away_xG']].itertuples(index=False))]
+    escape = lambda text: ''.join(c if c.isalnum() or c == ' ' else f"\\x{ord(c):02X}" for c in text)
+    teams = json.dumps({'1': {'id': '1', 'title': league, 'history': []}})
+    return (f"<html><head><title>{league}</title></head><body><script>\n"
+            f"var teamsData = JSON.parse('{escape(teams)}');\n"
+            f"var datesData = JSON.parse('{escape(json.dumps(data))}');\n"
+            f"</script></body></html>")
+
+
+def understat_stub_server(pages, delay=0.2, errors=()):
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        calls = []
+
+        def do_GET(self):
+            key = self.path.split('/league/')[1]
+            Handler.calls.append(key)
+            time.sleep(delay)
+            body = pages.get(key)
+            if key in errors or body is None:
+                self.send_response(500 if key in errors else 404); self.end_headers(); return
+            body = body.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, Handler.calls
+
+
+def bench_understat(df, seasons=11, delay=0.2):
+    import io
+    import requests
+    from football_data import season_code
+    from understat import UNDERSTAT_LEAGUES, UnderstatScraper, extract_matches_json, matches_to_frame, load_understat
+    today = pd.Timestamp.today()
+    current = today.year if today.month >= 8 else today.year - 1
+    first = current - seasons + 1
+
+    # Uma página por liga/época (jogos sintéticos de uma divisão de 20 equipas)
+    games = synthetic_matches(seasons=range(2014, 2015), divisions=('E0',))
+    games = games[games['Div'] == 'E0']
+    pages = {f"{league}/{year}": understat_html(games, league) for year in range(first, current + 1) for league in UNDERSTAT_LEAGUES}
+
+    # 1. Extração (regex JSON.parse + unicode_escape + json.loads) sobre as páginas guardadas
+    sample = list(pages.values())[:20]
+    t_extract, data = timeit(lambda: [extract_matches_json(html) for html in sample][-1], repeat=3)
+    t_frame, frame = timeit(matches_to_frame, data, 'EPL', repeat=3)
+
+    # 2. Scraper contra um stub: 1ª corrida interrompida (erros), 2ª retoma, 3ª semana seguinte
+    broken = {f"{league}/{first + 2}" for league in UNDERSTAT_LEAGUES[:3]}
+    server, calls = understat_stub_server(pages, delay=delay, errors=broken)
+    base = f"http://127.0.0.1:{server.server_port}/league"
+    n = len(pages)
+    with tempfile.TemporaryDirectory() as tmp:
+        def run(**kwargs):
+            scraper = UnderstatScraper(cache_dir=tmp, session=requests.Session(), base_url=base, **kwargs)
+            with contextlib.redirect_stdout(io.StringIO()):
+                return scraper.run(first, current)
+        t_first, first_run = timeit(run, max_in_flight=4, rate=10, burst=4)
+        n_first = len(calls); del calls[:]
+        broken.clear()
+        t_resume, resume = timeit(run, max_in_flight=4, rate=10, burst=4)
+        n_resume = len(calls); del calls[:]
+        t_again, again = timeit(run, max_in_flight=4, rate=10, burst=4)
+        n_again = len(calls)
+        loaded = load_understat(first, current, cache_dir=tmp)
+    server.shutdown()
+
+    legacy = n * (delay + 3.5)  # loop original: sessão nova + sleep aleatório 2-5s por página
+    print(f"📊 Understat: extração {t_extract / len(sample) * 1000:.1f}ms/página ({len(data)} jogos) + DataFrame "
+          f"{t_frame * 1000:.1f}ms | {n} páginas: sequencial ~{legacy:.0f}s -> {t_first:.1f}s (4 em voo, 10 pedidos/s, "
+          f"{len(first_run['failed'])} falhadas) | retoma: {n_resume} pedidos em {t_resume:.1f}s | "
+          f"corrida seguinte: {n_again} pedidos (só a época atual)")
+    # A retoma só pede as falhadas + a época atual (ainda aberta); a seguinte só a época atual
+    open_season = {f"{season_code(current)}/{league}" for league in UNDERSTAT_LEAGUES}
+    return (n_first == n and set(resume['downloaded']) == set(first_run['failed']) | open_season
+            and set(again['downloaded']) == open_season and len(loaded) == n * len(frame))
+
+
+def bench_team_names(df, cells=1_000_000):
+    # Limpeza de HomeTeam/AwayTeam (nomes do histórico + grafias alternativas): .apply linha a
+    # linha vs resolver por códigos (texto e categórico), e o relatório com vocabulário conhecido.
+    from data_utils import clean_team_names, align_team_names
+    import io
+    rng = np.random.default_rng(7)
+    names = np.array(sorted(set(df['HomeTeam']) | set(TEAM_ALIASES)), dtype=object)
+    frame = pd.DataFrame({'HomeTeam': names[rng.integers(0, len(names), cells)],
+                          'AwayTeam': names[rng.integers(0, len(names), cells)]})
+
+    t_legacy, legacy = timeit(lambda: [frame[c].apply(legacy_clean_team_name) for c in ('HomeTeam', 'AwayTeam')])
+    t_new, new = timeit(lambda: [clean_team_names(frame[c]) for c in ('HomeTeam', 'AwayTeam')], repeat=3)
+    cats = frame.astype('category')
+    t_cat, from_cat = timeit(lambda: [clean_team_names(cats[c]) for c in ('HomeTeam', 'AwayTeam')], repeat=3)
+
+    # Fonte externa com grafias novas contra as equipas do histórico: 'FC X' é a mesma chave que
+    # 'X'; 'X Town' (outro clube, ou uma equipa B) nunca é resolvido por prefixo
+    known = pd.concat([df['HomeTeam'], df['AwayTeam']]).unique()
+    other = pd.DataFrame({'HomeTeam': [f"FC {t}" if i % 3 == 0 else f"{t} Town" if i % 3 == 1 else t
+                                       for i, t in enumerate(known)] + ['Unknown United']})
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        t_align, aligned = timeit(align_team_names, other, known, ('HomeTeam',))
+    matched = aligned['HomeTeam'].isin(known).mean()
+    prefixed = aligned['HomeTeam'].to_numpy()[1:len(known):3]  # as grafias '{t} Town'
+
+    ok = all(a.equals(b) for a, b in zip(legacy, new)) and all(np.array_equal(a.astype(object), b) for a, b in zip(from_cat, new))
+    print(f"📊 Nomes de equipas ({2 * cells} células): .apply {t_legacy * 1000:.0f}ms -> resolver {t_new * 1000:.0f}ms "
+          f"(categórico {t_cat * 1000:.1f}ms) | {len(other)} grafias externas alinhadas em {t_align * 1000:.0f}ms, "
+          f"{matched:.0%} encontradas no histórico")
+    return ok and matched < 1 and not np.isin(prefixed, known).any() and 'sem correspondência' in out.getvalue()
+
+
+def bench_column_store(df):
+    # Carregamento a frio (1ª leitura no processo) e memória: CSV (read_csv + to_datetime, como o
+    # get_main_data / get_understat_data faziam) vs dataset tipado, completo, só algumas colunas
+    # e só algumas partições. Confirma que os valores lidos são iguais aos originais.
+    import io
+    from column_store import season_of, write_dataset, read_dataset
+    games = df.drop(columns=[c for c in ('Season',) if c in df.columns]).copy()
+    games['Season'] = season_of(games['Date'])
+    games = games.sort_values(['Season', 'Div'], kind='stable').reset_index(drop=True)
+    mb = lambda frame: frame.memory_usage(deep=True).sum() / 2 ** 20
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, store = os.path.join(tmp, 'matches.csv'), os.path.join(tmp, 'matches')
+        games.to_csv(csv_path, index=False)
+        write_dataset(games, store, ('Season', 'Div'))
+
+        def legacy():
+            out = pd.read_csv(csv_path)
+            out['Date'] = pd.to_datetime(out['Date'], dayfirst=True, errors='coerce')
+            return out
+
+        def legacy_iso():
+            out = pd.read_csv(csv_path)
+            out['Date'] = pd.to_datetime(out['Date'], errors='coerce')
+            return out
+
+        t_csv, from_csv = timeit(legacy)
+        t_iso, from_iso = timeit(legacy_iso)
+        t_store, from_store = timeit(read_dataset, store)
+        cols = ['Date', 'Div', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'FTR']
+        t_cols, subset = timeit(read_dataset, store, columns=cols)
+        last = sorted(games['Season'].unique())[-3:]
+        t_part, recent = timeit(read_dataset, store, columns=cols, filters={'Season': last, 'Div': ['E0', 'D1']})
+        size_csv = os.path.getsize(csv_path) / 2 ** 20
+        size_store = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(store) for f in files) / 2 ** 20
+
+    ok = len(from_store) == len(games) and list(from_store.columns) == list(games.columns)
+    for col in games.columns:
+        a, b = from_store[col], games[col]
+        ok &= bool(a.astype(object).equals(b.astype(object)) if isinstance(a.dtype, pd.CategoricalDtype) else np.array_equal(a.to_numpy(), b.to_numpy(), equal_nan=a.dtype.kind == 'f'))
+    expected = games['Season'].isin(last) & games['Div'].isin(['E0', 'D1'])
+    ok &= len(recent) == expected.sum() and len(subset) == len(games)
+    wrong = (from_csv['Date'].to_numpy() != games['Date'].to_numpy()).mean()
+
+    print(f"📊 Column store ({len(games)} jogos, {games.shape[1]} colunas, {size_csv:.1f}MB csv -> {size_store:.1f}MB): "
+          f"CSV {t_csv * 1000:.0f}ms / {mb(from_csv):.1f}MB (datas AAAA-MM-DD lidas com dayfirst: {wrong:.0%} erradas/NaT; "
+          f"sem dayfirst {t_iso * 1000:.0f}ms) -> tipado {t_store * 1000:.0f}ms / {mb(from_store):.1f}MB | "
+          f"{len(cols)} colunas {t_cols * 1000:.0f}ms / {mb(subset):.1f}MB | "
+          f"{len(last)} épocas x 2 ligas {t_part * 1000:.1f}ms ({len(recent)} jogos)")
+    return ok
+
+
+def notebook_function(name, notebook='football_predicter.ipynb'):
+    # Função definida numa célula do notebook (ex: feature_engineering), sem correr o resto
+    import json
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), notebook), encoding='utf-8') as f:
+        cells = json.load(f)['cells']
+    source = next(''.join(c['source']) for c in cells if c['cell_type'] == 'code' and f"def {name}(" in ''.join(c['source']))
+    namespace = {'pd': pd, 'np': np}
+    exec("from sklearn.preprocessing import LabelEncoder\n"
+         "from data_utils import compute_standings, EloEngine, load_market_values, market_value_lookup\n"
+         "from rolling_features import attach_rolling_features\n"
+         "from metrics import Stopwatch\n" + source, namespace)
+    return namespace[name]
+
+
+def bench_feature_store(df, weeks=4):
+    # feature_engineering completa em cada atualização vs feature store: rebuild inicial e depois
+    # só os jogos de cada semana nova (contexto + Elo guardados). No fim compara o df_ready
+    # acumulado com uma reconstrução completa.
+    import io
+    from feature_store import FeatureStore
+    feature_engineering = notebook_function('feature_engineering')
+    games = df.sort_values('Date', kind='stable').reset_index(drop=True)
+    last = games['Date'].max()
+    cuts = [last - pd.Timedelta(days=7 * w) for w in range(weeks, -1, -1)]
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        store = FeatureStore(os.path.join(tmp, 'features'))
+        t_full, _ = timeit(feature_engineering, games.copy())
+        t_build, _ = timeit(store.update, games[games['Date'] <= cuts[0]], feature_engineering)
+        times, modes = [], []
+        for cut in cuts[1:]:
+            t, _ = timeit(store.update, games[games['Date'] <= cut], feature_engineering)
+            times.append(t)
+            modes.append(store.last_report['mode'])
+        t_same, _ = timeit(store.update, games, feature_engineering)
+        report = store.check(games, feature_engineering)
+
+    print(f"📊 Feature store ({len(games)} jogos): feature_engineering completa {t_full:.2f}s | rebuild inicial "
+          f"{t_build:.2f}s -> {weeks} semanas incrementais {np.mean(times):.2f}s/semana "
+          f"({t_full / np.mean(times):.1f}x) | sem jogos novos {t_same * 1000:.0f}ms | "
+          f"igual ao rebuild: {report['ok']} ({report['rows']} linhas)")
+    return report['ok'] and all(m == 'incremental' for m in modes)
+
+
+# Grelhas e parâmetros da célula de treino do notebook
+TRAIN_GRIDS = {
+    'model_multi': {'n_estimators': [200, 300], 'max_depth': [3, 4], 'learning_rate': [0.01, 0.03], 'subsample': [0.8]},
+    'model_sniper': {'n_estimators': [150, 200], 'max_depth': [3, 4], 'learning_rate': [0.01, 0.02]},
+}
+GOALS_PARAMS = {'n_estimators': 200, 'max_depth': 3, 'learning_rate': 0.03}
+
+
+def legacy_train_models(X_train, y_train, goals_h, goals_a, sample_weights):
+    # Célula de treino original: GridSearchCV(n_jobs=-1) + fits sklearn seguidos
+    import xgboost as xgb
+    from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+    tscv = TimeSeriesSplit(n_splits=3)
+    grid_multi = GridSearchCV(xgb.XGBClassifier(objective='multi:softprob', random_state=42, eval_metric='mlogloss'),
+                              TRAIN_GRIDS['model_multi'], cv=tscv, scoring='neg_log_loss', n_jobs=-1)
+    grid_multi.fit(X_train, y_train, sample_weight=sample_weights)
+    grid_sniper = GridSearchCV(xgb.XGBClassifier(objective='binary:logistic', random_state=42, eval_metric='logloss'),
+                               TRAIN_GRIDS['model_sniper'], cv=tscv, scoring='neg_log_loss', n_jobs=-1)
+    grid_sniper.fit(X_train, (y_train == 2).astype(int))
+    model_shield = xgb.XGBClassifier(**grid_sniper.best_params_, objective='binary:logistic', random_state=42)
+    model_shield.fit(X_train, (y_train != 0).astype(int))
+    goals = {}
+    for name, target in (('model_goals_h', goals_h), ('model_goals_a', goals_a)):
+        goals[name] = xgb.XGBRegressor(objective='count:poisson', **GOALS_PARAMS, random_state=42).fit(X_train, target)
+    return {'model_multi': grid_multi.best_estimator_, 'model_sniper': grid_sniper.best_estimator_,
+            'model_shield': model_shield, **goals}
+
+
+def bench_search(df, name='model_multi'):
+    # Grelha da célula de treino (todas as combinações até ao fim em 3 folds) vs Hyperband com
+    # early stopping no mesmo tempo: melhor log-loss CV e trials/s. A procura é interrompida a meio
+    # do orçamento e retomada a partir do trial log.
+    import io
+    from training import train_models, hyperband_search
+    feature_engineering = notebook_function('feature_engineering')
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_ready, features, _, _ = feature_engineering(df.sort_values('Date', kind='stable').reset_index(drop=True))
+    df_ready = df_ready.replace([np.inf, -np.inf], 0).fillna(0)
+    train = df_ready.iloc[:int(len(df_ready) * 0.80)]
+    X, y = train[features], train['FTR'].map({'A': 0, 'D': 1, 'H': 2}).to_numpy()
+    weights = np.where(y == 1, 1.15, 1.0) if name == 'model_multi' else None
+
+    t_grid, (_, report) = timeit(train_models, X, y, {name: TRAIN_GRIDS[name]}, sample_weight=weights)
+    grid_best = max(report['cv_scores'][name])
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'trials.jsonl')
+        first = hyperband_search(X, y, name, sample_weight=weights, time_budget=t_grid / 2, log_path=log_path)
+        search = hyperband_search(X, y, name, sample_weight=weights, time_budget=t_grid - first['seconds'],
+                                  log_path=log_path)
+    trials, seconds = first['trials'] + search['trials'], first['seconds'] + search['seconds']
+    n_grid = int(np.prod([len(v) for v in TRAIN_GRIDS[name].values()]))
+    print(f"📊 Procura {name} ({len(X)} jogos, orçamento {t_grid:.0f}s): grelha {n_grid} combinações, "
+          f"log-loss {-grid_best:.4f} ({n_grid / t_grid:.2f} trials/s) -> Hyperband {trials} trials em {seconds:.0f}s, "
+          f"log-loss {-search['best_score']:.4f} ({trials / seconds:.2f} trials/s; interrompida após {first['trials']} "
+          f"trials e retomada com {search['reused']} do log)")
+    return search['best_score'] > grid_best
+
+
+def legacy_score_bets(probs, odds, y):
+    # Jogo a jogo, como o add() do /api/predict: oportunidades 1X2, aposta na de maior EV se EV > 0
+    profit = bets = won = 0
+    for p, o, result in zip(probs, odds, y):
+        opportunities = []
+        for k in range(3):
+            if not o[k] or o[k] <= 1: continue
+            opportunities.append({'k': k, 'odd': o[k], 'ev': p[k] * o[k] - 1})
+        if len(opportunities) < 3: continue
+        rational = sorted(opportunities, key=lambda x: x['ev'], reverse=True)[0]
+        if rational['ev'] <= 0: continue
+        bets += 1
+        if rational['k'] == result:
+            won += 1
+            profit += rational['odd'] - 1
+        else:
+            profit -= 1
+    return profit, bets, won
+
+
+def bench_backtest(df, leagues=17):
+    # Walk-forward por época (10 épocas fora da amostra, 17 ligas se os dados forem sintéticos):
+    # tempo total dos treinos e avaliação vetorizada vs loop jogo a jogo com a regra do add()
+    import io
+    from backtest import run_backtest, score_bets, RESULT_CODES, ODDS_COLUMNS
+    if not os.path.exists(DATA_FILE):
+        divisions = ('E0', 'E1', 'E2', 'D1', 'D2', 'SP1', 'SP2', 'F1', 'F2', 'I1', 'I2', 'P1', 'N1', 'B1', 'T1', 'G1', 'SC0')
+        df = synthetic_matches(divisions=divisions[:leagues])
+    feature_engineering = notebook_function('feature_engineering')
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_ready, features, _, _ = feature_engineering(df.sort_values('Date', kind='stable').reset_index(drop=True))
+    df_ready = df_ready.replace([np.inf, -np.inf], 0).fillna(0)
+
+    t_run, result = timeit(run_backtest, df_ready, features)
+    out = result['bets']
+    probs = out[['P_Away', 'P_Draw', 'P_Home']].to_numpy()
+    odds = df_ready.set_index(['Date', 'HomeTeam', 'AwayTeam'])[ODDS_COLUMNS].reindex(
+        pd.MultiIndex.from_frame(out[['Date', 'HomeTeam', 'AwayTeam']])).to_numpy(dtype=np.float64)
+    y = out['FTR'].astype(object).map(RESULT_CODES).to_numpy()
+    t_loop, (profit, bets, won) = timeit(legacy_score_bets, probs, odds, y)
+    t_vec, scored = timeit(score_bets, probs, odds, y, repeat=5)
+
+    total = result['leagues'].loc['TOTAL']
+    ok = bets == scored['bet'].sum() and won == scored['won'].sum() and abs(profit - scored['profit'].sum()) < 1e-6
+    print(f"📊 Backtest ({out['Div'].nunique()} ligas, {len(result['periods'])} épocas, {len(out)} jogos fora da amostra, "
+          f"{os.cpu_count()} CPUs): total {t_run:.0f}s (treinos {result['train_seconds']:.0f}s) | avaliação jogo a jogo "
+          f"{t_loop * 1000:.0f}ms -> vetorizada {t_vec * 1000:.1f}ms | {int(total['bets'])} apostas, ROI {total['roi']:+.1%}, "
+          f"log-loss {total['log_loss']:.4f}, ECE {total['ece']:.3f}")
+    return ok
+
+
+TRAINING_PROBE = '''
+import sys, time, json, resource
+import numpy as np, pandas as pd
+sys.path.insert(0, '.')
+import benchmarks as b
+from training import train_models
+mode, data = sys.argv[1], np.load(sys.argv[2], allow_pickle=True)
+X_train = pd.DataFrame(data['X_train'], columns=list(data['features']))
+X_test = pd.DataFrame(data['X_test'], columns=list(data['features']))
+y_train, goals_h, goals_a = data['y_train'], data['goals_h'], data['goals_a']
+weights = np.where(y_train == 1, 1.15, 1.0)
+def hwm():
+    return int(open('/proc/self/status').read().split('VmHWM:')[1].split()[0]) / 1024
+base = hwm()
+t0 = time.perf_counter()
+if mode == 'legacy':
+    models = b.legacy_train_models(X_train, pd.Series(y_train), goals_h, goals_a, weights)
+else:
+    models, report = train_models(X_train, y_train, b.TRAIN_GRIDS, sample_weight=weights,
+                                  fixed={'model_goals_h': (b.GOALS_PARAMS, goals_h), 'model_goals_a': (b.GOALS_PARAMS, goals_a)})
+seconds = time.perf_counter() - t0
+preds = {name: (m.predict_proba(X_test) if hasattr(m, 'predict_proba') else m.predict(X_test)) for name, m in models.items()}
+np.savez(sys.argv[3], **preds)
+children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+print(json.dumps({'seconds': seconds, 'peak': hwm(), 'base': base, 'children': children}))
+'''
+
+
+def bench_training(df):
+    # Célula de treino (5 modelos, grelhas com TimeSeriesSplit) vs training.train_models, cada um
+    # num processo à parte: tempo, pico de memória (VmHWM do processo + maior processo filho,
+    # o GridSearchCV n_jobs=-1 usa processos) e previsões no conjunto de teste.
+    import io
+    import json
+    import subprocess
+    feature_engineering = notebook_function('feature_engineering')
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_ready, features, _, _ = feature_engineering(df.sort_values('Date', kind='stable').reset_index(drop=True))
+    df_ready = df_ready.replace([np.inf, -np.inf], 0).fillna(0)
+    y = df_ready['FTR'].map({'A': 0, 'D': 1, 'H': 2}).to_numpy()
+    split = int(len(df_ready) * 0.80)
+    X = df_ready[features].to_numpy(dtype=np.float64)
+    root = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        data = os.path.join(tmp, 'train.npz')
+        np.savez(data, X_train=X[:split], X_test=X[split:], y_train=y[:split], features=np.array(features, dtype=object),
+                 goals_h=df_ready['FTHG'].to_numpy()[:split], goals_a=df_ready['FTAG'].to_numpy()[:split])
+        results, preds = {}, {}
+        for mode in ('legacy', 'new'):
+            out_path = os.path.join(tmp, f"{mode}.npz")
+            out = subprocess.run([sys.executable, '-W', 'ignore', '-c', TRAINING_PROBE, mode, data, out_path],
+                                 capture_output=True, text=True, cwd=root)
+            results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+            with np.load(out_path) as p:
+                preds[mode] = {k: p[k] for k in p.files}
+    diff = max(float(np.abs(preds['legacy'][k] - preds['new'][k]).max()) for k in preds['legacy'])
+    old, new = results['legacy'], results['new']
+    print(f"📊 Treino ({split} jogos, {len(features)} features, {os.cpu_count()} CPUs): {old['seconds']:.1f}s -> "
+          f"{new['seconds']:.1f}s ({old['seconds'] / new['seconds']:.1f}x) | pico de memória "
+          f"{old['peak'] - old['base']:.0f}MB (+ processos filhos {old['children']:.0f}MB) -> "
+          f"{new['peak'] - new['base']:.0f}MB (+ {new['children']:.0f}MB) | diferença máx. nas previsões {diff:.1e}")
+    return diff < 1e-5
+
+
+def bench_compact(df):
+    # Histórico compacto (compact_frame.py): bytes do df_ready (treino) e do history_df do
+    # football_brain.pkl (site), e as previsões com float64 vs float32
+    import io
+    import joblib
+    import xgboost as xgb
+    from compact_frame import CompactFrame, compaction_report, output_diff
+    from feature_index import TeamFeatureIndex
+    from model_bundle import ModelBundle, history_columns
+    feature_engineering = notebook_function('feature_engineering')
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_ready, features, _, _ = feature_engineering(df.sort_values('Date', kind='stable').reset_index(drop=True))
+    df_ready = df_ready.replace([np.inf, -np.inf], 0).fillna(0)
+    ready = CompactFrame.from_frame(df_ready, features, extra=['FTHG', 'FTAG'])
+    train = compaction_report(df_ready, ready)
+    split = int(len(df_ready) * 0.80)
+    y = df_ready['FTR'].map({'A': 0, 'D': 1, 'H': 2}).to_numpy()
+    params = dict(n_estimators=200, max_depth=3, learning_rate=0.03, random_state=42, n_jobs=1)
+    model_64 = xgb.XGBClassifier(**params).fit(df_ready[features].iloc[:split], y[:split])
+    model_32 = xgb.XGBClassifier(**params).fit(ready.features_frame(slice(None, split)), y[:split])
+    fit_diff = float(np.abs(model_64.predict_proba(df_ready[features].iloc[split:]) -
+                            model_32.predict_proba(ready.features_frame(slice(split, None)))).max())
+    pred_diff = output_diff({'model': model_64}, df_ready, ready, slice(split, None))['model']
+
+    api_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web', 'api')
+    artifacts = joblib.load(os.path.join(api_dir, 'football_brain.pkl'))
+    history = artifacts['history_df']
+    serve = compaction_report(history, CompactFrame.from_frame(history, artifacts['features'], extra=history_columns(history.columns)))
+    old_index = TeamFeatureIndex(history, artifacts['features'], artifacts['le_div'])
+    bundle = ModelBundle.from_artifacts(artifacts)
+    new_index = TeamFeatureIndex(bundle.history_frame(), bundle.features, bundle.divisions)
+    teams = list(old_index.teams)
+    pairs = list(zip(teams, teams[1:] + teams[:1]))
+    rows_old = np.vstack([old_index.build_row(h, a) for h, a in pairs])
+    rows_new = np.vstack([new_index.build_row(h, a) for h, a in pairs])
+    predict = lambda m, X: m.predict_proba(X) if hasattr(m, 'predict_proba') else m.predict(X)
+    serve_diff = max(float(np.abs(predict(m, rows_old) - predict(m, rows_new)).max()) for m in bundle.models.values())
+    print(f"📊 Compactação: df_ready {train['before'] / 1e6:.1f}MB -> {train['after'] / 1e6:.1f}MB "
+          f"({len(train['dropped'])} colunas fora) | history_df do .pkl {serve['before'] / 1e6:.1f}MB -> {serve['after'] / 1e6:.1f}MB | "
+          f"diferença máx. nas previsões: treino {fit_diff:.1e}, input {pred_diff:.1e}, site ({len(pairs)} jogos) {serve_diff:.1e}")
+    return max(fit_diff, pred_diff, serve_diff) < 1e-6
+
+
+def bench_team_history(df, n=200):
+    # Histórico por equipa indexado pela data (team_history.py) com o history_df do football_brain.pkl:
+    # n previsões em datas passadas (filtros do predict_match_advanced vs pesquisa binária) e
+    # voltar a gerar as linhas de input de todos os jogos do histórico (as-of da data de cada jogo)
+    import joblib
+    from feature_index import TeamFeatureIndex
+    api_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web', 'api')
+    artifacts = joblib.load(os.path.join(api_dir, 'football_brain.pkl'))
+    hist = artifacts['history_df'].sort_values('Date', kind='stable').reset_index(drop=True)
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(hist), n)
+    queries = [(hist['HomeTeam'].iloc[i], hist['AwayTeam'].iloc[i], hist['Date'].iloc[i]) for i in picks]
+
+    def legacy(home, away, date):
+        # 1 cópia do passado + 3 filtros por equipa (valor, contexto, stats) + verificação da divisão
+        past = hist[hist['Date'] < date].copy()
+        out = []
+        for team in (home, away):
+            hist[(hist['HomeTeam'] == team) | (hist['AwayTeam'] == team)].tail(20)
+            for _ in range(3):
+                games = past[(past['HomeTeam'] == team) | (past['AwayTeam'] == team)]
+            out.append((games.index[-1] if len(games) else -1, len(games)))
+        return out
+
+    t_build, index = timeit(TeamFeatureIndex, hist, artifacts['features'], artifacts['le_div'])
+    history = index.history
+
+    def new(home, away, date):
+        out = []
+        for team in (home, away):
+            history.recent(team, 20)
+            row, _, games = history.latest(team, date)
+            out.append((row, games))
+        return out
+
+    t_old, old = timeit(lambda: [legacy(*q) for q in queries])
+    t_new, res = timeit(lambda: [new(*q) for q in queries], repeat=3)
+    ok = old == res
+    t_bulk, X = timeit(index.build_rows, hist['HomeTeam'], hist['AwayTeam'], hist['Date'], repeat=3)
+    sample = rng.integers(0, len(hist), 50)
+    ok &= all(np.array_equal(X[i], index.build_row(hist['HomeTeam'].iloc[i], hist['AwayTeam'].iloc[i], date=hist['Date'].iloc[i])[0])
+              for i in sample)
+    print(f"📊 Histórico por equipa ({len(hist)} jogos, índice em {t_build * 1000:.0f}ms): previsão numa data passada "
+          f"{t_old / n * 1000:.2f}ms -> {t_new / n * 1000:.3f}ms | linhas as-of de todos os jogos {t_bulk * 1000:.0f}ms "
+          f"({len(hist) / t_bulk:,.0f} jogos/s) | {'iguais' if ok else 'DIFERENTES'}")
+    return ok
+
+
+def legacy_squad_values(valuations_path, clubs_path):
+    # prepare_market_values antigo: o CSV inteiro em memória, época com .apply por linha
+    valuations = pd.read_csv(valuations_path)
+    clubs = pd.read_csv(clubs_path)
+    valuations['date'] = pd.to_datetime(valuations['date'])
+    valuations['Season'] = valuations['date'].apply(lambda x: x.year if x.month > 7 else x.year - 1)
+    val_merged = valuations.merge(clubs[['club_id', 'name']], left_on='current_club_id', right_on='club_id', how='left')
+    squad = val_merged.groupby(['name', 'Season'])['market_value_in_eur'].sum().reset_index()
+    squad.rename(columns={'name': 'Team', 'market_value_in_eur': 'Value'}, inplace=True)
+    squad['Value'] = squad['Value'] / 1_000_000
+    return squad
+
+
+def legacy_market_values(df, mv_df):
+    # feature_engineering antiga: dicionário com iterrows + df.apply por linha
+    real_values = {}
+    for _, row in mv_df.iterrows():
+        real_values.setdefault(int(row['Season']), {})[row['Team']] = row['Value']
+    def get_market_value(team, season):
+        if season in real_values and team in real_values[season]:
+            return real_values[season][team]
+        return 900 if team in ['Man City', 'Arsenal', 'Liverpool', 'Real Madrid', 'Barcelona', 'Bayern Munich',
+                               'Paris Saint Germain', 'Inter'] else 200
+    return (df.apply(lambda x: get_market_value(x['HomeTeam'], x['Season']), axis=1).to_numpy(dtype=np.float64),
+            df.apply(lambda x: get_market_value(x['AwayTeam'], x['Season']), axis=1).to_numpy(dtype=np.float64))
+
+
+def synthetic_valuations(path, rows, clubs=3000, seed=42):
+    # player_valuations.csv com as colunas do Kaggle (as que não são lidas também, para o tamanho ser realista)
+    rng = np.random.default_rng(seed)
+    days = rng.integers(0, 365 * 20, rows)
+    pd.DataFrame({'player_id': rng.integers(1, 500_000, rows),
+                  'date': (np.datetime64('2004-01-01') + days.astype('timedelta64[D]')).astype(str),
+                  'market_value_in_eur': rng.integers(1, 2000, rows) * 25_000,
+                  'current_club_id': rng.integers(1, clubs + 50, rows),
+                  'player_club_domestic_competition_id': rng.choice(['GB1', 'ES1', 'L1', 'IT1', 'FR1'], rows)}).to_csv(path, index=False)
+
+
+MARKET_PROBE = '''
+import sys, time, json
+sys.path.insert(0, '.')
+import benchmarks as b
+from market_values import squad_values
+def hwm():
+    return int(open('/proc/self/status').read().split('VmHWM:')[1].split()[0]) / 1024
+mode, valuations, clubs, out = sys.argv[1:]
+base = hwm()
+t0 = time.perf_counter()
+squad = b.legacy_squad_values(valuations, clubs) if mode == 'legacy' else squad_values(valuations, clubs)
+seconds = time.perf_counter() - t0
+squad.to_csv(out, index=False)
+print(json.dumps({'seconds': seconds, 'peak': hwm() - base}))
+'''
+
+
+def bench_market_values(df, sizes=(1_000_000, 3_000_000)):
+    # Transfermarkt: prepare_market_values antigo vs market_values.squad_values (tempo e pico de
+    # memória, cada um num processo, para dois tamanhos do CSV) e o join Home_Value / Away_Value
+    import json
+    import subprocess
+    from column_store import season_of
+    from market_values import market_value_lookup
+    root = os.path.dirname(os.path.abspath(__file__))
+    ok, lines = True, []
+    with tempfile.TemporaryDirectory() as tmp:
+        clubs = os.path.join(tmp, 'clubs.csv')
+        pd.DataFrame({'club_id': np.arange(1, 3001), 'name': [f"Club {i}" for i in range(1, 3001)]}).to_csv(clubs, index=False)
+        for rows in sizes:
+            valuations = os.path.join(tmp, f"valuations_{rows}.csv")
+            synthetic_valuations(valuations, rows)
+            results, outs = {}, {}
+            for mode in ('legacy', 'new'):
+                outs[mode] = os.path.join(tmp, f"{mode}_{rows}.csv")
+                run = subprocess.run([sys.executable, '-W', 'ignore', '-c', MARKET_PROBE, mode, valuations, clubs, outs[mode]],
+                                     capture_output=True, text=True, cwd=root)
+                results[mode] = json.loads(run.stdout.strip().splitlines()[-1])
+            old, new = pd.read_csv(outs['legacy']), pd.read_csv(outs['new'])
+            ok &= old[['Team', 'Season']].equals(new[['Team', 'Season']]) and np.allclose(old['Value'], new['Value'], rtol=1e-12)
+            lines.append(f"{rows / 1e6:.0f}M linhas ({os.path.getsize(valuations) / 1e6:.0f}MB): {results['legacy']['seconds']:.1f}s, "
+                         f"pico {results['legacy']['peak']:.0f}MB -> {results['new']['seconds']:.1f}s, pico {results['new']['peak']:.0f}MB")
+
+    # Join: tabela de valores com metade das equipas/épocas (o resto cai no fallback por tier)
+    matches = df.assign(Season=season_of(df['Date']))
+    rng = np.random.default_rng(0)
+    mv = pd.DataFrame([(t, s) for t in pd.unique(matches['HomeTeam']) for s in pd.unique(matches['Season'])], columns=['Team', 'Season'])
+    mv = mv.sample(frac=0.5, random_state=0).assign(Value=lambda x: rng.uniform(20, 1200, len(x)))
+    t_old, (old_h, old_a) = timeit(legacy_market_values, matches, mv)
+    t_new, (new_h, new_a) = timeit(lambda: (market_value_lookup(matches['HomeTeam'], matches['Season'], mv),
+                                            market_value_lookup(matches['AwayTeam'], matches['Season'], mv)), repeat=3)
+    ok &= np.array_equal(old_h, new_h) and np.array_equal(old_a, new_a)
+    print(f"📊 Valores de mercado: {' | '.join(lines)} | join em {len(matches)} jogos {t_old * 1000:.0f}ms -> "
+          f"{t_new * 1000:.1f}ms | {'iguais' if ok else 'DIFERENTES'}")
+    return ok
+
+
+STARTUP_PROBE = '''
+import os, sys, time, json
+t0 = time.perf_counter()
+sys.path.insert(0, 'web/api')
+import index
+t_import = time.perf_counter() - t0
+def rss(field='RssAnon'):
+    return int(open('/proc/self/status').read().split(field + ':')[1].split()[0]) / 1024
+rss_import = rss()
+client = index.app.test_client()
+t0 = time.perf_counter()
+res = client.post('/api/predict', json={'home_team': 'Arsenal', 'away_team': 'Chelsea', 'division': 'E0',
+                                        'odd_h': 2.1, 'odd_d': 3.4, 'odd_a': 3.6}).get_json()
+t_first = time.perf_counter() - t0
+print(json.dumps({'import': t_import, 'rss_import': rss_import, 'first': t_first, 'rss': rss(),
+                  'rss_file': rss('RssFile'), 'xg': res['xg'], 'xgboost': 'xgboost' in sys.modules,
+                  'sklearn': 'sklearn' in sys.modules}))
+'''
+
+
+def bench_bundle(df):
+    # Arranque do site (import do index.py) e 1º /api/predict: football_brain.pkl vs bundle.
+    # RSS = memória privada do processo (RssAnon); as páginas do mmap contam à parte (RssFile)
+    # e são partilhadas entre os workers pela page cache.
+    import json
+    import subprocess
+    from model_bundle import convert_pickle
+    api_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web', 'api')
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle = os.path.join(tmp, 'football_brain')
+        version = convert_pickle(os.path.join(api_dir, 'football_brain.pkl'), bundle)
+        results = {}
+        for label, path in (('pkl', os.path.join(tmp, 'missing')), ('bundle', bundle)):
+            env = dict(os.environ, MODEL_BUNDLE=path, CACHE_BACKEND='memory', MODEL_RUNTIME='xgboost')
+            out = subprocess.run([sys.executable, '-W', 'ignore', '-c', STARTUP_PROBE], env=env, capture_output=True,
+                                 text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            results[label] = json.loads(out.stdout.strip().splitlines()[-1])
+    old, new = results['pkl'], results['bundle']
+    print(f"📊 Bundle {version}: import {old['import']:.2f}s -> {new['import']:.2f}s "
+          f"(RSS {old['rss_import']:.0f}MB -> {new['rss_import']:.0f}MB) | 1º predict {old['first'] * 1000:.0f}ms -> "
+          f"{new['first'] * 1000:.0f}ms | RSS depois do 1º predict {old['rss']:.0f}MB -> {new['rss']:.0f}MB "
+          f"(+{new['rss_file'] - old['rss_file']:.0f}MB em ficheiros mmap)")
+    return old['xg'] == new['xg']
+
+
+def bench_trees(df, n=500):
+    # Previsor NumPy (tree_predictor.py) vs XGBoost com os modelos do football_brain.pkl: paridade em
+    # todas as linhas do histórico (com NaN), latência de 1 linha (os 4 modelos do /api/predict) e
+    # arranque de um worker com o bundle em cada runtime
+    import json
+    import subprocess
+    import joblib
+    from feature_index import TeamFeatureIndex
+    from model_bundle import convert_pickle, _model_kind
+    from tree_predictor import TreeEnsemble, TreeModel
+    api_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web', 'api')
+    artifacts = joblib.load(os.path.join(api_dir, 'football_brain.pkl'))
+    hist = artifacts['history_df']
+    index = TeamFeatureIndex(hist, artifacts['features'], artifacts['le_div'])
+    X = index.build_rows(hist['HomeTeam'], hist['AwayTeam'], hist['Date'])
+    X[np.random.default_rng(0).random(X.shape) < 0.02] = np.nan  # valores em falta (default_left)
+    names = ['model_multi', 'model_shield', 'model_goals_h', 'model_goals_a']
+    xgb_models = {name: artifacts[name] for name in names}
+    np_models = {name: TreeModel(TreeEnsemble.from_booster(m), _model_kind(m)) for name, m in xgb_models.items()}
+    predict = lambda m, X: m.predict_proba(X) if getattr(m, 'kind', _model_kind(m)) == 'classifier' else m.predict(X)
+    diff = max(float(np.abs(predict(xgb_models[k], X) - predict(np_models[k], X)).max()) for k in names)
+
+    row = X[:1]
+    frame = pd.DataFrame(row, columns=artifacts['features'])
+    t_frame, _ = timeit(lambda: [[predict(m, frame) for m in xgb_models.values()] for _ in range(n)])
+    t_array, _ = timeit(lambda: [[predict(m, row) for m in xgb_models.values()] for _ in range(n)])
+    t_numpy, _ = timeit(lambda: [[predict(m, row) for m in np_models.values()] for _ in range(n)], repeat=3)
+    t_bulk_xgb, _ = timeit(lambda: [predict(m, X) for m in xgb_models.values()])
+    t_bulk_np, _ = timeit(lambda: [predict(m, X) for m in np_models.values()])
+
+    startup = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle = os.path.join(tmp, 'football_brain')
+        convert_pickle(os.path.join(api_dir, 'football_brain.pkl'), bundle)
+        for runtime in ('xgboost', 'numpy'):
+            env = dict(os.environ, MODEL_BUNDLE=bundle, CACHE_BACKEND='memory', MODEL_RUNTIME=runtime)
+            out = subprocess.run([sys.executable, '-W', 'ignore', '-c', STARTUP_PROBE], env=env, capture_output=True,
+                                 text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            startup[runtime] = json.loads(out.stdout.strip().splitlines()[-1])
+    old, new = startup['xgboost'], startup['numpy']
+    us = lambda t: t / n * 1e6
+    print(f"📊 Árvores NumPy ({len(X)} linhas, diferença máx. {diff:.1e}): 4 modelos x 1 linha DataFrame {us(t_frame):.0f}us | "
+          f"ndarray {us(t_array):.0f}us -> NumPy {us(t_numpy):.0f}us | todas as linhas {t_bulk_xgb * 1000:.0f}ms -> "
+          f"{t_bulk_np * 1000:.0f}ms | 1º predict {old['first'] * 1000:.0f}ms -> {new['first'] * 1000:.0f}ms, RSS {old['rss']:.0f}MB -> "
+          f"{new['rss']:.0f}MB (xgboost importado: {old['xgboost']} -> {new['xgboost']}, sklearn: {old['sklearn']} -> {new['sklearn']})")
+    return diff < 1e-5 and old['xg'] == new['xg'] and not new['xgboost']
+
+
+def bench_prewarm(df, per_league=10, delay=0.3):
+    # Pré-aquecimento: 1º pedido de cada jogo (odds a frio + modelos) vs lookup da previsão feita;
+    # e quantos jogos voltam a ser calculados quando nada muda / uma odd mexe / o modelo muda
+    import io
+    import index as api
+    from odds_client import OddsClient
+    from fixture_store import FixtureStore
+    from cache_backend import TieredCache
+    from prewarm import Prewarmer
+
+    teams = list(api.get_feature_index().teams)
+    today = pd.Timestamp.now(tz='UTC').normalize()
+    games, n = {}, 0
+    for key in api.SUPPORTED_LEAGUES:
+        games[key] = []
+        for i in range(per_league):
+            home, away = teams[(2 * n) % len(teams)], teams[(2 * n + 1) % len(teams)]
+            kickoff = (today + pd.Timedelta(days=n % 3, hours=12 + i % 8)).strftime('%Y-%m-%dT%H:%M:%SZ')
+            price = lambda p: round(float(p), 2)
+            books = [{'title': 'Betclic', 'markets': [{'key': 'h2h', 'outcomes': [
+                {'name': home, 'price': price(1.6 + n % 7 * 0.3)}, {'name': away, 'price': price(2.2 + n % 5 * 0.4)},
+                {'name': 'Draw', 'price': 3.3}]}]}]
+            games[key].append({'id': f'{key}_{i}', 'sport_title': key, 'commence_time': kickoff,
+                               'home_team': home, 'away_team': away, 'bookmakers': books})
+            n += 1
+    server, calls = odds_stub_server(delay=delay, games=games)
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    def setup():
+        cache = {}
+        store = FixtureStore(api.SUPPORTED_LEAGUES, api.build_fixture_row)
+        client = OddsClient('x', cache, ttl=api.CACHE_DURATION, base_url=base, timeout=(1, 5),
+                            on_update=lambda k, data, ts: store.update_league(k, data, ts))
+        return cache, store, client
+
+    flask_client = api.app.test_client()
+    original = (api.fixture_store, api.prewarmer, api.odds_client, api.api_cache)
+
+    def request_all(store):
+        out = {}
+        for fid, entry in store.games.items():
+            payload = {'fixture_id': fid, 'date': entry['date'], 'home_team': entry['row']['home_team'],
+                       'away_team': entry['row']['away_team'], 'division': entry['row']['division'], **entry['odds']}
+            out[fid] = flask_client.post('/api/predict', json=payload).get_json()
+        return out
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Sem pré-aquecimento: o 1º visitante espera pelas ligas e pelos modelos
+            cache, store, client = setup()
+            api.fixture_store, api.odds_client, api.api_cache = store, client, cache
+            api.prewarmer = Prewarmer(client, store, cache, TieredCache(api.CACHE_DURATION, maxsize=4096), api.score_fixtures,
+                                      api.SUPPORTED_LEAGUES, api.CACHE_DURATION, version=api.model_version,
+                                      odds_of=lambda e: api.parse_odds(e['odds']))
+            t0 = time.perf_counter()
+            client.get_leagues(api.SUPPORTED_LEAGUES)
+            t_cold_odds = time.perf_counter() - t0
+            t_cold, cold = timeit(request_all, store)
+
+            # Com pré-aquecimento: um ciclo em segundo plano e depois os mesmos pedidos
+            cache, store, client = setup()
+            prewarmer = Prewarmer(client, store, cache, TieredCache(api.CACHE_DURATION, maxsize=4096), api.score_fixtures,
+                                  api.SUPPORTED_LEAGUES, api.CACHE_DURATION, version=api.model_version,
+                                  odds_of=lambda e: api.parse_odds(e['odds']))
+            api.fixture_store, api.odds_client, api.api_cache, api.prewarmer = store, client, cache, prewarmer
+            t_run, computed = timeit(prewarmer.run_once)
+            t_warm, warm = timeit(request_all, store)
+            hits = prewarmer.stats['hits']
+            t_again, again = timeit(prewarmer.run_once)  # nada mudou
+
+            # Uma odd mexe: a liga é renovada antes de expirar e só esse jogo é recalculado
+            first = api.SUPPORTED_LEAGUES[0]
+            games[first][0]['bookmakers'][0]['markets'][0]['outcomes'][0]['price'] += 0.05
+            for entry in cache.values():
+                entry['ts'] -= api.CACHE_DURATION - prewarmer.refresh_ahead + 1
+            moved = prewarmer.run_once()
+            version = api.model_version
+            api.prewarmer.version = prewarmer.version = lambda: version() + '-novo'
+            bumped = prewarmer.run_once()
+    finally:
+        api.fixture_store, api.prewarmer, api.odds_client, api.api_cache = original
+        server.shutdown()
+
+    same = cold == warm
+    total = len(cold)
+    print(f"📊 Pré-aquecimento ({total} jogos, {len(api.SUPPORTED_LEAGUES)} ligas, {delay}s/pedido à API): "
+          f"odds a frio {t_cold_odds:.2f}s + 1º /api/predict de cada jogo {t_cold / total * 1000:.1f}ms -> "
+          f"{t_warm / total * 1000:.2f}ms ({hits}/{total} da cache) | ciclo em segundo plano {t_run:.2f}s "
+          f"({computed} jogos) | sem mudanças {t_again * 1000:.0f}ms ({again} recalculados) | 1 odd mexe: {moved} "
+          f"| modelo novo: {bumped} | mesmas respostas: {same}")
+    return same and again == 0 and moved == 1 and bumped == total
+
+
+def bench_memo(df, n=200):
+    # Mesmo jogo pedido n vezes: features + modelos em cada pedido vs memo; e um .pkl novo no
+    # disco tem de invalidar o memo (nunca servir previsões do modelo antigo)
+    import io
+    import shutil
+    import index as api
+    from prediction_memo import PredictionMemo
+    fixture = {'home_team': 'Arsenal', 'away_team': 'Chelsea', 'division': 'E0', 'date': '2025-12-20',
+               'odd_h': 2.1, 'odd_d': 3.4, 'odd_a': 3.6, 'odd_1x': 1.3, 'odd_12': 1.3, 'odd_x2': 1.7}
+    home, away = api.resolve_teams(fixture['home_team'], fixture['away_team'])
+    item = (home, away, 'E0', api.parse_odds(fixture), api.parse_match_date(fixture['date']))
+    client = api.app.test_client()
+    original = (api.prediction_memo, api.model_path, api.bundle_path)
+    try:
+        with prediction_memo_off(api):
+            t_core, core = timeit(lambda: [api.predict_many([item]) for _ in range(n)][-1])
+            t_cold, cold = timeit(lambda: [client.post('/api/predict', json=fixture) for _ in range(n)][-1].get_json())
+        api.prediction_memo = memo = PredictionMemo(maxsize=64)
+        api.predict_many([item])
+        t_hit, hit = timeit(lambda: [api.predict_many([item]) for _ in range(n)][-1])
+        t_warm, warm = timeit(lambda: [client.post('/api/predict', json=fixture) for _ in range(n)][-1].get_json())
+        same = hit == core and warm == cold
+
+        # Modelo "novo": cópia do .pkl cujo mtime muda (sem bundle, o site usa o .pkl)
+        tmp = tempfile.mkdtemp()
+        api.bundle_path, api.model_path = os.path.join(tmp, 'sem_bundle'), os.path.join(tmp, 'football_brain.pkl')
+        shutil.copy(original[1], api.model_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            api.predict_many([item])
+            version = memo.version
+            st = os.stat(api.model_path)
+            os.utime(api.model_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+            misses = memo.stats['misses']
+            reloaded = api.predict_many([item])[0]
+        invalidated = memo.version != version and memo.stats['misses'] == misses + 1 and reloaded == core[0]
+        stats = memo.snapshot_stats()
+    finally:
+        api.prediction_memo, api.model_path, api.bundle_path = original
+        with contextlib.redirect_stdout(io.StringIO()):
+            api.get_models()
+    us = lambda t: t / n * 1e6
+    print(f"📊 Memo de previsões (mesmo jogo {n}x): núcleo {us(t_core):.0f}µs -> {us(t_hit):.1f}µs | /api/predict "
+          f"{us(t_cold) / 1000:.2f}ms -> {us(t_warm) / 1000:.2f}ms | mesmas respostas: {same} | .pkl novo invalida: "
+          f"{invalidated} | hits {stats['hits']}, misses {stats['misses']}, invalidações {stats['invalidations']}")
+    return same and invalidated
+
+
+def bench_metrics(df, n=100_000, requests=200):
+    # Custo de um timer, /api/predict com e sem métricas, /api/metrics válido (formato Prometheus)
+    # e perfil de uma corrida da feature_engineering gravado e comparado com a anterior
+    import io
+    import re
+    import metrics
+    import index as api
+    registry = metrics.default_registry
+
+    def timers():
+        for _ in range(n):
+            with metrics.timer('bench.noop'): pass
+
+    t_on, _ = timeit(timers)
+    registry.enabled = False
+    t_off, _ = timeit(timers)
+    fixture = {'home_team': 'Arsenal', 'away_team': 'Chelsea', 'division': 'E0', 'date': '2025-12-20',
+               'odd_h': 2.1, 'odd_d': 3.4, 'odd_a': 3.6}
+    client = api.app.test_client()
+    best = {False: None, True: None}
+    with prediction_memo_off(api):
+        client.post('/api/predict', json=fixture)
+        for enabled in (False, True) * 3:  # alternado, para o ruído cair nos dois lados
+            registry.enabled = enabled
+            t, _ = timeit(lambda: [client.post('/api/predict', json=fixture) for _ in range(requests)])
+            best[enabled] = t if best[enabled] is None else min(best[enabled], t)
+    registry.enabled = True
+    t_plain, t_timed = best[False], best[True]
+
+    text = client.get('/api/metrics').get_data(as_text=True)
+    sample = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? [-+0-9.eEInf]+$')
+    bad = [l for l in text.splitlines() if l and not l.startswith('#') and not sample.match(l)]
+    stages = set(re.findall(r'stage="([^"]+)"', text))
+    needed = {'http.request', 'predict.memo', 'predict.features', 'predict.model', 'predict.score_grid', 'predict.payload'}
+
+    feature_engineering = notebook_function('feature_engineering')
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()) as out:
+        registry.reset()
+        feature_engineering(df)
+        first = metrics.write_profile(tmp, meta={'run': 1})
+        time.sleep(1)  # nome do ficheiro ao segundo
+        registry.reset()
+        feature_engineering(df)
+        metrics.print_profile(previous=metrics.last_profile(tmp))
+        profile = registry.profile()
+    fe_stages = [s for s in profile if s.startswith('features.')]
+    us = lambda t: t / n * 1e6
+    ms = lambda t: t / requests * 1000
+    print(f"📊 Métricas: timer {us(t_on):.2f}µs (desligado {us(t_off):.2f}µs) | /api/predict sem memo {ms(t_plain):.2f}ms -> "
+          f"{ms(t_timed):.2f}ms com métricas | /api/metrics {len(text.splitlines())} linhas, {len(bad)} inválidas, "
+          f"etapas {len(stages)} | perfil da feature_engineering: {len(fe_stages)} etapas, total "
+          f"{profile['features.total']['total']:.2f}s, comparado com {os.path.basename(first)}")
+    print('\n'.join(l for l in out.getvalue().splitlines() if l.startswith('📊') or l.startswith('   features')))
+    return not bad and needed <= stages and 'vs anterior' in out.getvalue()
+
+
+BENCHMARKS = {
+    'standings': bench_standings,
+    'elo': bench_elo,
+    'rolling': bench_rolling,
+    'predict': bench_predict,
+    'batch': bench_batch,
+    'odds': bench_odds,
+    'fixtures': bench_fixtures,
+    'shared_cache': bench_shared_cache,
+    'bundle': bench_bundle,
+    'score_grid': bench_score_grid,
+    'football_data': bench_football_data,
+    'understat': bench_understat,
+    'column_store': bench_column_store,
+    'team_names': bench_team_names,
+    'feature_store': bench_feature_store,
+    'training': bench_training,
+    'search': bench_search,
+    'backtest': bench_backtest,
+    'compact': bench_compact,
+    'market_values': bench_market_values,
+    'team_history': bench_team_history,
+    'trees': bench_trees,
+    'prewarm': bench_prewarm,
+    'memo': bench_memo,
+    'metrics': bench_metrics,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    df = load_matches()
+    results = {name: BENCHMARKS[name](df) for name in names}
+    failed = [name for name, ok in results.items() if ok is not None and not ok]
+    if failed:
+        print(f"❌ Benchmarks com resultados diferentes da referência: {', '.join(failed)}")
+        sys.exit(1)
@@ -0,0 +1,216 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# --- ARMAZENAMENTO EM COLUNAS (TIPADO, PARTICIONADO) ---
+# Alternativa aos CSV (europe_football_full.csv, europe_football_xg.csv, market_values.csv):
+#   <dataset>/manifest.json   tipos das colunas, categorias, partições
+#   <dataset>/c<i>.npy        uma coluna inteira (np.save), lida com mmap
+# O mesmo layout do bundle do site (compact_frame / model_bundle). As linhas de cada partição
+# (ex: época 2014, E0) ficam seguidas em todas as colunas e o manifest guarda o intervalo de
+# cada uma, por isso ler só algumas partições é fatiar os mmaps (só essas páginas são lidas) e
+# ler só algumas colunas é abrir só esses ficheiros. Um ficheiro por coluna e não por coluna x
+# partição: com ~90 partições x 27 colunas, abrir milhares de .npy pequenos custa mais do que ler
+# os dados. Os nomes dos ficheiros são a posição da coluna (as colunas do Football-Data têm '<' e
+# '>', que não podem ir para nomes de ficheiro em todos os sistemas).
+# Datas ficam datetime64, texto (equipas, divisões, FTR...) fica categórico (códigos int32 +
+# categorias no manifest) e as stats no tipo numérico original. Ler não volta a fazer parse de
+# texto nem de datas. (Sem pyarrow nas dependências: .npy em vez de Parquet/Feather.)
+
+STORE_FORMAT = 2
+# Texto que volta como pd.Categorical ao ler; o resto do texto volta como strings (NaN onde faltava)
+CATEGORY_COLUMNS = ('Div', 'HomeTeam', 'AwayTeam', 'Team', 'League', 'FTR', 'HTR')
+
+
+def season_of(dates):
+    # Época = ano de início (agosto em diante conta para a época seguinte)
+    dates = pd.to_datetime(pd.Series(dates))
+    return np.where(dates.dt.month > 7, dates.dt.year, dates.dt.year - 1)
+
+
+def _encode(s):
+    # (array, spec) de uma coluna
+    if pd.api.types.is_datetime64_any_dtype(s):
+        values = s.to_numpy()
+        return values, {'kind': 'datetime', 'dtype': str(values.dtype)}
+    if pd.api.types.is_bool_dtype(s) or (pd.api.types.is_numeric_dtype(s) and not isinstance(s.dtype, pd.CategoricalDtype)):
+        values = s.to_numpy()
+        return values, {'kind': 'numeric', 'dtype': str(values.dtype)}
+    codes, categories = pd.factorize(s.astype(object), sort=True)
+    return codes.astype(np.int32), {'kind': 'category', 'categories': [str(c) for c in categories]}
+
+
+def _decode(values, spec, categorical=True):
+    if spec['kind'] == 'category':
+        if categorical:
+            return pd.Categorical.from_codes(values, spec['categories'])
+        return np.array(spec['categories'] + [np.nan], dtype=object)[values]  # código -1 -> NaN
+    return values
+
+
+def _json_value(v):
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def _load(path, spec):
+    return np.load(os.path.join(path, spec['file']), mmap_mode='r', allow_pickle=False)
+
+
+def _partitions(df, partition_by):
+    # (valores, nome, índices) por partição, pela ordem em que aparecem no df
+    for key, idx in df.groupby(partition_by, sort=False, dropna=False).indices.items():
+        key = key if isinstance(key, tuple) else (key,)
+        values = {c: _json_value(v) for c, v in zip(partition_by, key)}
+        yield values, '/'.join(str(v) for v in values.values()), idx
+
+
+def _save(path, arrays, manifest):
+    # Grava tudo num diretório temporário e troca no fim (o dataset nunca fica a meio)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for col, arr in arrays.items():
+        np.save(os.path.join(tmp, manifest['columns'][col]['file']), np.ascontiguousarray(arr))
+    with open(os.path.join(tmp, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    old = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path): os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+def _layout(groups):
+    # [(nome, valores, nº de linhas)] -> {nome: {'start', 'rows', 'values'}}, seguidas por esta ordem
+    partitions, start = {}, 0
+    for name, values, rows in groups:
+        partitions[name] = {'start': start, 'rows': rows, 'values': values}
+        start += rows
+    return partitions
+
+
+def write_dataset(df, path, partition_by=('Season', 'Div'), meta=None):
+    # Reescreve o dataset inteiro. As partições ficam pela ordem em que aparecem no df (linhas
+    # pela ordem original dentro de cada uma), por isso um df já agrupado volta igual ao ler tudo.
+    df = df.reset_index(drop=True)
+    partition_by = list(partition_by)
+    groups = list(_partitions(df, partition_by))
+    order = np.concatenate([idx for _, _, idx in groups]) if groups else np.arange(0)
+    arrays, columns = {}, {}
+    for i, col in enumerate(df.columns):
+        values, columns[col] = _encode(df[col])
+        columns[col]['file'] = f"c{i}.npy"
+        arrays[col] = values[order]
+
+    manifest = {'format': STORE_FORMAT, 'partition_by': partition_by, 'rows': len(df), 'columns': columns,
+                'partitions': _layout((name, values, len(idx)) for values, name, idx in groups), 'meta': meta or {}}
+    return _save(path, arrays, manifest)
+
+
+def append_dataset(df, path, meta=None):
+    # Acrescenta linhas no fim de cada partição (partições novas no fim do dataset). As colunas são
+    # reescritas (são poucos ficheiros); as categorias novas entram no fim da lista (os códigos já
+    # gravados não mudam). As colunas têm de ser as mesmas; um valor que não cabe no tipo gravado
+    # (ex: NaN numa coluna inteira) levanta ValueError.
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"Dataset não encontrado: {path}")
+    specs = manifest['columns']
+    if set(df.columns) != set(specs):
+        raise ValueError(f"Colunas diferentes das do dataset: {sorted(set(df.columns) ^ set(specs))}")
+    df = df.reset_index(drop=True)
+
+    arrays = {}
+    for col, spec in specs.items():
+        s = df[col]
+        if spec['kind'] == 'category':
+            position = {c: i for i, c in enumerate(spec['categories'])}
+            codes, uniques = pd.factorize(s.astype(object))
+            mapping = np.empty(len(uniques), dtype=np.int32)
+            for i, value in enumerate(uniques):
+                value = str(value)
+                if value not in position:
+                    position[value] = len(spec['categories'])
+                    spec['categories'].append(value)
+                mapping[i] = position[value]
+            arrays[col] = np.where(codes >= 0, mapping[codes] if len(uniques) else codes, -1).astype(np.int32)
+        else:
+            arrays[col] = s.astype(spec['dtype']).to_numpy()
+
+    # Posição final de cada linha: antigas (0..rows-1) e novas (rows + i), partição a partição
+    old_rows = manifest['rows']
+    new_parts = {name: (values, idx) for values, name, idx in _partitions(df, manifest['partition_by'])}
+    groups, pieces = [], []
+    for name, part in manifest['partitions'].items():
+        _, idx = new_parts.pop(name, (None, np.arange(0)))
+        pieces += [np.arange(part['start'], part['start'] + part['rows']), old_rows + idx]
+        groups.append((name, part['values'], part['rows'] + len(idx)))
+    for name, (values, idx) in new_parts.items():
+        pieces.append(old_rows + idx)
+        groups.append((name, values, len(idx)))
+    order = np.concatenate(pieces) if pieces else np.arange(0)
+    arrays = {col: np.concatenate([_load(path, spec), arrays[col]])[order] for col, spec in specs.items()}
+
+    manifest['partitions'] = _layout(groups)
+    manifest['rows'] += len(df)
+    if meta is not None: manifest['meta'] = meta
+    return _save(path, arrays, manifest)
+
+
+def read_manifest(path):
+    manifest_path = os.path.join(path, 'manifest.json')
+    if not os.path.exists(manifest_path): return None
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest if manifest.get('format') == STORE_FORMAT else None
+
+
+def dataset_exists(path):
+    return read_manifest(path) is not None
+
+
+def read_dataset(path, columns=None, filters=None, categorical=CATEGORY_COLUMNS):
+    # filters: {coluna de partição: valores aceites}, ex: {'Season': range(2018, 2025), 'Div': ['E0']}
+    # categorical: colunas de texto devolvidas como pd.Categorical (True = todas)
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"Dataset não encontrado: {path}")
+    columns = list(columns or manifest['columns'])
+    filters = {k: set(v) for k, v in (filters or {}).items()}
+    parts = [p for p in manifest['partitions'].values()
+             if all(p['values'].get(k) in accepted for k, accepted in filters.items())]
+
+    specs = manifest['columns']
+    total = sum(p['rows'] for p in parts)
+    values = {}
+    for col in columns:
+        data = _load(path, specs[col])
+        if len(parts) == len(manifest['partitions']):
+            values[col] = np.array(data)  # tudo: uma cópia da coluna inteira
+            continue
+        values[col] = np.empty(total, dtype=data.dtype)
+        start = 0
+        for part in parts:
+            values[col][start:start + part['rows']] = data[part['start']:part['start'] + part['rows']]
+            start += part['rows']
+
+    categorical = set(columns) if categorical is True else set(categorical or ())
+    return pd.DataFrame({col: _decode(values[col], specs[col], col in categorical) for col in columns})
+
+
+# --- COMPATIBILIDADE CSV ---
+def export_csv(path, csv_path, **kwargs):
+    read_dataset(path, **kwargs).to_csv(csv_path, index=False)
+
+
+def import_csv(csv_path, path, partition_by=('Season', 'Div'), date_cols=('Date',), dayfirst=False, meta=None):
+    df = pd.read_csv(csv_path, low_memory=False)
+    for col in date_cols:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], dayfirst=dayfirst, errors='coerce')
+    if 'Season' in partition_by and 'Season' not in df.columns:
+        df['Season'] = season_of(df['Date'])
+    return write_dataset(df, path, partition_by, meta)
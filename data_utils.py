@@ -1,148 +1,73 @@
 import pandas as pd
 import numpy as np
-import requests
-import re
 import os
-import codecs
-import json
 import kagglehub
 import time
 import random
 import cloudscraper # <--- O SEGREDO ESTÁ AQUI
+import sys
+import hashlib
+
+# Módulos partilhados com o site (web/api): o notebook e o servidor usam o mesmo código
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web', 'api'))
+from elo_engine import EloEngine
+from football_data import FD_DIVISIONS, FD_CACHE_DIR, PartitionCache, sync_partitions, load_partitions, print_report
+from understat import UNDERSTAT_LEAGUES, UNDERSTAT_CACHE_DIR, UnderstatScraper, extract_matches_json, matches_to_frame, load_understat
+from column_store import season_of, write_dataset, read_dataset, read_manifest, dataset_exists
+from team_names import TeamResolver, resolve_team, resolver as team_resolver
+from market_values import squad_values, market_value_lookup
+from metrics import timed
 
 # --- CONFIGURAÇÃO DE CONSTANTES ---
 DATA_FILE = 'europe_football_full.csv'
 XG_FILE = 'europe_football_xg.csv'
 MARKET_VALUE_FILE = 'market_values.csv'
+ELO_FILE = 'elo_state.npz'
+
+# Versões tipadas em colunas (ver column_store.py); os CSV continuam a ser escritos como export
+MATCH_STORE = os.path.join('store', 'matches')
+XG_STORE = os.path.join('store', 'xg')
+MARKET_VALUE_STORE = os.path.join('store', 'market_values')
 
 def clean_team_name(name):
-    name_map = {
-        # --- PORTUGAL ---
-        'Sp Braga': 'Braga', 'SC Braga': 'Braga',
-        'Sp Lisbon': 'Sporting CP', 'Sporting Lisbon': 'Sporting CP', 'Sporting': 'Sporting CP',
-        'Benfica': 'Benfica', 'SL Benfica': 'Benfica',
-        'FC Porto': 'Porto', 'Porto': 'Porto',
-        'Vitoria Guimaraes': 'Vitoria SC', 'Vitoria de Guimaraes': 'Vitoria SC',
-        'Rio Ave': 'Rio Ave', 'Rio Ave FC': 'Rio Ave',
-        'Estoril': 'Estoril', 'GD Estoril Praia': 'Estoril',
-        'Arouca': 'Arouca', 'FC Arouca': 'Arouca',
-        'Famalicao': 'Famalicao', 'FC Famalicão': 'Famalicao',
-        'Boavista': 'Boavista', 'Boavista FC': 'Boavista',
-        'Gil Vicente': 'Gil Vicente', 'Gil Vicente FC': 'Gil Vicente',
-        'Estrela': 'Estrela Amadora', 'Estrela Amadora': 'Estrela Amadora',
-        'Casa Pia': 'Casa Pia', 'Casa Pia AC': 'Casa Pia',
-        'Moreirense': 'Moreirense', 'Moreirense FC': 'Moreirense',
-        'Farense': 'Farense', 'SC Farense': 'Farense',
-        'Nacional': 'Nacional', 'CD Nacional': 'Nacional',
-        'Santa Clara': 'Santa Clara', 'CD Santa Clara': 'Santa Clara',
-        'AVS': 'AVS', 'AVS FS': 'AVS',
-
-        # --- HOLANDA ---
-        'PSV Eindhoven': 'PSV', 'PSV': 'PSV',
-        'Ajax': 'Ajax', 'Ajax Amsterdam': 'Ajax',
-        'Feyenoord': 'Feyenoord', 'Feyenoord Rotterdam': 'Feyenoord',
-        'AZ Alkmaar': 'AZ Alkmaar', 'AZ': 'AZ Alkmaar',
-        'Twente': 'Twente', 'FC Twente': 'Twente',
-
-        # --- BÉLGICA ---
-        'Club Brugge': 'Club Brugge', 'Brugge': 'Club Brugge',
-        'Anderlecht': 'Anderlecht', 'RSC Anderlecht': 'Anderlecht',
-        'Gent': 'Gent', 'KAA Gent': 'Gent',
-        'Genk': 'Genk', 'KRC Genk': 'Genk',
-        'Union St Gilloise': 'Union SG', 'Royale Union Saint-Gilloise': 'Union SG',
-
-        # --- TURQUIA ---
-        'Galatasaray': 'Galatasaray',
-        'Fenerbahce': 'Fenerbahce', 'Fenerbahçe': 'Fenerbahce',
-        'Besiktas': 'Besiktas', 'Beşiktaş': 'Besiktas',
-        'Trabzonspor': 'Trabzonspor',
-        'Basaksehir': 'Basaksehir',
-
-        # --- GRÉCIA ---
-        'Olympiakos': 'Olympiacos', 'Olympiacos': 'Olympiacos',
-        'PAOK': 'PAOK', 'PAOK Salonika': 'PAOK',
-        'Panathinaikos': 'Panathinaikos',
-        'AEK': 'AEK Athens', 'AEK Athens': 'AEK Athens',
-
-        # --- ESCÓCIA ---
-        'Celtic': 'Celtic',
-        'Rangers': 'Rangers',
-
-        # --- INGLATERRA ---
-        'Manchester United': 'Man United', 'Manchester City': 'Man City',
-        'Newcastle United': 'Newcastle', 'West Ham United': 'West Ham', 
-        'Wolverhampton Wanderers': 'Wolves', 'Brighton': 'Brighton',
-        'Leicester City': 'Leicester', 'Leeds United': 'Leeds',
-        'Tottenham Hotspur': 'Tottenham', 'Nottingham Forest': "Nott'm Forest", 
-        'Sheffield United': 'Sheffield United', 'Luton': 'Luton', 
-        'Brentford': 'Brentford', 'Bournemouth': 'Bournemouth',
-        'West Brom': 'West Bromwich Albion', 'West Bromwich': 'West Bromwich Albion',
-        'QPR': 'Queens Park Rangers', 'Blackburn': 'Blackburn Rovers',
-        'Coventry': 'Coventry City', 'Stoke': 'Stoke City', 'Hull': 'Hull City',
-        
-        # --- ALEMANHA ---
-        'Bayern Munich': 'Bayern Munich', 'Bayern München': 'Bayern Munich',
-        'Borussia Dortmund': 'Borussia Dortmund', 'Dortmund': 'Borussia Dortmund',
-        'Bayer Leverkusen': 'Bayer Leverkusen', 'Leverkusen': 'Bayer Leverkusen',
-        'RB Leipzig': 'RB Leipzig', 'Leipzig': 'RB Leipzig',
-        'Borussia Monchengladbach': 'Borussia M.Gladbach', "M'gladbach": 'Borussia M.Gladbach',
-        'Eintracht Frankfurt': 'Eintracht Frankfurt', 'Frankfurt': 'Eintracht Frankfurt',
-        'Wolfsburg': 'Wolfsburg', 'VfL Wolfsburg': 'Wolfsburg',
-        'Mainz 05': 'Mainz 05', 'Mainz': 'Mainz 05',
-        'Stuttgart': 'VfB Stuttgart', 'VfB Stuttgart': 'VfB Stuttgart',
-        'Freiburg': 'Freiburg', 'SC Freiburg': 'Freiburg',
-        'Union Berlin': 'Union Berlin', 'FC Union Berlin': 'Union Berlin',
-        'Bochum': 'VfL Bochum', 'VfL Bochum': 'VfL Bochum',
-        'Koln': 'FC Koln', 'FC Köln': 'FC Koln',
-        'Hertha': 'Hertha Berlin', 'Hertha BSC': 'Hertha Berlin',
-        'Schalke 04': 'Schalke 04', 'Schalke': 'Schalke 04',
-        'Hamburg': 'Hamburger SV', 'Hamburger': 'Hamburger SV',
-        'Hannover': 'Hannover 96', 'Kaiserslautern': 'FC Kaiserslautern',
-        'Nurnberg': 'FC Nurnberg', 'Dusseldorf': 'Fortuna Dusseldorf',
-
-        # --- ESPANHA ---
-        'Ath Bilbao': 'Athletic Club', 'Athletic Bilbao': 'Athletic Club',
-        'Atl Madrid': 'Atletico Madrid', 'Atletico': 'Atletico Madrid',
-        'Barcelona': 'Barcelona', 'Real Madrid': 'Real Madrid',
-        'Betis': 'Real Betis', 'Real Betis': 'Real Betis',
-        'Celta': 'Celta Vigo', 'Celta Vigo': 'Celta Vigo',
-        'Espanol': 'Espanyol', 'Espanyol': 'Espanyol',
-        'Sociedad': 'Real Sociedad', 'Real Sociedad': 'Real Sociedad',
-        'Valencia': 'Valencia', 'Valladolid': 'Real Valladolid', 
-        'Villarreal': 'Villarreal', 'Girona': 'Girona',
-        'Alaves': 'Alaves', 'Cadiz': 'Cadiz', 'Almeria': 'Almeria',
-        'Sp Gijon': 'Sporting Gijon', 'Zaragoza': 'Real Zaragoza',
-        'Levante': 'Levante', 'Tenerife': 'Tenerife', 'Eibar': 'Eibar',
-
-        # --- FRANÇA ---
-        'Paris SG': 'Paris Saint Germain', 'PSG': 'Paris Saint Germain',
-        'Marseille': 'Marseille', 'Lyon': 'Lyon', 'Monaco': 'Monaco',
-        'Lille': 'Lille', 'Nice': 'Nice', 'Rennes': 'Rennes',
-        'Lens': 'Lens', 'Montpellier': 'Montpellier', 'Nantes': 'Nantes',
-        'Reims': 'Reims', 'Strasbourg': 'Strasbourg', 'Toulouse': 'Toulouse',
-        'Brest': 'Brest', 'Lorient': 'Lorient', 'Metz': 'Metz',
-        'St Etienne': 'Saint-Etienne', 'Saint-Etienne': 'Saint-Etienne',
-        'Bordeaux': 'Girondins Bordeaux', 'Auxerre': 'Auxerre',
-        'Ajaccio': 'AC Ajaccio', 'Troyes': 'Troyes',
-
-        # --- ITÁLIA ---
-        'Inter': 'Inter', 'Internazionale': 'Inter',
-        'Milan': 'AC Milan', 'Juventus': 'Juventus', 'Roma': 'Roma', 
-        'Lazio': 'Lazio', 'Napoli': 'Napoli', 'Atalanta': 'Atalanta', 
-        'Fiorentina': 'Fiorentina', 'Torino': 'Torino', 'Udinese': 'Udinese',
-        'Bologna': 'Bologna', 'Verona': 'Verona', 'Hellas Verona': 'Verona',
-        'Empoli': 'Empoli', 'Lecce': 'Lecce', 'Sassuolo': 'Sassuolo',
-        'Monza': 'Monza', 'Genoa': 'Genoa', 'Salernitana': 'Salernitana',
-        'Parma': 'Parma', 'Sampdoria': 'Sampdoria', 'Cremonese': 'Cremonese',
-        'Venezia': 'Venezia', 'Palermo': 'Palermo', 'Bari': 'Bari',
-
-        # --- OUTROS (CHAMPIONS LEAGUE) ---
-        'Shakhtar Donetsk': 'Shakhtar Donetsk',
-        'Salzburg': 'RB Salzburg', 'Red Bull Salzburg': 'RB Salzburg'
-    }
-    return name_map.get(name, name)
+    # Mapa único de aliases em web/api/team_names.py (o mesmo que o site usa)
+    return resolve_team(name)
+
+def clean_team_names(s):
+    # Versão vetorizada: cada nome distinto é resolvido uma vez
+    return team_resolver.resolve_series(s)
+
+def align_team_names(df, known, columns=('HomeTeam', 'AwayTeam'), label='Equipas', unique=None):
+    # Nomes de outra fonte (Understat, Transfermarkt) -> nomes do histórico, só por alias ou chave
+    # exata (ver team_names.py); imprime o que ficou sem correspondência.
+    # unique: colunas que, com a equipa, identificam uma linha (ex: ('Season',) nos valores de
+    # mercado). Dois nomes da fonte que caiam na mesma equipa e na mesma chave não são resolvidos
+    # em silêncio: fica só o que já tinha o nome do histórico e os outros voltam ao nome original.
+    resolver = TeamResolver(known=pd.unique(np.asarray(known, dtype=object)))
+    columns = [c for c in columns if c in df.columns]
+    out = resolver.resolve_frame(df, columns)
+    if unique is not None:
+        for col in columns:
+            out[col] = refuse_collisions(df[col], out[col], df[list(unique)], label)
+    resolver.print_report(label)
+    return out
+
+def refuse_collisions(source, target, keys, label='Equipas', top=15):
+    # Nome resolvido onde não há colisão; o nome original onde outra grafia da fonte já é essa equipa
+    src, dst = source.to_numpy(dtype=object), target.to_numpy(dtype=object)
+    frame = keys.reset_index(drop=True).assign(_src=src, _dst=dst)
+    names = frame.groupby(['_dst', *keys.columns], dropna=False, observed=True)['_src'].transform('nunique').to_numpy()
+    clash = (names > 1) & (src != dst)
+    if not clash.any():
+        return target
+    pairs = sorted(set(zip(src[clash], dst[clash])))
+    print(f"   ⚠️ {label}: {len(pairs)} nomes recusados (outra grafia da fonte já é essa equipa na mesma chave)")
+    for name, team in pairs[:top]:
+        print(f"      ✋ {name} -/-> {team}")
+    return pd.Series(np.where(clash, src, dst), index=target.index, name=target.name, dtype=object)
 
 def scrape_understat_season(year, league_name):
+    # Uma liga/época, sem cache (o get_understat_data usa o UnderstatScraper, com cache e limite de ritmo)
     # Proteção: Understat não tem dados futuros
     if year > 2024: return pd.DataFrame()
 
@@ -162,157 +87,236 @@ def scrape_understat_season(year, league_name):
             print(f"   ❌ Erro HTTP: {response.status_code}")
             return pd.DataFrame()
         
-        # 2. Regex Universal: Procura qualquer JSON.parse, não importa as aspas
-        # Captura o conteúdo dentro de: JSON.parse('...') ou JSON.parse("...")
-        candidates = re.findall(r"JSON\.parse\s*\(\s*(['\"])(.*?)\1\s*\)", response.text, re.DOTALL)
-        
-        data = None
-        
-        # Procura nos candidatos encontrados
-        for quote, content in candidates:
-            try:
-                # Descodificar caracteres hexadecimais (\x5B -> [)
-                json_string = codecs.decode(content, 'unicode_escape')
-                temp_data = json.loads(json_string)
-                
-                # Validação: É a lista de jogos?
-                # Deve ser uma lista e o primeiro item deve ter 'h' (home), 'a' (away) e 'goals'
-                if isinstance(temp_data, list) and len(temp_data) > 0:
-                    if all(k in temp_data[0] for k in ['h', 'a', 'goals', 'xG']):
-                        data = temp_data
-                        # print(f"   ✅ Encontrado! ({len(data)} jogos)") # Debug opcional
-                        break
-            except:
-                continue
-        
-        # Fallback: Se não encontrou com JSON.parse, tenta procurar 'var datesData = [...]' direto
-        if not data:
-            direct_match = re.search(r"var\s+datesData\s*=\s*(\[.*?\]);", response.text, re.DOTALL)
-            if direct_match:
-                try:
-                    data = json.loads(direct_match.group(1))
-                except: pass
+        # 2. JSON.parse('...') / var datesData = [...] (função pura em understat.py)
+        data = extract_matches_json(response.text)
 
         if not data:
             print(f"   ⚠️ Proteção ativa ou dados não encontrados para {league_name}.")
             return pd.DataFrame()
             
-        matches = []
-        for m in data:
-            if m.get('isResult', False):
-                matches.append({
-                    'Date': m['datetime'][:10],
-                    'HomeTeam': m['h']['title'],
-                    'AwayTeam': m['a']['title'],
-                    'FTHG': int(m['goals']['h']),
-                    'FTAG': int(m['goals']['a']),
-                    'Home_xG': float(m['xG']['h']),
-                    'Away_xG': float(m['xG']['a']),
-                    'League': league_name
-                })
-        return pd.DataFrame(matches)
+        return matches_to_frame(data, league_name)
         
     except Exception as e:
         print(f"   ❌ Erro técnico: {e}")
         return pd.DataFrame()
 
-def get_main_data(start, end):
-    if os.path.exists(DATA_FILE):
-        print(f"📂 Carregando dados locais: {DATA_FILE}")
-        df = pd.read_csv(DATA_FILE)
-        df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce')
-        return df
-    
-    print("🌐 A descarregar dados das Ligas (Football-Data)...")
-    dfs = []
-    base_url = "https://www.football-data.co.uk/mmz4281/{}/{}.csv"
-    
-    # Lista Completa de Ligas
-    divisions = [
-        'E0', 'D1', 'SP1', 'F1', 'I1', # Top 5
-        'E1', 'D2', 'SP2', 'F2', 'I2', # 2ªs Divisões
-        'P1', 'N1', 'B1', 'T1', 'G1', 'SC0' # Outras
-    ] 
-    
-    for year in range(start, end + 1):
-        season = f"{str(year)[-2:]}{str(year+1)[-2:]}"
-        for div in divisions:
-            try:
-                time.sleep(0.5)
-                url = base_url.format(season, div)
-                df = pd.read_csv(url)
-                df['Div'] = div
-                df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce')
-                dfs.append(df)
-            except: pass
-        
-    full_df = pd.concat(dfs, ignore_index=True).dropna(subset=['Date', 'FTR'])
+# --- ARMAZENAMENTO TIPADO ---
+def source_fingerprint(paths):
+    # Muda sempre que um ficheiro de origem aparece, desaparece ou é reescrito
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        if os.path.exists(path):
+            st = os.stat(path)
+            digest.update(f"{path}|{st.st_size}|{st.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+def load_store(path, source=None, **kwargs):
+    # Dataset tipado, ou None se não existir / tiver sido escrito a partir de outras fontes
+    manifest = read_manifest(path)
+    if manifest is None: return None
+    if source is not None and manifest['meta'].get('source') != source: return None
+    return read_dataset(path, **kwargs)
+
+@timed('data.get_main_data')
+def get_main_data(start, end, refresh=True):
+    # Cache por (época, divisão): só as partições ainda abertas (época atual) voltam a ser
+    # pedidas, com pedidos condicionais e em paralelo. refresh=False usa só o que está em cache.
+    # Se nenhuma partição mudou, carrega o dataset tipado (sem parse de CSV nem de datas).
+    if refresh:
+        print("🌐 A sincronizar dados das Ligas (Football-Data)...")
+        print_report(sync_partitions(start, end, FD_DIVISIONS))
+
+    cache = PartitionCache(FD_CACHE_DIR)
+    source = source_fingerprint(cache.path(y, d) for y in range(start, end + 1) for d in FD_DIVISIONS)
+    df = load_store(MATCH_STORE, source)
+    if df is not None:
+        print(f"📂 Partições sem alterações: a carregar {MATCH_STORE}")
+        return df.sort_values('Date', kind='stable').reset_index(drop=True)
+
+    full_df = load_partitions(start, end, FD_DIVISIONS)
+    if full_df.empty:
+        df = load_store(MATCH_STORE)
+        if df is not None:
+            print(f"📂 Sem partições em cache: a carregar dados locais {MATCH_STORE}")
+            return df.sort_values('Date', kind='stable').reset_index(drop=True)
+        if os.path.exists(DATA_FILE):
+            print(f"📂 Sem partições em cache: a carregar dados locais {DATA_FILE}")
+            df = pd.read_csv(DATA_FILE)
+            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')  # o to_csv escreve AAAA-MM-DD
+            return df
+        print("❌ Sem dados das Ligas (nem em cache nem no Football-Data).")
+        return full_df
+
+    full_df = full_df.dropna(subset=['Date', 'FTR'])
     
     # Limpeza de Nomes
-    full_df['HomeTeam'] = full_df['HomeTeam'].apply(clean_team_name)
-    full_df['AwayTeam'] = full_df['AwayTeam'].apply(clean_team_name)
+    full_df['HomeTeam'] = clean_team_names(full_df['HomeTeam'])
+    full_df['AwayTeam'] = clean_team_names(full_df['AwayTeam'])
+    full_df['Season'] = season_of(full_df['Date'])
 
+    write_dataset(full_df, MATCH_STORE, ('Season', 'Div'), meta={'source': source, 'start': start, 'end': end})
     full_df.to_csv(DATA_FILE, index=False)
-    print(f"✅ Dados das Ligas (1ª e 2ª Divisões) guardados em: {DATA_FILE}")
+    print(f"✅ Dados das Ligas (1ª e 2ª Divisões) guardados em: {MATCH_STORE} (+ {DATA_FILE})")
     
-    return full_df.sort_values('Date').reset_index(drop=True)
+    return read_dataset(MATCH_STORE).sort_values('Date', kind='stable').reset_index(drop=True)
 
+@timed('data.prepare_market_values')
 def prepare_market_values():
+    if dataset_exists(MARKET_VALUE_STORE):
+        print(f"📂 Carregando dados locais: {MARKET_VALUE_STORE}")
+        return
     if os.path.exists(MARKET_VALUE_FILE):
+        # Só o CSV antigo: converter uma vez para o formato tipado
         print(f"📂 Carregando dados locais: {MARKET_VALUE_FILE}")
+        write_dataset(read_market_values_csv(MARKET_VALUE_FILE), MARKET_VALUE_STORE, ('Season',))
         return
 
     print("⬇️ A baixar dados do Transfermarkt via Kagglehub...")
     try:
         path = kagglehub.dataset_download("davidcariboo/player-scores")
         
-        valuations = pd.read_csv(os.path.join(path, "player_valuations.csv"))
-        clubs = pd.read_csv(os.path.join(path, "clubs.csv"))
-        
-        valuations['date'] = pd.to_datetime(valuations['date'])
-        valuations['Season'] = valuations['date'].apply(lambda x: x.year if x.month > 7 else x.year - 1)
-        
-        val_merged = valuations.merge(clubs[['club_id', 'name']], left_on='current_club_id', right_on='club_id', how='left')
-        squad_values = val_merged.groupby(['name', 'Season'])['market_value_in_eur'].sum().reset_index()
-        squad_values.rename(columns={'name': 'Team', 'market_value_in_eur': 'Value'}, inplace=True)
-        squad_values['Value'] = squad_values['Value'] / 1_000_000
-        
-        squad_values['Team'] = squad_values['Team'].apply(clean_team_name)
+        # Lido em blocos e somado por clube/época à medida (ver market_values.py)
+        squad = squad_values(os.path.join(path, "player_valuations.csv"), os.path.join(path, "clubs.csv"))
+        squad['Team'] = clean_team_names(squad['Team'])
         
-        squad_values.to_csv(MARKET_VALUE_FILE, index=False)
-        print(f"✅ 'market_values.csv' criado com sucesso!")
+        write_dataset(squad, MARKET_VALUE_STORE, ('Season',))
+        squad.to_csv(MARKET_VALUE_FILE, index=False)
+        print(f"✅ '{MARKET_VALUE_STORE}' (+ 'market_values.csv') criado com sucesso!")
         
     except Exception as e:
         print(f"⚠️ Erro ao processar dados do Kaggle: {e}")
 
-def get_understat_data(start_year, end_year):
-    if os.path.exists(XG_FILE):
-        print(f"📂 Carregando dados Understat locais: {XG_FILE}")
-        df = pd.read_csv(XG_FILE)
-        df['Date'] = pd.to_datetime(df['Date']) 
+def read_market_values_csv(path=MARKET_VALUE_FILE):
+    # Colunas Team / Season / Value (aceita 'Year' em vez de 'Season', nomes com outra capitalização)
+    mv_df = pd.read_csv(path)
+    mv_df.columns = [c.strip().capitalize() for c in mv_df.columns]
+    if 'Year' in mv_df.columns: mv_df.rename(columns={'Year': 'Season'}, inplace=True)
+    mv_df = mv_df.dropna(subset=['Season'])
+    mv_df['Season'] = mv_df['Season'].astype(int)
+    return mv_df
+
+@timed('data.load_market_values')
+def load_market_values(seasons=None, teams=None):
+    # Valores de plantel (Team, Season, Value): formato tipado, senão o CSV; vazio se não houver nenhum.
+    # teams: nomes do histórico, para alinhar os nomes do Transfermarkt (ver align_team_names)
+    filters = {'Season': list(seasons)} if seasons is not None else None
+    df = load_store(MARKET_VALUE_STORE, filters=filters)
+    if df is None and os.path.exists(MARKET_VALUE_FILE):
+        df = read_market_values_csv(MARKET_VALUE_FILE)
+        df = df if seasons is None else df[df['Season'].isin(list(seasons))]
+    if df is None:
+        return pd.DataFrame(columns=['Team', 'Season', 'Value'])
+    if teams is not None:
+        df = align_team_names(df, teams, columns=('Team',), label='Valores de mercado', unique=('Season',))
+    return df
+
+def market_values_fingerprint():
+    # Para a feature store: os valores de mercado também entram na feature_engineering
+    return source_fingerprint([os.path.join(MARKET_VALUE_STORE, 'manifest.json'), MARKET_VALUE_FILE])
+
+@timed('data.get_understat_data')
+def get_understat_data(start_year, end_year, refresh=True, max_in_flight=3, rate=0.5):
+    # Cada liga/época é gravada em understat_cache/ assim que chega: uma corrida interrompida
+    # retoma daí e épocas terminadas não voltam a ser pedidas. refresh=False usa só a cache.
+    if refresh:
+        print("🌐 A sincronizar xG do Understat (com CloudScraper)...")
+        report = UnderstatScraper(max_in_flight=max_in_flight, rate=rate).run(start_year, end_year, UNDERSTAT_LEAGUES)
+        print(f"   📦 Ligas/épocas: {len(report['cached'])} em cache | {len(report['downloaded'])} descarregadas | "
+              f"{len(report['failed'])} falhadas")
+        for key, error in sorted(report['failed'].items()):
+            print(f"   ❌ {key}: {error}")
+
+    cache = PartitionCache(UNDERSTAT_CACHE_DIR)
+    source = source_fingerprint(cache.path(y, l) for y in range(start_year, end_year + 1) for l in UNDERSTAT_LEAGUES)
+    df = load_store(XG_STORE, source)
+    if df is not None:
+        print(f"📂 xG sem alterações: a carregar {XG_STORE}")
         return df
 
-    print("🌐 A iniciar scraping Understat (com CloudScraper)...")
-    dfs = []
-    
-    for y in range(start_year, end_year + 1):
-        dfs.append(scrape_understat_season(y, 'EPL'))
-        dfs.append(scrape_understat_season(y, 'Bundesliga'))
-        dfs.append(scrape_understat_season(y, 'La_liga'))
-        dfs.append(scrape_understat_season(y, 'Ligue_1'))
-        dfs.append(scrape_understat_season(y, 'Serie_A'))
-        dfs.append(scrape_understat_season(y, 'Champions_League'))
-    
-    valid_dfs = [d for d in dfs if not d.empty]
+    df_final = load_understat(start_year, end_year, UNDERSTAT_LEAGUES)
     
-    if valid_dfs:
-        df_final = pd.concat(valid_dfs, ignore_index=True)
-        df_final['HomeTeam'] = df_final['HomeTeam'].apply(clean_team_name)
-        df_final['AwayTeam'] = df_final['AwayTeam'].apply(clean_team_name)
+    if not df_final.empty:
+        df_final['HomeTeam'] = clean_team_names(df_final['HomeTeam'])
+        df_final['AwayTeam'] = clean_team_names(df_final['AwayTeam'])
+        df_final['Date'] = pd.to_datetime(df_final['Date'])
+        df_final['Season'] = season_of(df_final['Date'])
         
-        # GRAVAR LOCALMENTE
+        # GRAVAR LOCALMENTE (tipado + export CSV completo)
+        write_dataset(df_final, XG_STORE, ('Season', 'League'), meta={'source': source, 'start': start_year, 'end': end_year})
         df_final.to_csv(XG_FILE, index=False)
         print(f"✅ Dados Understat guardados.")
-        return df_final
+        return read_dataset(XG_STORE)
+    elif dataset_exists(XG_STORE):
+        print(f"📂 Carregando dados Understat locais: {XG_STORE}")
+        return read_dataset(XG_STORE)
+    elif os.path.exists(XG_FILE):
+        print(f"📂 Carregando dados Understat locais: {XG_FILE}")
+        df = pd.read_csv(XG_FILE)
+        df['Date'] = pd.to_datetime(df['Date']) 
+        return df
     else:
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+# --- CLASSIFICAÇÃO (PONTOS / JOGOS / POSIÇÃO PRÉ-JOGO) ---
+def compute_standings(df):
+    # Substitui o loop iterrows da feature_engineering: calcula a tabela antes de cada jogo
+    # para todos os jogos de uma vez. A ordem das linhas do df é a ordem cronológica
+    # (tal como no loop original) e os empates na tabela são desfeitos pela ordem de
+    # entrada da equipa na tabela, tal como o sorted() estável do Python fazia.
+    n = len(df)
+    res = df['FTR'].to_numpy()
+    pts_h = np.where(res == 'H', 3, np.where(res == 'D', 1, 0))
+    pts_a = np.where(res == 'A', 3, np.where(res == 'D', 1, 0))
+    home = df['HomeTeam'].to_numpy()
+    away = df['AwayTeam'].to_numpy()
+    divs = df['Div'].to_numpy()
+
+    out = {
+        'Home_Pts': np.zeros(n, dtype=np.int64), 'Away_Pts': np.zeros(n, dtype=np.int64),
+        'Home_Games': np.zeros(n, dtype=np.int64), 'Away_Games': np.zeros(n, dtype=np.int64),
+        'Home_Pos': np.full(n, 10, dtype=np.int64), 'Away_Pos': np.full(n, 10, dtype=np.int64),
+    }
+
+    keys = pd.DataFrame({'Season': df['Season'].to_numpy(), 'Div': divs})
+    for (_, div), idx in keys.groupby(['Season', 'Div'], sort=False, dropna=False).indices.items():
+        m = len(idx)
+        rows = np.arange(m)
+
+        # Intercalar casa/fora (h0, a0, h1, a1, ...): o código de cada equipa passa a ser
+        # a sua ordem de entrada na tabela, que é o critério de desempate.
+        interleaved = np.empty(2 * m, dtype=object)
+        interleaved[0::2] = home[idx]
+        interleaved[1::2] = away[idx]
+        codes, teams = pd.factorize(interleaved)
+        hc, ac = codes[0::2], codes[1::2]
+        n_teams = len(teams)
+
+        # Pontos e jogos acumulados ANTES de cada jogo (cumsum exclusivo por equipa)
+        delta = np.zeros((m, n_teams), dtype=np.int64)
+        delta[rows, hc] = pts_h[idx]
+        delta[rows, ac] = pts_a[idx]
+        played = np.zeros((m, n_teams), dtype=np.int64)
+        played[rows, hc] = 1
+        played[rows, ac] = 1
+        pts = np.cumsum(delta, axis=0) - delta
+        games = np.cumsum(played, axis=0) - played
+
+        out['Home_Pts'][idx] = pts[rows, hc]
+        out['Away_Pts'][idx] = pts[rows, ac]
+        out['Home_Games'][idx] = games[rows, hc]
+        out['Away_Games'][idx] = games[rows, ac]
+
+        if div == 'CL':
+            out['Home_Pos'][idx] = 1
+            out['Away_Pos'][idx] = 1
+            continue
+
+        # Equipas já na tabela neste jogo (inclui as duas que entram agora)
+        team_ids = np.arange(n_teams)
+        in_table = team_ids[None, :] < (np.maximum.accumulate(np.maximum(hc, ac)) + 1)[:, None]
+        for side, c in (('Home_Pos', hc), ('Away_Pos', ac)):
+            own = pts[rows, c][:, None]
+            ahead = (pts > own) | ((pts == own) & (team_ids[None, :] < c[:, None]))
+            out[side][idx] = 1 + (ahead & in_table).sum(axis=1)
+
+    return pd.DataFrame(out, index=df.index)
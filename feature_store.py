@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import hashlib
+import inspect
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+from column_store import season_of, write_dataset, append_dataset, read_dataset, read_manifest
+import data_utils
+import elo_engine
+import market_values
+import rolling_features
+import team_names
+from data_utils import EloEngine
+from rolling_features import ROLLING_WINDOWS
+
+# --- FEATURE STORE (ENGENHARIA DE FEATURES INCREMENTAL) ---
+# Guarda o resultado da feature_engineering (df_ready + features) e o estado necessário para
+# continuar a partir dele:
+#   <store>/ready/        df_ready em colunas (column_store), partições por época
+#   <store>/context/      jogos "em curso": a época aberta de cada divisão (classificação),
+#                         os últimos jogos de cada equipa (médias móveis) e o último jogo em
+#                         casa / fora (dias de descanso)
+#   <store>/elo_state.npz EloEngine depois do último jogo (a watermark marca o que já entrou)
+#   <store>/state.json    features, divisões, hash do histórico já processado, ...
+# Com jogos novos (posteriores à watermark), a feature_engineering corre só sobre
+# contexto + jogos novos, continuando do Elo e do LabelEncoder guardados, e as linhas novas
+# são acrescentadas ao df_ready. Tudo o que invalide o estado (histórico alterado, nova
+# divisão, outra versão da feature_engineering, valores de mercado novos...) leva a uma
+# reconstrução completa. check() compara o df_ready guardado com um rebuild.
+
+FEATURE_STORE_DIR = os.path.join('store', 'features')
+STORE_FORMAT = 1
+KEY_COLUMNS = ['Date', 'HomeTeam', 'AwayTeam']
+# Código de que a feature_engineering depende fora do notebook: qualquer mudança no código-fonte
+# destes módulos / funções também muda a chave do store (e obriga a reconstruir)
+FEATURE_DEPENDENCIES = (rolling_features, market_values, elo_engine, team_names, data_utils.compute_standings,
+                        data_utils.load_market_values, data_utils.align_team_names, data_utils.refuse_collisions)
+
+
+def code_hash(fn, deps=FEATURE_DEPENDENCIES):
+    # Muda quando o código da função muda (incluindo funções/constantes definidas lá dentro) ou
+    # quando muda o código-fonte de algum dos deps
+    digest = hashlib.sha256()
+
+    def visit(code):
+        digest.update(code.co_code)
+        for const in code.co_consts:
+            if hasattr(const, 'co_code'): visit(const)
+            else: digest.update(repr(const).encode())
+        digest.update(repr(code.co_names).encode())
+
+    visit(fn.__code__)
+    for dep in deps:
+        digest.update(inspect.getsource(dep).encode())
+    return digest.hexdigest()[:16]
+
+
+def history_hash(df, columns):
+    # Hash das linhas pela ordem em que estão (a ordem conta para a classificação e o Elo)
+    rows = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    return hashlib.sha256(rows.tobytes()).hexdigest()[:16]
+
+
+def select_context(raw, windows=ROLLING_WINDOWS):
+    # Jogos de que as features dos próximos jogos dependem (pela ordem original)
+    n = len(raw)
+    season = season_of(raw['Date'])
+    div = raw['Div'].to_numpy(dtype=object)
+    keep = np.zeros(n, dtype=bool)
+
+    # Classificação: a última época de cada divisão, completa
+    latest = pd.Series(season).groupby(div).transform('max').to_numpy()
+    keep |= season == latest
+
+    # Médias móveis: os últimos N jogos de cada equipa (casa ou fora); janela 'season': a época toda
+    teams = np.concatenate([raw['HomeTeam'].to_numpy(dtype=object), raw['AwayTeam'].to_numpy(dtype=object)])
+    rows = np.concatenate([np.arange(n), np.arange(n)])
+    order = np.argsort(rows, kind='stable')
+    teams, rows = teams[order], rows[order]
+    last_n = max([w for w in windows if w != 'season'] or [0])
+    from_end = pd.Series(rows).groupby(teams).cumcount(ascending=False).to_numpy()
+    keep[rows[from_end < last_n]] = True
+    if 'season' in windows:
+        seasons = season[rows]
+        team_latest = pd.Series(seasons).groupby(teams).transform('max').to_numpy()
+        keep[rows[seasons == team_latest]] = True
+
+    # Dias de descanso: último jogo em casa e último fora de cada equipa
+    for col in ('HomeTeam', 'AwayTeam'):
+        last = pd.Series(np.arange(n)).groupby(raw[col].to_numpy(dtype=object)).max().to_numpy()
+        keep[last] = True
+
+    return raw[keep]
+
+
+def label_encoder(classes):
+    le = LabelEncoder()
+    le.classes_ = np.array(classes, dtype=object)
+    return le
+
+
+class FeatureStore:
+    def __init__(self, path=FEATURE_STORE_DIR, windows=ROLLING_WINDOWS):
+        # windows: as janelas das médias móveis usadas pela feature_engineering (ROLLING_WINDOWS)
+        self.path = path
+        self.windows = tuple(windows)
+        self.state_path = os.path.join(path, 'state.json')
+        self.elo_path = os.path.join(path, 'elo_state.npz')
+        self.ready_path = os.path.join(path, 'ready')
+        self.context_path = os.path.join(path, 'context')
+        self.last_report = None
+
+    def read_state(self):
+        if not os.path.exists(self.state_path): return None
+        with open(self.state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('format') != STORE_FORMAT: return None
+        # Uma atualização interrompida (linhas acrescentadas sem o estado gravado) invalida o estado
+        ready = read_manifest(self.ready_path)
+        if ready is None or ready['rows'] != state['ready_rows']: return None
+        if read_manifest(self.context_path) is None or not os.path.exists(self.elo_path): return None
+        return state
+
+    def write_state(self, state):
+        tmp = f"{self.state_path}.tmp-{os.getpid()}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=1, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def load(self):
+        # (df_ready, features, elo_engine, le_div), como a feature_engineering devolve
+        state = self.read_state()
+        if state is None:
+            raise FileNotFoundError(f"Feature store não encontrada: {self.path}")
+        df_ready = read_dataset(self.ready_path)
+        return df_ready[state['ready_columns']], state['features'], EloEngine.load(self.elo_path), label_encoder(state['divisions'])
+
+    # --- CONSTRUÇÃO ---
+    def _processed(self, raw, engine):
+        # Linhas já processadas: antes da watermark do Elo, ou no próprio dia e já aplicadas
+        if engine.watermark is None: return np.zeros(len(raw), dtype=bool)
+        dates = raw['Date']
+        processed = (dates < engine.watermark).to_numpy().copy()
+        same_day = np.flatnonzero((dates == engine.watermark).to_numpy())
+        if len(same_day):
+            pairs = zip(raw['HomeTeam'].iloc[same_day], raw['AwayTeam'].iloc[same_day])
+            processed[same_day] = [p in engine.watermark_keys for p in pairs]
+        return processed
+
+    def _save(self, raw, ready, features, engine, le_div, fn_hash, fingerprint, append=False):
+        # ready: o df_ready completo, ou (append=True) só as linhas novas
+        os.makedirs(self.path, exist_ok=True)
+        if not append:
+            ready_rows = write_dataset(ready, self.ready_path, ('Season',))['rows']
+        elif len(ready):
+            ready_rows = append_dataset(ready, self.ready_path)['rows']
+        else:
+            ready_rows = read_manifest(self.ready_path)['rows']
+        write_dataset(select_context(raw, self.windows), self.context_path, ('Div',))
+        engine.save(self.elo_path)
+        self.write_state({
+            'format': STORE_FORMAT,
+            'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'function': fn_hash,
+            'fingerprint': fingerprint,
+            'windows': list(self.windows),
+            'raw_columns': list(raw.columns),
+            'raw_rows': len(raw),
+            'history': history_hash(raw, list(raw.columns)),
+            'features': list(features),
+            'divisions': [str(d) for d in le_div.classes_],
+            'ready_columns': list(ready.columns),
+            'ready_rows': ready_rows,
+        })
+
+    def rebuild(self, df, feature_fn, fingerprint=None, reason='pedido'):
+        t0 = time.perf_counter()
+        raw = df.sort_values('Date', kind='stable').reset_index(drop=True)
+        df_ready, features, engine, le_div = feature_fn(raw.copy())
+        self._save(raw, df_ready, features, engine, le_div, code_hash(feature_fn), fingerprint)
+        self.last_report = {'mode': 'full', 'reason': reason, 'new_rows': len(raw), 'rows': len(df_ready),
+                            'seconds': time.perf_counter() - t0}
+        return self.load()
+
+    def update(self, df, feature_fn, fingerprint=None):
+        # feature_fn(df, elo_engine=None, le_div=None, known_teams=None) -> (df_ready, features, elo_engine, le_div)
+        # fingerprint: muda quando outras entradas da feature_fn mudam (ex: valores de mercado)
+        t0 = time.perf_counter()
+        raw = df.sort_values('Date', kind='stable').reset_index(drop=True)
+        state = self.read_state()
+        if state is None:
+            return self.rebuild(raw, feature_fn, fingerprint, 'sem feature store')
+        if state['function'] != code_hash(feature_fn):
+            return self.rebuild(raw, feature_fn, fingerprint, 'feature_engineering (ou o código de que depende) alterada')
+        if state['fingerprint'] != fingerprint or state['windows'] != list(self.windows):
+            return self.rebuild(raw, feature_fn, fingerprint, 'outras entradas alteradas')
+        if state['raw_columns'] != list(raw.columns):
+            return self.rebuild(raw, feature_fn, fingerprint, 'colunas do histórico alteradas')
+
+        engine = EloEngine.load(self.elo_path)
+        processed = self._processed(raw, engine)
+        if processed.sum() != state['raw_rows'] or history_hash(raw[processed], state['raw_columns']) != state['history']:
+            return self.rebuild(raw, feature_fn, fingerprint, 'histórico já processado alterado')
+        new = raw[~processed]
+        if new.empty:
+            self.last_report = {'mode': 'unchanged', 'reason': None, 'new_rows': 0, 'seconds': time.perf_counter() - t0}
+            return self.load()
+
+        # Jogos novos numa época já fechada (a classificação dessa época não está no contexto)
+        context = read_dataset(self.context_path)[state['raw_columns']]
+        open_season = pd.Series(season_of(context['Date'])).groupby(context['Div'].to_numpy(dtype=object)).max()
+        new_season = pd.Series(season_of(new['Date']), index=new['Div'].to_numpy(dtype=object))
+        if (new_season < open_season.reindex(new_season.index).fillna(-1).to_numpy()).any():
+            return self.rebuild(raw, feature_fn, fingerprint, 'jogos novos numa época fechada')
+
+        batch = pd.concat([context.assign(_new=False), new.assign(_new=True)], ignore_index=True)
+        known = sorted(set(engine.teams) | set(new['HomeTeam']) | set(new['AwayTeam']))
+        try:
+            out, features, engine, le_div = feature_fn(batch, elo_engine=engine, le_div=label_encoder(state['divisions']), known_teams=known)
+        except ValueError as e:  # ex: divisão que o LabelEncoder não conhece
+            return self.rebuild(raw, feature_fn, fingerprint, f"estado incompatível ({e})")
+        if sorted(features) != sorted(state['features']):
+            return self.rebuild(raw, feature_fn, fingerprint, 'lista de features alterada')
+
+        rows = out[out['_new'].astype(bool)].drop(columns='_new')[state['ready_columns']]
+        try:
+            self._save(raw, rows, state['features'], engine, le_div, state['function'], fingerprint, append=True)
+        except ValueError as e:  # tipos incompatíveis com o df_ready guardado
+            return self.rebuild(raw, feature_fn, fingerprint, f"tipos alterados ({e})")
+        self.last_report = {'mode': 'incremental', 'reason': None, 'new_rows': len(new), 'rows': len(rows),
+                            'seconds': time.perf_counter() - t0}
+        return self.load()
+
+    # --- VERIFICAÇÃO ---
+    def check(self, df, feature_fn, atol=1e-9):
+        # Compara o df_ready guardado com uma reconstrução completa (sem gravar nada)
+        raw = df.sort_values('Date', kind='stable').reset_index(drop=True)
+        full, features, _, _ = feature_fn(raw.copy())
+        stored, stored_features, _, _ = self.load()
+        report = {'rows': len(stored), 'rebuild_rows': len(full), 'features': sorted(features) == sorted(stored_features)}
+
+        keys = lambda d: pd.MultiIndex.from_arrays([d[c].astype(object) if c != 'Date' else d[c] for c in KEY_COLUMNS])
+        full, stored = full.set_index(keys(full)), stored.set_index(keys(stored))
+        report['missing'] = int((~full.index.isin(stored.index)).sum())
+        report['extra'] = int((~stored.index.isin(full.index)).sum())
+        common = full.index.intersection(stored.index)
+        full, stored = full.reindex(common), stored.reindex(common)
+        diffs = {}
+        for f in features:
+            if f not in stored.columns: continue
+            a, b = full[f].to_numpy(dtype=np.float64), stored[f].to_numpy(dtype=np.float64)
+            both = ~(np.isnan(a) | np.isnan(b))
+            diff = float(np.abs(a[both] - b[both]).max()) if both.any() else 0.0
+            if diff > atol or (np.isnan(a) != np.isnan(b)).any(): diffs[f] = diff
+        report['max_diff'] = diffs
+        report['ok'] = report['features'] and not report['missing'] and not report['extra'] and not diffs
+        return report
+
+    def print_report(self):
+        r = self.last_report or {}
+        if r.get('mode') == 'unchanged':
+            print(f"🧮 Feature store: sem jogos novos ({r['seconds']:.2f}s)")
+        elif r.get('mode') == 'incremental':
+            print(f"🧮 Feature store: {r['new_rows']} jogos novos, {r['rows']} linhas acrescentadas ({r['seconds']:.2f}s)")
+        elif r.get('mode') == 'full':
+            print(f"🧮 Feature store: reconstrução completa ({r['reason']}), {r['rows']} linhas ({r['seconds']:.2f}s)")
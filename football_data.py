@@ -0,0 +1,177 @@
+import os
+import json
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- INGESTÃO FOOTBALL-DATA (PARTIÇÕES POR ÉPOCA / DIVISÃO) ---
+# Cada ficheiro (época, divisão) fica guardado à parte em CACHE_DIR/<época>/<div>.csv, com um
+# manifest (ETag, Last-Modified, data do download, estado). Uma partição descarregada depois
+# do fim da época é final e nunca mais é pedida; as restantes (a época atual) são pedidas com
+# If-None-Match / If-Modified-Since, por isso uma atualização semanal são ~16 pedidos, quase
+# todos 304. Os downloads correm num pool limitado de threads e as falhas vêm no relatório.
+
+FD_BASE_URL = "https://www.football-data.co.uk/mmz4281"
+FD_DIVISIONS = [
+    'E0', 'D1', 'SP1', 'F1', 'I1', # Top 5
+    'E1', 'D2', 'SP2', 'F2', 'I2', # 2ªs Divisões
+    'P1', 'N1', 'B1', 'T1', 'G1', 'SC0' # Outras
+]
+FD_CACHE_DIR = 'football_data_cache'
+SEASON_END_MONTH = 7  # a partir de julho, a época anterior está fechada
+
+
+def season_code(year):
+    return f"{str(year)[-2:]}{str(year + 1)[-2:]}"
+
+
+def season_end(year):
+    return datetime(year + 1, SEASON_END_MONTH, 1)
+
+
+def partition_key(year, div):
+    return f"{season_code(year)}/{div}"
+
+
+class PartitionCache:
+    def __init__(self, cache_dir=FD_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        self.lock = threading.Lock()
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+    def path(self, year, div):
+        return os.path.join(self.cache_dir, season_code(year), f"{div}.csv")
+
+    def entry(self, year, div):
+        return self.manifest.get(partition_key(year, div))
+
+    def is_final(self, year, div):
+        # Final = descarregada (ou confirmada inexistente) depois do fim da época
+        entry = self.entry(year, div)
+        if entry is None: return False
+        if entry['status'] == 'ok' and not os.path.exists(self.path(year, div)): return False
+        return datetime.fromisoformat(entry['checked']) >= season_end(year)
+
+    def write(self, year, div, content):
+        path = self.path(year, div)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp-{threading.get_ident()}"
+        with open(tmp, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def record(self, year, div, **fields):
+        with self.lock:
+            entry = self.manifest.setdefault(partition_key(year, div), {})
+            entry.update(fields)
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self.lock:
+            tmp = f"{self.manifest_path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.manifest_path)
+
+
+def fetch_partition(session, cache, year, div, base_url=FD_BASE_URL, timeout=(3.05, 30)):
+    # Devolve o estado: 'downloaded', 'not_modified', 'missing' (404) ou levanta exceção
+    url = f"{base_url.rstrip('/')}/{season_code(year)}/{div}.csv"
+    headers = {}
+    entry = cache.entry(year, div)
+    if entry and entry.get('status') == 'ok' and os.path.exists(cache.path(year, div)):
+        if entry.get('etag'): headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+
+    res = session.get(url, headers=headers, timeout=timeout)
+    checked = datetime.now().isoformat(timespec='seconds')
+    if res.status_code == 304:
+        cache.record(year, div, checked=checked)
+        return 'not_modified'
+    if res.status_code == 404:
+        cache.record(year, div, status='missing', checked=checked)
+        return 'missing'
+    res.raise_for_status()
+    if not res.content.lstrip(b'\xef\xbb\xbf \r\n').startswith(b'Div'):
+        raise ValueError("resposta não é um CSV do Football-Data")
+
+    cache.write(year, div, res.content)
+    cache.record(year, div, status='ok', checked=checked, etag=res.headers.get('ETag'),
+                 last_modified=res.headers.get('Last-Modified'), bytes=len(res.content))
+    return 'downloaded'
+
+
+def sync_partitions(start, end, divisions=FD_DIVISIONS, cache_dir=FD_CACHE_DIR, base_url=FD_BASE_URL,
+                    max_workers=4, refresh_all=False, timeout=(3.05, 30)):
+    # Atualiza a cache e devolve o relatório {estado: [chaves]} + {'failed': {chave: erro}}
+    cache = PartitionCache(cache_dir)
+    report = {'cached': [], 'downloaded': [], 'not_modified': [], 'missing': [], 'failed': {}}
+    todo = []
+    for year in range(start, end + 1):
+        for div in divisions:
+            if not refresh_all and cache.is_final(year, div):
+                report['cached'].append(partition_key(year, div))
+            else:
+                todo.append((year, div))
+
+    if todo:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        def run(year, div):
+            try:
+                return fetch_partition(session, cache, year, div, base_url, timeout), None
+            except Exception as e:
+                return 'failed', f"{e.__class__.__name__}: {e}"
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='football-data') as pool:
+            results = list(pool.map(lambda p: run(*p), todo))
+        for (year, div), (status, error) in zip(todo, results):
+            if status == 'failed': report['failed'][partition_key(year, div)] = error
+            else: report[status].append(partition_key(year, div))
+        cache.save()
+    return report
+
+
+def read_partition(path):
+    # Alguns ficheiros antigos do Football-Data não são UTF-8
+    try:
+        return pd.read_csv(path)
+    except UnicodeDecodeError:
+        return pd.read_csv(path, encoding='latin-1')
+
+
+def load_partitions(start, end, divisions=FD_DIVISIONS, cache_dir=FD_CACHE_DIR):
+    # Junta as partições em cache (as que existem) num único DataFrame
+    cache = PartitionCache(cache_dir)
+    dfs = []
+    for year in range(start, end + 1):
+        for div in divisions:
+            path = cache.path(year, div)
+            if not os.path.exists(path): continue
+            try:
+                df = read_partition(path)
+            except Exception as e:
+                print(f"⚠️ Partição {partition_key(year, div)} ilegível: {e}")
+                continue
+            df['Div'] = div
+            df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce')
+            dfs.append(df)
+    return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+
+
+def print_report(report):
+    print(f"   📦 Partições: {len(report['cached'])} em cache | {len(report['downloaded'])} descarregadas | "
+          f"{len(report['not_modified'])} sem alterações | {len(report['missing'])} inexistentes | "
+          f"{len(report['failed'])} falhadas")
+    for key, error in sorted(report['failed'].items()):
+        print(f"   ❌ {key}: {error}")
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from column_store import season_of
+
+# --- VALORES DE MERCADO (TRANSFERMARKT) EM STREAMING ---
+# O player_valuations.csv do Kaggle ("player-scores") cresce a cada atualização. Em vez de o
+# carregar inteiro, é lido em blocos só com date / current_club_id / market_value_in_eur, já
+# tipados; a época de cada bloco é calculada em arrays e os valores são somados por (clube, época)
+# à medida que os blocos chegam. A memória depende do nº de clubes x épocas, não do ficheiro.
+# Na feature_engineering, Home_Value / Away_Value vêm de um join por (equipa, época) em arrays,
+# com o mesmo fallback de sempre: 900 para os clubes de topo e 200 para o resto.
+
+VALUATION_DTYPES = {'date': str, 'current_club_id': 'Int32', 'market_value_in_eur': np.float64}
+CHUNK_ROWS = 250_000
+TIER_1 = ('Man City', 'Arsenal', 'Liverpool', 'Real Madrid', 'Barcelona', 'Bayern Munich', 'Paris Saint Germain', 'Inter')
+TIER_1_VALUE = 900
+DEFAULT_VALUE = 200
+
+
+def read_valuations(path, chunksize=CHUNK_ROWS):
+    # Blocos (club_id, Season, Value) do player_valuations.csv
+    for chunk in pd.read_csv(path, usecols=list(VALUATION_DTYPES), dtype=VALUATION_DTYPES, chunksize=chunksize):
+        dates = pd.to_datetime(chunk['date'], format='ISO8601', errors='coerce')
+        valid = dates.notna().to_numpy()  # datas inválidas ficam de fora (como antes, sem época)
+        yield pd.DataFrame({'club_id': chunk['current_club_id'].array[valid],
+                            'Season': season_of(dates[valid]).astype(np.int16),
+                            'Value': chunk['market_value_in_eur'].to_numpy()[valid]})
+
+
+def club_season_totals(path, chunksize=CHUNK_ROWS):
+    # Soma dos valores por (club_id, Season), acumulada bloco a bloco
+    totals = None
+    for chunk in read_valuations(path, chunksize):
+        part = chunk.groupby(['club_id', 'Season'])['Value'].sum()
+        totals = part if totals is None else totals.add(part, fill_value=0)
+    return totals if totals is not None else pd.Series(dtype=np.float64)
+
+
+def squad_values(valuations_path, clubs_path, chunksize=CHUNK_ROWS):
+    # (Team, Season, Value em M€), com o nome do clube do clubs.csv
+    totals = club_season_totals(valuations_path, chunksize).rename('Value').reset_index()
+    clubs = pd.read_csv(clubs_path, usecols=['club_id', 'name'], dtype={'club_id': 'Int32', 'name': str})
+    totals['Team'] = totals['club_id'].map(clubs.drop_duplicates('club_id').set_index('club_id')['name'])
+    squad = totals.dropna(subset=['Team']).groupby(['Team', 'Season'], as_index=False)['Value'].sum()
+    squad['Season'] = squad['Season'].astype(np.int64)
+    squad['Value'] = squad['Value'] / 1_000_000
+    return squad
+
+
+def market_value_lookup(teams, seasons, mv_df=None):
+    # Valor de cada (equipa, época) por join em arrays; sem valor, o fallback por tier
+    teams = np.asarray(teams, dtype=object)
+    fallback = np.where(np.isin(teams, TIER_1), TIER_1_VALUE, DEFAULT_VALUE).astype(np.float64)
+    if mv_df is None or not len(mv_df):
+        return fallback
+    table = mv_df[['Team', 'Season', 'Value']].assign(Season=pd.to_numeric(mv_df['Season'], errors='coerce'))
+    table = table.dropna(subset=['Season']).drop_duplicates()
+    clash = table.duplicated(['Team', 'Season'], keep=False)
+    if clash.any():
+        # Dois valores para a mesma (equipa, época): nenhum é escolhido, fica o fallback
+        print(f"⚠️ Valores de mercado: {clash.sum()} linhas com a mesma (equipa, época) e valores diferentes "
+              f"(ex: {', '.join(sorted(map(str, table.loc[clash, 'Team'].unique()))[:5])}): a usar o fallback")
+        table = table[~clash]
+    if not len(table):
+        return fallback
+    index = pd.MultiIndex.from_arrays([table['Team'].to_numpy(dtype=object), table['Season'].to_numpy(dtype=np.int64)])
+    pos = index.get_indexer(pd.MultiIndex.from_arrays([teams, np.asarray(seasons, dtype=np.int64)]))
+    return np.where(pos >= 0, table['Value'].to_numpy(dtype=np.float64)[pos], fallback)
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+# --- ROLLING STATS (MÉDIAS MÓVEIS POR EQUIPA) ---
+# Substitui o loop iterrows que construía o df_long e os groupby().transform(lambda ...)
+# por coluna. O formato longo é montado empilhando arrays (casa/fora intercalados) e
+# todas as médias saem de UMA soma acumulada por stat: cada janela (5, 10, época...)
+# é só uma diferença entre duas posições dessa soma, por isso acrescentar janelas
+# quase não custa nada.
+
+STAT_PAIRS = [
+    ('FTHG', 'FTAG', 'Goals_Scored'),
+    ('FTAG', 'FTHG', 'Goals_Conceded'),
+    ('HTHG', 'HTAG', 'HalfTime_Goals_Scored'),
+    ('HS', 'AS', 'Shots'),
+    ('HST', 'AST', 'Shots_Target'),
+    ('HC', 'AC', 'Corners'),
+    ('HF', 'AF', 'Fouls'),
+    ('HY', 'AY', 'YellowCards'),
+    ('HR', 'AR', 'RedCards'),
+    ('Home_xG', 'Away_xG', 'xG_For'),
+    ('Away_xG', 'Home_xG', 'xG_Against')
+]
+
+SEASON_WINDOW = 'season'
+# Janelas da feature_engineering; a FeatureStore usa as mesmas (só se configuram aqui).
+# Para janelas extra: (5, 10, SEASON_WINDOW)
+ROLLING_WINDOWS = (5,)
+
+
+def window_suffix(window):
+    return 'Season' if window == SEASON_WINDOW else str(window)
+
+
+def build_long_stats(df, stat_pairs=STAT_PAIRS):
+    # Uma linha por equipa por jogo: posição 2*i = casa do jogo i, 2*i+1 = fora
+    n = len(df)
+
+    def interleave(home_values, away_values):
+        out = np.empty(2 * n, dtype=np.result_type(home_values, away_values))
+        out[0::2] = home_values
+        out[1::2] = away_values
+        return out
+
+    long = {
+        'Date': interleave(df['Date'].to_numpy(), df['Date'].to_numpy()),
+        'Team': interleave(df['HomeTeam'].to_numpy(dtype=object), df['AwayTeam'].to_numpy(dtype=object)),
+    }
+    if 'Season' in df.columns:
+        long['Season'] = interleave(df['Season'].to_numpy(), df['Season'].to_numpy())
+
+    for col_h, col_a, name in stat_pairs:
+        if col_h in df.columns and col_a in df.columns:
+            long[name] = interleave(df[col_h].to_numpy(dtype=np.float64), df[col_a].to_numpy(dtype=np.float64))
+
+    res = df['FTR'].to_numpy()
+    pts_h = np.where(res == 'H', 3, np.where(res == 'D', 1, 0))
+    pts_a = np.where(res == 'A', 3, np.where(res == 'D', 1, 0))
+    long['Points'] = interleave(pts_h, pts_a)
+
+    return pd.DataFrame(long)
+
+
+def rolling_team_means(df_long, cols, windows=ROLLING_WINDOWS, min_periods=3):
+    # Equivalente a groupby('Team')[col].transform(lambda x: x.shift(1).rolling(w, min_periods).mean()).fillna(0)
+    # para todas as colunas e janelas de uma vez. Devolve um DataFrame alinhado com df_long.
+    team_codes = pd.factorize(df_long['Team'])[0]
+    order = np.lexsort((df_long['Date'].to_numpy(), team_codes))
+    team = team_codes[order]
+    m = len(order)
+    pos = np.arange(m)
+
+    # Início do grupo (equipa) e da época de cada linha, já na ordem (Team, Date)
+    new_team = np.r_[True, team[1:] != team[:-1]]
+    team_start = np.maximum.accumulate(np.where(new_team, pos, 0))
+    starts = {}
+    for window in windows:
+        if window == SEASON_WINDOW:
+            season = df_long['Season'].to_numpy()[order]
+            new_season = new_team | np.r_[True, season[1:] != season[:-1]]
+            starts[window] = np.maximum.accumulate(np.where(new_season, pos, 0))
+        else:
+            starts[window] = np.maximum(team_start, pos - int(window))
+
+    values = df_long[cols].to_numpy(dtype=np.float64)[order]
+    valid = ~np.isnan(values)
+    # Somas acumuladas com um zero à cabeça: soma de [a, b) = cum[b] - cum[a]
+    cum_sum = np.vstack([np.zeros((1, len(cols))), np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    cum_cnt = np.vstack([np.zeros((1, len(cols)), dtype=np.int64), np.cumsum(valid, axis=0)])
+
+    out = {}
+    inverse = np.empty(m, dtype=np.int64)
+    inverse[order] = pos
+    for window in windows:
+        start = starts[window]
+        # Janela = jogos anteriores (shift(1)): [start, pos)
+        sums = cum_sum[pos] - cum_sum[start]
+        counts = cum_cnt[pos] - cum_cnt[start]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts >= min_periods, sums / np.maximum(counts, 1), 0.0)[inverse]
+        suffix = window_suffix(window)
+        for j, col in enumerate(cols):
+            out[f'Avg_{col}_{suffix}'] = means[:, j]
+
+    return pd.DataFrame(out, index=df_long.index)
+
+
+def add_composite_stats(rolled, cols, windows=ROLLING_WINDOWS):
+    for window in windows:
+        s = window_suffix(window)
+        # Precisão (Remates à baliza / Total)
+        if 'Shots' in cols and 'Shots_Target' in cols:
+            shots, target = rolled[f'Avg_Shots_{s}'], rolled[f'Avg_Shots_Target_{s}']
+            rolled[f'Avg_Accuracy_{s}'] = np.where(shots > 0, target / shots.where(shots > 0, 1), 0)
+        # Conversão (Golos / Remates à baliza)
+        if 'Goals_Scored' in cols and 'Shots_Target' in cols:
+            target, goals = rolled[f'Avg_Shots_Target_{s}'], rolled[f'Avg_Goals_Scored_{s}']
+            rolled[f'Avg_Conversion_{s}'] = np.where(target > 0, goals / target.where(target > 0, 1), 0)
+    return rolled
+
+
+def attach_rolling_features(df, windows=ROLLING_WINDOWS, min_periods=3, stat_pairs=STAT_PAIRS):
+    # Acrescenta Home_Avg_* / Away_Avg_* ao df (mesmos nomes que o merge original)
+    df = df.reset_index(drop=True)
+    df_long = build_long_stats(df, stat_pairs)
+    cols = [c for c in df_long.columns if c not in ['Date', 'Team', 'Season']]
+    rolled = add_composite_stats(rolling_team_means(df_long, cols, windows, min_periods), cols, windows)
+
+    # Linha 2*i é a casa do jogo i e 2*i+1 a equipa de fora: sem merge
+    values = rolled.to_numpy()
+    home = pd.DataFrame(values[0::2], columns=[f'Home_{c}' for c in rolled.columns])
+    away = pd.DataFrame(values[1::2], columns=[f'Away_{c}' for c in rolled.columns])
+    return pd.concat([df, home, away], axis=1)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Os módulos partilhados vivem em web/api (como nos scripts da raiz)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'web', 'api')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,35 @@
+import time
+import threading
+
+from cache_backend import SQLiteCache, TieredCache
+
+
+def test_contains_and_items_do_not_count_as_hits(tmp_path):
+    cache = TieredCache(60, shared=SQLiteCache(str(tmp_path / 'cache.sqlite3')))
+    cache['fresh'] = {'data': 1, 'ts': time.time()}
+    cache['old'] = {'data': 2, 'ts': time.time() - 3600}
+    assert 'fresh' in cache and 'old' in cache and 'missing' not in cache
+    assert dict(cache.items()) == {'fresh': cache.peek('fresh'), 'old': cache.peek('old')}
+    assert {k: cache.stats[k] for k in ('local_hits', 'shared_hits', 'misses', 'stale')} == \
+        {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'stale': 0}
+
+    cache.get('fresh'); cache.get('old'); cache.get('missing')
+    assert (cache.stats['local_hits'], cache.stats['stale'], cache.stats['misses']) == (1, 1, 1)
+
+
+def test_entry_written_by_another_worker_is_a_shared_hit(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    writer, reader = TieredCache(60, shared=SQLiteCache(path)), TieredCache(60, shared=SQLiteCache(path))
+    writer['league'] = {'data': [1], 'ts': time.time()}
+    assert reader.get('league')['data'] == [1]
+    assert reader.get('league')['data'] == [1]
+    assert (reader.stats['shared_hits'], reader.stats['local_hits']) == (1, 1)
+
+
+def test_counts_are_exact_under_concurrent_gets():
+    cache = TieredCache(60)
+    cache['k'] = {'data': 1, 'ts': time.time()}
+    threads = [threading.Thread(target=lambda: [cache.get('k') for _ in range(5000)]) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert cache.snapshot_stats()['local_hits'] == 8 * 5000
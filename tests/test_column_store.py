@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from column_store import append_dataset, read_dataset, read_manifest, write_dataset
+
+
+def games(seasons, divs, start=0):
+    rows = [(s, d, f"{d}_T{(start + i) % 3}", float(start + i)) for i, (s, d) in enumerate((s, d) for s in seasons for d in divs)]
+    df = pd.DataFrame(rows, columns=['Season', 'Div', 'HomeTeam', 'B365>2.5'])
+    df['Date'] = pd.to_datetime(df['Season'].astype(str) + '-09-01') + pd.to_timedelta(np.arange(len(df)), unit='D')
+    return df
+
+
+def test_round_trip_and_partition_filters(tmp_path):
+    df = games([2022, 2023], ['E0', 'D1'])
+    path = str(tmp_path / 'ds')
+    write_dataset(df, path)
+    assert len(list((tmp_path / 'ds').glob('*.npy'))) == df.shape[1]  # um .npy por coluna
+    back = read_dataset(path, categorical=False)
+    pd.testing.assert_frame_equal(back, df, check_dtype=False)
+
+    recent = read_dataset(path, columns=['Div', 'B365>2.5'], filters={'Season': [2023], 'Div': ['D1']})
+    assert recent['B365>2.5'].tolist() == df.loc[(df['Season'] == 2023) & (df['Div'] == 'D1'), 'B365>2.5'].tolist()
+    assert list(recent['Div'].cat.categories) == ['D1', 'E0']
+
+
+def test_append_grows_existing_partitions_and_adds_new_ones(tmp_path):
+    path = str(tmp_path / 'ds')
+    first, more = games([2022, 2023], ['E0']), games([2022, 2024], ['E0', 'SP1'], start=10)
+    write_dataset(first, path)
+    manifest = append_dataset(more, path)
+    assert manifest['rows'] == len(first) + len(more)
+
+    for (season, div), expected in pd.concat([first, more]).groupby(['Season', 'Div']):
+        got = read_dataset(path, filters={'Season': [season], 'Div': [div]}, categorical=False)
+        assert got['B365>2.5'].tolist() == expected['B365>2.5'].tolist()
+        assert got['HomeTeam'].tolist() == expected['HomeTeam'].tolist()
+    assert read_manifest(path)['columns']['Div']['categories'] == ['E0', 'SP1']  # nova categoria no fim
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from feature_index import TeamFeatureIndex
+
+FEATURES = ['Home_Goals', 'Away_Goals', 'HomeElo']
+
+
+def history():
+    # A joga fora (1), depois em casa (2, o mais recente); B só joga em casa
+    return pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-01', '2024-01-08', '2024-01-15']),
+        'HomeTeam': ['B', 'A', 'B'],
+        'AwayTeam': ['A', 'C', 'C'],
+        'Home_Goals': [10.0, 20.0, 30.0],
+        'Away_Goals': [1.0, 2.0, 3.0],
+        'HomeElo': [1500.0, 1510.0, 1520.0],
+    })
+
+
+def test_latest_home_game_wins_over_earlier_away_game():
+    index = TeamFeatureIndex(history(), FEATURES)
+    x = index.build_row('A', 'C')[0]
+    assert x[0] == 20.0  # stats de A no jogo em casa de 08/01, não no jogo fora de 01/01
+    assert x[1] == 3.0   # último jogo de C (fora, 15/01)
+
+
+def test_latest_game_does_not_depend_on_row_order():
+    shuffled = history().iloc[[2, 0, 1]].reset_index(drop=True)
+    index = TeamFeatureIndex(shuffled, FEATURES)
+    assert index.build_row('A', 'B')[0][:2].tolist() == [20.0, 30.0]
+
+
+def test_date_uses_only_earlier_games():
+    index = TeamFeatureIndex(history(), FEATURES)
+    x = index.build_row('A', 'C', date='2024-01-08')[0]
+    assert x[0] == 1.0                          # A antes de 08/01: só o jogo fora de 01/01
+    assert x[1] == 1.0                          # C ainda não tinha jogado: média só do jogo de 01/01
+    assert index.means[1] == 2.0                # (a média de todo o histórico inclui jogos futuros)
+
+
+def test_unknown_team_falls_back_to_means():
+    index = TeamFeatureIndex(history(), FEATURES)
+    x = index.build_row('Z', 'Y')[0]
+    assert np.allclose(x, index.means)
+
+
+def elo_history():
+    # Elo pré-jogo guardado (HomeElo/AwayElo) e resultados: A ganha a B, depois empata com C
+    return pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-01', '2024-01-08']),
+        'HomeTeam': ['A', 'C'],
+        'AwayTeam': ['B', 'A'],
+        'Home_Goals': [2.0, 1.0],
+        'Away_Goals': [0.0, 1.0],
+        'HomeElo': [1500.0, 1500.0],
+        'AwayElo': [1500.0, 1510.0],
+        'FTR': ['H', 'D'],
+    })
+
+
+ELO_FEATURES = ['Home_Goals', 'Away_Goals', 'HomeElo', 'AwayElo', 'EloDiff']
+
+
+def test_date_uses_elo_after_the_last_earlier_game():
+    index = TeamFeatureIndex(elo_history(), ELO_FEATURES)
+    x = index.build_row('A', 'B', date='2024-01-08')[0]
+    assert x[2] == 1510.0 and x[3] == 1490.0    # depois do 2-0 de 01/01 (K=20), não o Elo atual
+    assert x[4] == 20.0
+    draw = 20 * (0.5 - 1 / (1 + 10 ** ((1510.0 - 1500.0) / 400)))
+    x = index.build_row('A', 'C', date='2024-02-01')[0]
+    assert np.isclose(x[2], 1510.0 - draw) and np.isclose(x[3], 1500.0 + draw)
+    x = index.build_row('C', 'Z', date='2024-01-01')[0]
+    assert x[2] == 1500.0 and x[3] == 1500.0    # ainda sem jogos: Elo inicial
+
+
+def test_elo_is_replayed_when_history_has_no_elo_columns():
+    stored = TeamFeatureIndex(elo_history(), ELO_FEATURES)
+    replayed = TeamFeatureIndex(elo_history().drop(columns=['HomeElo', 'AwayElo', 'FTR']).assign(
+        FTHG=[2, 1], FTAG=[0, 1]), ELO_FEATURES)
+    assert replayed.has_elo
+    dates = ['2024-01-08', '2024-02-01']
+    assert np.allclose(stored.elos_before(['A', 'C'], dates), replayed.elos_before(['A', 'C'], dates))
@@ -0,0 +1,111 @@
+import io
+import sys
+import contextlib
+import importlib
+
+import pandas as pd
+import pytest
+
+from benchmarks import notebook_function, synthetic_matches
+from feature_store import FEATURE_DEPENDENCIES, FeatureStore, code_hash
+import rolling_features
+
+
+def feature_fn(df):
+    return df
+
+
+def load_module(tmp_path, name, source):
+    (tmp_path / f"{name}.py").write_text(source)
+    sys.path.insert(0, str(tmp_path))
+    try:
+        sys.modules.pop(name, None)
+        return importlib.import_module(name)
+    finally:
+        sys.path.remove(str(tmp_path))
+
+
+def test_code_hash_changes_with_dependency_source(tmp_path):
+    # Mesma feature_engineering, dependência alterada -> chave diferente (obriga a reconstruir)
+    before = load_module(tmp_path, 'dep_v1', "def elo(x):\n    return x * 20\n")
+    after = load_module(tmp_path, 'dep_v2', "def elo(x):\n    return x * 32\n")
+    assert code_hash(feature_fn, deps=(before.elo,)) != code_hash(feature_fn, deps=(after.elo,))
+    assert code_hash(feature_fn, deps=(before.elo,)) == code_hash(feature_fn, deps=(before.elo,))
+
+
+def test_dependencies_cover_feature_engineering_code():
+    # Standings, médias móveis, Elo e valores de mercado entram na chave
+    import data_utils, elo_engine, market_values
+    assert {rolling_features, elo_engine, market_values} <= set(FEATURE_DEPENDENCIES)
+    assert data_utils.compute_standings in FEATURE_DEPENDENCIES
+    assert code_hash(feature_fn) != code_hash(feature_fn, deps=())
+
+
+@pytest.fixture(scope='module')
+def feature_engineering():
+    return notebook_function('feature_engineering')
+
+
+@pytest.fixture(scope='module')
+def games():
+    # 3 épocas de 2 ligas + Champions, ordenadas por data
+    return synthetic_matches(seasons=range(2020, 2023), divisions=('E0', 'D1'))
+
+
+def update(store, games, feature_engineering):
+    with contextlib.redirect_stdout(io.StringIO()):
+        store.update(games, feature_engineering)
+    return store.last_report['mode']
+
+
+def check(store, games, feature_engineering):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return store.check(games, feature_engineering)
+
+
+def test_weekly_updates_equal_a_full_rebuild(tmp_path, games, feature_engineering):
+    store = FeatureStore(str(tmp_path / 'features'))
+    last = games['Date'].max()
+    cuts = [last - pd.Timedelta(days=7 * w) for w in (3, 2, 1, 0)]
+    assert update(store, games[games['Date'] <= cuts[0]], feature_engineering) == 'full'
+    for cut in cuts[1:]:
+        assert update(store, games[games['Date'] <= cut], feature_engineering) == 'incremental'
+    assert update(store, games, feature_engineering) == 'unchanged'
+    assert check(store, games, feature_engineering)['ok']
+
+
+def test_day_split_at_the_elo_watermark_is_incremental(tmp_path, games, feature_engineering):
+    # Metade dos jogos de um dia entra numa corrida, a outra metade na seguinte
+    store = FeatureStore(str(tmp_path / 'features'))
+    day = games['Date'].value_counts().loc[lambda c: c >= 4].index.max()
+    rows = games.index[games['Date'] == day]
+    first = games[(games['Date'] < day) | games.index.isin(rows[:len(rows) // 2])]
+    assert update(store, first, feature_engineering) == 'full'
+    upto_day = games[games['Date'] <= day]
+    assert update(store, upto_day, feature_engineering) == 'incremental'
+    assert store.last_report['new_rows'] == len(rows) - len(rows) // 2
+    assert check(store, upto_day, feature_engineering)['ok']
+
+
+def late_game(games, date, div):
+    # Jogo novo entre duas equipas dessa liga, com a mesma forma das outras linhas
+    row = games[games['Div'] == div].iloc[[0]].copy()
+    row['Date'] = pd.Timestamp(date)
+    return pd.concat([games, row], ignore_index=True)
+
+
+def test_late_earlier_match_forces_a_full_rebuild(tmp_path, games, feature_engineering):
+    store = FeatureStore(str(tmp_path / 'features'))
+    update(store, games, feature_engineering)
+    last = games['Date'].max()
+    late = late_game(games, last - pd.Timedelta(days=10), 'E0')
+    assert update(store, late, feature_engineering) == 'full'
+    assert check(store, late, feature_engineering)['ok']
+
+
+def test_new_match_in_a_closed_season_forces_a_full_rebuild(tmp_path, games, feature_engineering):
+    store = FeatureStore(str(tmp_path / 'features'))
+    update(store, games, feature_engineering)
+    late = late_game(games, '2021-05-30', 'D1')  # época 2020, já fechada
+    assert update(store, late, feature_engineering) == 'full'
+    assert check(store, late, feature_engineering)['ok']
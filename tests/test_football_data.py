@@ -0,0 +1,121 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from football_data import PartitionCache, print_report, season_code, sync_partitions
+
+TODAY = datetime.now()
+CURRENT = TODAY.year if TODAY.month >= 7 else TODAY.year - 1  # época a decorrer: nunca final
+PAST = CURRENT - 2                                          # época fechada
+CSV = b"Div,Date,HomeTeam,AwayTeam,FTHG,FTAG,FTR\nE0,10/08/2024,Arsenal,Chelsea,2,1,H\n"
+
+
+@pytest.fixture
+def stub():
+    # Stub local do football-data.co.uk: ETag = md5 do ficheiro, 304 com If-None-Match igual,
+    # 404 para partições que não existem e 500 nas de state['errors']
+    state = {'files': {}, 'errors': set(), 'calls': []}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            key = self.path.split('/mmz4281/')[1].rsplit('.csv', 1)[0]
+            body = state['files'].get(key)
+            etag = '"' + hashlib.md5(body).hexdigest() + '"' if body is not None else None
+            if key in state['errors']: status = 500
+            elif body is None: status = 404
+            else: status = 304 if self.headers.get('If-None-Match') == etag else 200
+            state['calls'].append((key, status, self.headers.get('If-None-Match')))
+            self.send_response(status)
+            if status in (200, 304):
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', 'Mon, 06 Oct 2025 08:00:00 GMT')
+            self.send_header('Content-Length', str(len(body)) if status == 200 else '0')
+            self.end_headers()
+            if status == 200: self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state['base'] = f"http://127.0.0.1:{server.server_port}/mmz4281"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def sync(stub, tmp_path, start=CURRENT, end=CURRENT, divisions=('E0',)):
+    return sync_partitions(start, end, divisions=list(divisions), cache_dir=str(tmp_path), base_url=stub['base'], max_workers=2)
+
+
+def manifest(tmp_path):
+    with open(tmp_path / 'manifest.json', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_not_modified_leaves_the_partition_untouched(stub, tmp_path):
+    key = f"{season_code(CURRENT)}/E0"
+    stub['files'][key] = CSV
+    assert sync(stub, tmp_path)['downloaded'] == [key]
+    path = PartitionCache(str(tmp_path)).path(CURRENT, 'E0')
+    mtime, before = os.stat(path).st_mtime_ns, manifest(tmp_path)[key]
+
+    report = sync(stub, tmp_path)
+    assert report['not_modified'] == [key] and not report['downloaded']
+    assert stub['calls'][-1] == (key, 304, before['etag'])  # pedido condicional com o ETag guardado
+    assert os.stat(path).st_mtime_ns == mtime
+    with open(path, 'rb') as f:
+        assert f.read() == CSV
+    after = manifest(tmp_path)[key]
+    assert {k: after[k] for k in ('status', 'etag', 'last_modified', 'bytes')} == \
+        {k: before[k] for k in ('status', 'etag', 'last_modified', 'bytes')}
+
+
+def test_changed_etag_downloads_the_partition_again(stub, tmp_path):
+    key = f"{season_code(CURRENT)}/E0"
+    stub['files'][key] = CSV
+    sync(stub, tmp_path)
+    old_etag = manifest(tmp_path)[key]['etag']
+
+    stub['files'][key] = CSV + b"E0,17/08/2024,Chelsea,Arsenal,0,0,D\n"
+    report = sync(stub, tmp_path)
+    assert report['downloaded'] == [key]
+    assert stub['calls'][-1][1:] == (200, old_etag)
+    with open(PartitionCache(str(tmp_path)).path(CURRENT, 'E0'), 'rb') as f:
+        assert f.read() == stub['files'][key]
+    entry = manifest(tmp_path)[key]
+    assert entry['etag'] != old_etag and entry['bytes'] == len(stub['files'][key])
+
+
+def test_failing_partition_is_reported_and_the_rest_is_kept(stub, tmp_path, capsys):
+    ok, bad = f"{season_code(CURRENT)}/E0", f"{season_code(CURRENT)}/D1"
+    stub['files'][ok] = stub['files'][bad] = CSV
+    stub['errors'].add(bad)
+    report = sync(stub, tmp_path, divisions=('E0', 'D1'))
+    assert report['downloaded'] == [ok]
+    assert list(report['failed']) == [bad] and '500' in report['failed'][bad]
+    assert bad not in manifest(tmp_path)
+    assert not os.path.exists(PartitionCache(str(tmp_path)).path(CURRENT, 'D1'))
+    print_report(report)
+    assert f"❌ {bad}" in capsys.readouterr().out
+
+    stub['errors'].clear()  # na corrida seguinte a partição falhada é pedida de novo
+    assert sync(stub, tmp_path, divisions=('E0', 'D1'))['downloaded'] == [bad]
+
+
+def test_closed_season_is_final_and_missing_partitions_are_recorded(stub, tmp_path):
+    key = f"{season_code(PAST)}/E0"
+    stub['files'][key] = CSV
+    report = sync(stub, tmp_path, start=PAST, end=PAST, divisions=('E0', 'SC0'))
+    assert report['downloaded'] == [key] and report['missing'] == [f"{season_code(PAST)}/SC0"]
+
+    calls = len(stub['calls'])
+    report = sync(stub, tmp_path, start=PAST, end=PAST, divisions=('E0', 'SC0'))
+    assert sorted(report['cached']) == sorted([key, f"{season_code(PAST)}/SC0"])
+    assert len(stub['calls']) == calls  # nada pedido
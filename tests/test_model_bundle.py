@@ -0,0 +1,43 @@
+import json
+
+import pandas as pd
+import pytest
+
+from model_bundle import ModelBundle, export_bundle
+
+FEATURES = ['HomeElo', 'AwayElo', 'Home_Avg_Goals_5', 'Away_Avg_Goals_5']
+
+
+def df_ready():
+    # df_ready completo: features, colunas lidas pela inferência e colunas só do treino
+    return pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-01', '2024-01-08']), 'HomeTeam': ['A', 'B'], 'AwayTeam': ['B', 'A'],
+        'Div': ['E0', 'E0'], 'FTHG': [2, 0], 'FTAG': [1, 0], 'Home_Pos': [1, 2], 'Away_Pos': [2, 1],
+        'Home_Value': [500.0, 300.0], 'Away_Value': [300.0, 500.0], 'HomeElo': [1500.0, 1490.0],
+        'AwayElo': [1500.0, 1510.0], 'Home_Avg_Goals_5': [1.0, 1.5], 'Away_Avg_Goals_5': [0.5, 2.0],
+        'B365H': [1.9, 2.1], 'HS': [12, 9], 'Weight': [1.0, 1.0],
+    })
+
+
+def test_bundle_history_keeps_only_columns_inference_reads(tmp_path):
+    path = str(tmp_path / 'bundle')
+    export_bundle(path, {}, FEATURES, ['E0'], df_ready())
+    columns = ModelBundle(path).history.columns
+    assert {'FTHG', 'FTAG', 'Home_Pos', 'Home_Value', 'HomeElo', 'Home_Avg_Goals_5'} <= set(columns)
+    assert not {'B365H', 'HS', 'Weight'} & set(columns)
+
+
+def test_pickle_history_is_trimmed_the_same_way():
+    bundle = ModelBundle.from_artifacts({'features': FEATURES, 'history_df': df_ready()})
+    assert not {'B365H', 'HS', 'Weight'} & set(bundle.history.columns)
+
+
+def test_unknown_history_layout_is_rejected(tmp_path):
+    path = str(tmp_path / 'bundle')
+    export_bundle(path, {}, FEATURES, ['E0'], df_ready())
+    manifest_path = tmp_path / 'bundle' / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text())
+    manifest['history']['layout'] = 'columns'
+    manifest_path.write_text(json.dumps(manifest))
+    with pytest.raises(ValueError):
+        ModelBundle(path)
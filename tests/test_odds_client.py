@@ -0,0 +1,188 @@
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cache_backend import SQLiteCache, TieredCache
+from odds_client import OddsClient
+
+DELAY = 0.2
+
+
+@pytest.fixture
+def stub():
+    # Stub local da The Odds API (HTTP/1.1 keep-alive): latência fixa, ligas lentas e ligas com erro 500
+    state = {'calls': [], 'ports': set(), 'slow': set(), 'errors': set(), 'version': 1}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            key = self.path.split('/sports/')[1].split('/')[0]
+            state['calls'].append(key)
+            state['ports'].add(self.client_address[1])
+            time.sleep(2.0 if key in state['slow'] else DELAY)
+            if key in state['errors']:
+                self.send_response(500); self.send_header('Content-Length', '0'); self.end_headers()
+                return
+            body = json.dumps([{'id': f"{key}_1", 'version': state['version']}]).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('x-requests-remaining', '400'); self.send_header('x-requests-used', '100')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state['base'] = f"http://127.0.0.1:{server.server_port}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def client_for(stub, cache=None, **kwargs):
+    kwargs.setdefault('timeout', (1, 1))
+    return OddsClient('x', {} if cache is None else cache, ttl=60, base_url=stub['base'], **kwargs)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline: return False
+        time.sleep(0.01)
+    return True
+
+
+def test_leagues_are_fetched_in_parallel_over_pooled_connections(stub):
+    keys = [f"league_{i}" for i in range(6)]
+    client = client_for(stub, max_workers=3)
+    t0 = time.perf_counter()
+    result = client.get_leagues(keys)
+    elapsed = time.perf_counter() - t0
+    assert all(result[k] == [{'id': f"{k}_1", 'version': 1}] for k in keys)
+    assert elapsed < len(keys) * DELAY * 0.75  # 3 threads: ~2 rondas, não 6 pedidos seguidos
+
+    client.cache.clear()
+    client.get_leagues(keys)
+    assert len(stub['calls']) == 2 * len(keys)
+    assert len(stub['ports']) <= 3  # keep-alive: as ligações do pool são reutilizadas
+    assert client.stats['quota_remaining'] == '400'
+
+
+def test_expired_league_is_served_stale_and_revalidated_in_background(stub):
+    cache = {'league_a': {'data': ['old'], 'ts': time.time() - 3600}}
+    client = client_for(stub, cache)
+    t0 = time.perf_counter()
+    assert client.get_leagues(['league_a']) == {'league_a': ['old']}
+    assert time.perf_counter() - t0 < DELAY / 2  # não esperou pela API
+
+    assert wait_until(lambda: cache['league_a']['data'] != ['old'])
+    assert cache['league_a']['data'] == [{'id': 'league_a_1', 'version': 1}]
+    assert time.time() - cache['league_a']['ts'] < 5
+    assert stub['calls'] == ['league_a']
+
+
+def test_stale_while_revalidate_off_waits_for_fresh_data(stub):
+    cache = {'league_a': {'data': ['old'], 'ts': time.time() - 3600}}
+    client = client_for(stub, cache, stale_while_revalidate=False)
+    assert client.get_leagues(['league_a']) == {'league_a': [{'id': 'league_a_1', 'version': 1}]}
+
+
+def test_concurrent_requests_for_a_league_share_one_upstream_call(stub):
+    client = client_for(stub)
+    with ThreadPoolExecutor(8) as pool:
+        futures = list(pool.map(lambda _: client.submit('league_a'), range(8)))
+    assert len({id(f) for f in futures}) == 1
+    assert futures[0].result(timeout=5) == [{'id': 'league_a_1', 'version': 1}]
+    assert stub['calls'] == ['league_a']
+    assert client.inflight == {}
+
+
+def test_slow_league_times_out_without_blocking_the_others(stub):
+    stub['slow'].add('league_slow')
+    client = client_for(stub, timeout=(1, 0.5))
+    t0 = time.perf_counter()
+    result = client.get_leagues(['league_slow', 'league_a'])
+    assert time.perf_counter() - t0 < 1.5
+    assert result == {'league_slow': [], 'league_a': [{'id': 'league_a_1', 'version': 1}]}
+    assert client.stats['upstream_errors'] == 1
+    assert 'league_slow' in client.failures
+
+
+def test_failed_league_is_not_requested_again_within_retry_after(stub):
+    stub['errors'].add('league_down')
+    client = client_for(stub, retry_after=60)
+    assert client.get_leagues(['league_down']) == {'league_down': []}
+    for _ in range(5):
+        assert client.get_leagues(['league_down']) == {'league_down': []}
+    time.sleep(DELAY * 2)
+    assert stub['calls'] == ['league_down']  # uma falha, zero novas chamadas (quota poupada)
+
+    client.failures['league_down'] -= 61  # passou o retry_after: volta a tentar
+    client.get_leagues(['league_down'])
+    assert stub['calls'] == ['league_down', 'league_down']
+
+
+def test_failed_refresh_keeps_the_previous_data(stub):
+    stub['errors'].add('league_a')
+    cache = {'league_a': {'data': ['old'], 'ts': time.time() - 3600}}
+    client = client_for(stub, cache, stale_while_revalidate=False)
+    assert client.get_leagues(['league_a']) == {'league_a': ['old']}
+    assert client.stats['upstream_errors'] == 1
+
+
+def test_on_update_announces_each_payload_once_including_other_workers_writes(stub):
+    updates = []
+    cache = {}
+    client = client_for(stub, cache, on_update=lambda k, data, ts: updates.append((k, ts)))
+    client.get_leagues(['league_a'])
+    client.get_leagues(['league_a'])  # fresca na cache: nada de novo
+    assert updates == [('league_a', cache['league_a']['ts'])]
+
+    # Outro worker grava um payload mais recente na cache partilhada
+    cache['league_a'] = {'data': ['other worker'], 'ts': cache['league_a']['ts'] + 1}
+    client.announce(['league_a', 'league_missing'])
+    client.get_leagues(['league_a'])
+    assert updates[-1] == ('league_a', cache['league_a']['ts']) and len(updates) == 2
+    assert stub['calls'] == ['league_a']
+
+
+def unreachable_base():
+    # Porta fechada: a ligação falha logo
+    server = ThreadingHTTPServer(('127.0.0.1', 0), BaseHTTPRequestHandler)
+    port = server.server_port
+    server.server_close()
+    return f"http://127.0.0.1:{port}"
+
+
+def test_one_cold_league_counts_exactly_one_miss(tmp_path):
+    cache = TieredCache(60, shared=SQLiteCache(str(tmp_path / 'cache.sqlite3')))
+    client = OddsClient('x', cache, ttl=60, base_url=unreachable_base(), timeout=(1, 1))
+    assert client.get_leagues(['soccer_x']) == {'soccer_x': []}
+    stats = cache.snapshot_stats()
+    assert (stats['misses'], stats['local_hits'], stats['shared_hits'], stats['stale']) == (1, 0, 0, 0)
+    assert client.snapshot_stats()['upstream_errors'] == 1
+
+
+def test_served_league_counts_one_read_per_visit(stub, tmp_path):
+    cache = TieredCache(60, shared=SQLiteCache(str(tmp_path / 'cache.sqlite3')))
+    client = client_for(stub, cache)
+    client.get_leagues(['league_a'])
+    client.get_leagues(['league_a'])
+    stats = cache.snapshot_stats()
+    assert (stats['misses'], stats['local_hits']) == (1, 1)
+
+
+def test_upstream_counters_are_exact_under_parallel_fetches(stub):
+    keys = [f"league_{i}" for i in range(12)]
+    client = client_for(stub, max_workers=6)
+    client.get_leagues(keys)
+    assert client.snapshot_stats()['upstream_calls'] == len(keys) == len(stub['calls'])
@@ -0,0 +1,30 @@
+import threading
+
+from prediction_memo import PredictionMemo
+
+ODDS = {'h': 1.8, 'd': 3.4, 'a': 4.5}
+
+
+def test_hits_and_misses_are_exact_under_concurrent_requests():
+    memo = PredictionMemo(maxsize=16)
+    key = PredictionMemo.key('A', 'B', 'E0', ODDS)
+    memo.get(key, 'v1')
+    memo.set(key, {'home': 'A'}, 'v1')
+    other = PredictionMemo.key('A', 'C', 'E0', ODDS)
+    threads = [threading.Thread(target=lambda k=k: [memo.get(k, 'v1') for _ in range(500)])
+               for k in (key, other) * 4]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    stats = memo.snapshot_stats()
+    assert stats['hits'] == 4 * 500 and stats['misses'] == 4 * 500 + 1
+
+
+def test_new_version_empties_the_memo():
+    memo = PredictionMemo(maxsize=16)
+    key = PredictionMemo.key('A', 'B', 'E0', ODDS)
+    memo.check_version('v1')
+    memo.set(key, {'home': 'A'}, 'v1')
+    assert memo.get(key, 'v1') == {'home': 'A'}
+    assert memo.get(key, 'v2') is None
+    memo.set(key, {'home': 'A'}, 'v1')  # calculada com o modelo antigo: não entra
+    assert memo.get(key, 'v2') is None and memo.snapshot_stats()['invalidations'] == 1
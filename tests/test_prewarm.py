@@ -0,0 +1,126 @@
+import time
+import datetime
+import threading
+
+from cache_backend import SQLiteCache, TieredCache
+from prewarm import Prewarmer, PREWARM_LOCK, PREDICTION_PREFIX
+
+TODAY = '2030-01-01'
+TTL = 3600
+
+
+class Fixtures:
+    # FixtureStore mínimo: {id: entrada} com a data e as odds de cada jogo
+    def __init__(self):
+        self.games = {}
+
+    def add(self, fid, odd_h, date=TODAY):
+        self.games[fid] = {'game': {'id': fid}, 'date': date, 'odds': {'h': odd_h, 'd': 3.2, 'a': 2.5}}
+
+    def fixtures_on(self, day):
+        return [{'id': fid} for fid, e in self.games.items() if e['date'] == day]
+
+    def get(self, fid):
+        return self.games.get(fid)
+
+
+class Client:
+    def announce(self, leagues):
+        pass
+
+
+def prewarmer(tmp_path, score=None, lock_ttl=900, shared_lock_ttl=30, version='v1'):
+    fixtures = Fixtures()
+    store = TieredCache(TTL, shared=SQLiteCache(str(tmp_path / 'cache.sqlite3'), lock_ttl=shared_lock_ttl))
+    state = {'version': version}
+    warm = Prewarmer(Client(), fixtures, {}, store, score or (lambda entries: [{'h': e['odds']['h']} for e in entries]),
+                     [], TTL, version=lambda: state['version'], horizon_days=1, lock_ttl=lock_ttl)
+    return warm, fixtures, store, state
+
+
+def predictions(store):
+    return sorted(k for k in store.keys() if k.startswith(PREDICTION_PREFIX))
+
+
+def today():
+    return datetime.date.fromisoformat(TODAY)
+
+
+def test_moved_odds_replace_the_old_key(tmp_path):
+    warm, fixtures, store, _ = prewarmer(tmp_path)
+    fixtures.add('a', 1.8); fixtures.add('b', 2.0)
+    assert warm.warm(today()) == 2
+    fixtures.add('a', 1.9)  # a odd mexe: chave nova, a antiga é apagada
+    assert warm.warm(today()) == 1
+    keys = predictions(store)
+    assert len(keys) == 2 and warm.key('a', fixtures.get('a')['odds'], 'v1') in keys
+    assert warm.stats['pruned'] == 1
+    assert warm.get('a', fixtures.get('a')['odds']) == {'h': 1.9}
+
+
+def test_new_model_version_replaces_every_key(tmp_path):
+    warm, fixtures, store, state = prewarmer(tmp_path)
+    for i in range(5): fixtures.add(str(i), 1.5 + i)
+    warm.warm(today())
+    for version in ('v2', 'v3'):
+        state['version'] = version
+        assert warm.warm(today()) == 5
+    assert len(predictions(store)) == 5
+    assert all(k.endswith(':v3') for k in predictions(store))
+
+
+def test_games_outside_the_window_are_kept_until_they_expire(tmp_path):
+    warm, fixtures, store, _ = prewarmer(tmp_path)
+    fixtures.add('old', 1.8, date='2029-12-31'); fixtures.add('a', 2.0)
+    key = warm.key('old', fixtures.get('old')['odds'], 'v1')
+    store[key] = {'data': {'h': 1.8}, 'ts': time.time()}
+    store['league'] = {'data': [], 'ts': 0}  # chaves das ligas no mesmo backend não são tocadas
+    warm.warm(today())
+    assert key in predictions(store)
+    assert warm.prune({}, now=time.time() + TTL + 1) == 2
+    assert predictions(store) == [] and 'league' in store.keys()
+
+
+def test_lock_outlives_the_shared_default_during_a_long_cycle(tmp_path):
+    # O lock do SQLiteCache dura 0.1s; o ciclo demora mais, mas outro worker não o consegue apanhar
+    taken = []
+
+    def slow_score(entries):
+        time.sleep(0.3)
+        other = threading.Thread(target=lambda: taken.append(store.acquire(PREWARM_LOCK)))
+        other.start(); other.join()
+        return [{'h': 1} for _ in entries]
+
+    warm, fixtures, store, _ = prewarmer(tmp_path, score=slow_score, lock_ttl=5, shared_lock_ttl=0.1)
+    fixtures.add('a', 1.8)
+    assert warm.run_once(today=today()) == 1
+    assert taken == [False]
+    assert store.acquire(PREWARM_LOCK)  # largado no fim do ciclo
+
+
+def test_background_cycles_do_not_count_as_cache_reads(tmp_path):
+    warm, fixtures, store, _ = prewarmer(tmp_path)
+    warm.odds_cache = TieredCache(TTL)
+    warm.odds_cache['league'] = {'data': [], 'ts': time.time()}
+    warm.leagues = ['league']
+    for i in range(5): fixtures.add(str(i), 1.5 + i)
+    for _ in range(3):
+        warm.refresh_odds()
+        warm.warm(today())
+    for cache in (store, warm.odds_cache):
+        stats = cache.snapshot_stats()
+        assert stats['local_hits'] + stats['shared_hits'] + stats['misses'] + stats['stale'] == 0
+    assert warm.snapshot_stats()['unchanged'] == 10
+
+
+def test_stats_are_exact_under_concurrent_requests(tmp_path):
+    warm, fixtures, store, _ = prewarmer(tmp_path)
+    fixtures.add('a', 1.8)
+    warm.warm(today())
+    odds = fixtures.get('a')['odds']
+    threads = [threading.Thread(target=lambda: [warm.get('a', odds) for _ in range(200)]) for _ in range(4)]
+    for t in threads: t.start()
+    for _ in range(50): warm._count('unchanged')
+    for t in threads: t.join()
+    stats = warm.snapshot_stats()
+    assert stats['hits'] == 800 and stats['unchanged'] == 50
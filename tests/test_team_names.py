@@ -0,0 +1,62 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from team_names import TeamResolver
+from market_values import market_value_lookup
+from data_utils import align_team_names
+
+KNOWN = ['Real Madrid', 'Inter', 'Bayern Munich']
+
+
+def test_reserve_teams_and_other_clubs_are_never_folded_by_prefix():
+    resolver = TeamResolver(known=KNOWN)
+    for name in ('Real Madrid Castilla', 'Inter Miami CF', 'FC Bayern München II'):
+        assert resolver.resolve(name) == name
+    assert resolver.resolve('FC Bayern München') == 'Bayern Munich'  # alias + chave exata
+    assert resolver.resolve('Internazionale') == 'Inter'
+    report = resolver.report()
+    assert set(report['unresolved']) == {'Real Madrid Castilla', 'Inter Miami CF', 'FC Bayern München II'}
+
+
+def test_market_values_keep_first_team_values():
+    mv = pd.DataFrame({'Team': ['Real Madrid', 'Real Madrid Castilla', 'Inter', 'Inter Miami CF',
+                                'Bayern München', 'FC Bayern München II'],
+                       'Season': 2023, 'Value': [1000.0, 20.0, 600.0, 50.0, 900.0, 5.0]})
+    with contextlib.redirect_stdout(io.StringIO()):
+        aligned = align_team_names(mv, KNOWN, columns=('Team',), unique=('Season',))
+    values = market_value_lookup(KNOWN, [2023] * 3, aligned)
+    assert values.tolist() == [1000.0, 600.0, 900.0]
+
+
+def test_many_to_one_collisions_are_refused_and_reported():
+    # Duas grafias da fonte para a mesma equipa e época: fica a que já tem o nome do histórico
+    mv = pd.DataFrame({'Team': ['Bayern Munich', 'Bayern München', 'Inter', 'Internazionale'],
+                       'Season': [2023, 2023, 2022, 2023], 'Value': [900.0, 1.0, 600.0, 650.0]})
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        aligned = align_team_names(mv, KNOWN, columns=('Team',), unique=('Season',))
+    assert aligned['Team'].tolist() == ['Bayern Munich', 'Bayern München', 'Inter', 'Inter']
+    assert 'Bayern München -/-> Bayern Munich' in out.getvalue()
+
+    values = market_value_lookup(['Bayern Munich', 'Inter', 'Inter'], [2023, 2022, 2023], aligned)
+    assert values.tolist() == [900.0, 600.0, 650.0]
+
+
+def test_conflicting_values_for_one_team_and_season_fall_back():
+    mv = pd.DataFrame({'Team': ['Arsenal', 'Arsenal', 'Chelsea', 'Chelsea'], 'Season': 2023,
+                       'Value': [700.0, 710.0, 500.0, 500.0]})
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        values = market_value_lookup(['Arsenal', 'Chelsea'], [2023, 2023], mv)
+    assert values.tolist() == [900.0, 500.0]  # Arsenal: tier 1 (fallback); Chelsea: linhas iguais
+    assert 'Arsenal' in out.getvalue()
+
+
+def test_request_names_are_bounded():
+    resolver = TeamResolver(known=KNOWN, max_names=100)
+    for i in range(1000):
+        resolver.resolve(f"Random FC {i}")
+    assert len(resolver.cache) <= 100 and len(resolver.unresolved) == 100
+    assert sum(resolver.unresolved.values()) + resolver.report()['overflow'] == 1000
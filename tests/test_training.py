@@ -0,0 +1,63 @@
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+xgb = pytest.importorskip('xgboost')
+
+import training
+from training import QuantizedFeatures, _cv_score, _fit, _trial
+
+
+def features(n=200):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(rng.normal(size=(n, 4)), columns=list('abcd')), rng.integers(0, 3, n)
+
+
+class SlowMatrix:
+    # QuantileDMatrix falso: demora e regista quantas construções correm ao mesmo tempo
+    state = {'running': 0, 'peak': 0, 'built': 0}
+    lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        with self.lock:
+            self.state['running'] += 1
+            self.state['built'] += 1
+            self.state['peak'] = max(self.state['peak'], self.state['running'])
+        time.sleep(0.2)
+        with self.lock:
+            self.state['running'] -= 1
+
+
+def test_matrices_for_different_keys_build_in_parallel(monkeypatch):
+    X, y = features()
+    qx = QuantizedFeatures(X)
+    SlowMatrix.state.update(running=0, peak=0, built=0)
+    monkeypatch.setattr(training.xgb, 'QuantileDMatrix', SlowMatrix)
+    keys = [('model_multi', 0), ('model_multi', 1), ('model_sniper', 0), ('model_multi', 0)]
+    threads = [threading.Thread(target=qx.matrix, args=(key, np.arange(100), y)) for key in keys]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert SlowMatrix.state['peak'] >= 3       # chaves diferentes não esperam umas pelas outras
+    assert SlowMatrix.state['built'] == 3 + 1  # a mesma chave é construída uma vez (+ os cortes partilhados)
+
+
+def test_failing_fit_releases_its_matrices(monkeypatch):
+    X, y = features()
+    qx = QuantizedFeatures(X)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('treino falhou')
+
+    monkeypatch.setattr(training.xgb, 'train', fail)
+    params = {'n_estimators': 5, 'max_depth': 2}
+    jobs = [_cv_score(qx, 'model_multi', 'multi:softprob', y, params, np.arange(100), np.arange(100, 150), 0, None, 42),
+            _fit(qx, 'model_multi', 'multi:softprob', y, params, None, 42)]
+    jobs += _trial(qx, 'model_multi', 'multi:softprob', y, params, 5,
+                   [(np.arange(80), np.arange(80, 100), np.arange(100, 150))], None, 3, 42)
+    for job in jobs:
+        with pytest.raises(RuntimeError):
+            job(1)
+    assert qx.cache == {} and all(n == 0 for n in qx.users.values())
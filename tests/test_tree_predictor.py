@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+xgb = pytest.importorskip('xgboost')
+
+from tree_predictor import TreeEnsemble, TreeModel
+
+TOLERANCE = 1e-5
+
+
+def data(n=600, n_features=6, seed=0):
+    # Features com ~10% de valores em falta (no treino e na previsão: default_left de cada nó)
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, n_features)).astype(np.float32)
+    signal = X[:, 0] - 0.5 * X[:, 1] + 0.3 * X[:, 2] * X[:, 3]
+    X[rng.random(X.shape) < 0.1] = np.nan
+    return X, signal, rng
+
+
+def check(xgb_model, X):
+    model = TreeModel(TreeEnsemble.from_booster(xgb_model), 'classifier' if hasattr(xgb_model, 'predict_proba') else 'regressor')
+    # Linhas de teste: as do treino, uma só com NaN e valores fora do intervalo visto no treino
+    X_test = np.vstack([X, np.full((1, X.shape[1]), np.nan), np.full((1, X.shape[1]), 1e6)])
+    if hasattr(xgb_model, 'predict_proba'):
+        expected, got = xgb_model.predict_proba(X_test), model.predict_proba(X_test)
+        assert np.array_equal(model.predict(X_test), xgb_model.predict(X_test))
+    else:
+        expected, got = xgb_model.predict(X_test), model.predict(X_test)
+    assert got.shape == expected.shape
+    np.testing.assert_allclose(got, expected, rtol=0, atol=TOLERANCE)
+
+
+def test_multi_softprob_matches_xgboost():
+    X, signal, _ = data()
+    y = np.digitize(signal, [-0.5, 0.5])  # 3 classes, como o 1X2
+    model = xgb.XGBClassifier(objective='multi:softprob', n_estimators=30, max_depth=4, learning_rate=0.3)
+    check(model.fit(X, y), X)
+
+
+def test_binary_logistic_matches_xgboost():
+    X, signal, _ = data(seed=1)
+    model = xgb.XGBClassifier(objective='binary:logistic', n_estimators=30, max_depth=3, learning_rate=0.3)
+    check(model.fit(X, (signal > 0).astype(int)), X)
+
+
+def test_count_poisson_matches_xgboost():
+    X, signal, rng = data(seed=2)
+    y = rng.poisson(np.exp(0.3 * np.nan_to_num(signal)))  # golos
+    model = xgb.XGBRegressor(objective='count:poisson', n_estimators=30, max_depth=3, learning_rate=0.3)
+    check(model.fit(X, y), X)
+
+
+def test_raw_booster_with_base_score_matches_xgboost():
+    # Booster sem wrapper do sklearn e base_score fora do default
+    X, signal, _ = data(seed=3)
+    dtrain = xgb.DMatrix(X, label=(signal > 0).astype(int), missing=np.nan)
+    booster = xgb.train({'objective': 'binary:logistic', 'max_depth': 3, 'base_score': 0.3}, dtrain, num_boost_round=20)
+    got = TreeEnsemble.from_booster(booster).predict(X)
+    np.testing.assert_allclose(got, booster.predict(xgb.DMatrix(X, missing=np.nan)), rtol=0, atol=TOLERANCE)
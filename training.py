@@ -0,0 +1,384 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+import xgboost as xgb
+from sklearn.metrics import log_loss
+from sklearn.model_selection import ParameterGrid, TimeSeriesSplit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web', 'api'))
+from metrics import observe, timed
+
+# --- TREINO DOS 5 MODELOS (MATRIZ QUANTIZADA PARTILHADA + FITS EM PARALELO) ---
+# Em vez de 5 fits sklearn seguidos (cada um volta a quantizar o X_train, e o GridSearchCV
+# com n_jobs=-1 lança processos que por sua vez usam todas as threads do XGBoost):
+#   - o X_train é convertido uma vez para float32 e quantizado uma vez (QuantileDMatrix);
+#     as matrizes de cada fold / alvo usam os mesmos cortes (ref=), sem novo sketch;
+#   - todos os fits (grelha x folds do Normal e do Sniper, golos casa/fora, refits, Shield)
+#     correm num pool de threads com um orçamento fixo: workers x threads por fit <= n_threads;
+#   - os modelos saem como XGBClassifier / XGBRegressor (mesmo dicionário de artefactos).
+# Com os mesmos parâmetros e seeds, os modelos são iguais aos do GridSearchCV/fit do sklearn.
+
+MAX_BIN = 256
+MODEL_OBJECTIVES = {
+    'model_multi': 'multi:softprob',
+    'model_sniper': 'binary:logistic',
+    'model_shield': 'binary:logistic',
+    'model_goals_h': 'count:poisson',
+    'model_goals_a': 'count:poisson',
+}
+
+
+def booster_params(params, objective, nthread, random_state=42, max_bin=MAX_BIN):
+    # Parâmetros do sklearn (n_estimators, learning_rate...) -> (params do xgb.train, nº de árvores)
+    params = dict(params)
+    rounds = params.pop('n_estimators', 100)
+    out = {'objective': objective, 'tree_method': 'hist', 'max_bin': max_bin, 'nthread': nthread,
+           'seed': params.pop('random_state', random_state)}
+    if 'learning_rate' in params: out['eta'] = params.pop('learning_rate')
+    if objective.startswith('multi:'): out['num_class'] = 3
+    out.update(params)
+    return out, rounds
+
+
+def to_sklearn(booster, params, objective):
+    # Booster -> XGBClassifier / XGBRegressor (para o export e o predict_proba do notebook)
+    cls = xgb.XGBRegressor if objective.startswith('count:') or objective.startswith('reg:') else xgb.XGBClassifier
+    model = cls(**params, objective=objective)
+    model.load_model(bytearray(booster.save_raw('ubj')))
+    return model
+
+
+class QuantizedFeatures:
+    # X quantizado uma vez; matrix() devolve a matriz de um subconjunto de linhas / alvo com os mesmos cortes.
+    # Os cortes com pesos (sample_weight) são quantis ponderados: um sketch por vetor de pesos.
+    # Cada matriz é construída uma vez por chave (um Future): o lock só protege os dicionários, por
+    # isso os fits de chaves diferentes constroem as matrizes em paralelo e só esperam os da mesma chave.
+    def __init__(self, X, max_bin=MAX_BIN):
+        self.features = list(X.columns)
+        self.values = np.ascontiguousarray(X.to_numpy(dtype=np.float32))
+        self.max_bin = max_bin
+        self.refs = {}
+        self.cache = {}
+        self.users = {}
+        self.lock = threading.Lock()
+
+    def _once(self, store, key, build):
+        # O primeiro a pedir a chave constrói (fora do lock); os outros esperam pelo mesmo Future
+        with self.lock:
+            future = store.get(key)
+            owner = future is None
+            if owner: future = store[key] = Future()
+        if owner:
+            try:
+                future.set_result(build())
+            except BaseException as e:
+                with self.lock: store.pop(key, None)
+                future.set_exception(e)
+        return future.result()
+
+    def reference(self, name, weight):
+        # Cortes sem pesos (partilhados) ou ponderados pelos pesos do modelo `name`
+        key = None if weight is None else name
+        return self._once(self.refs, key, lambda: xgb.QuantileDMatrix(
+            self.values, weight=None if weight is None else np.asarray(weight), max_bin=self.max_bin,
+            feature_names=self.features))
+
+    def expect(self, key):
+        # Mais um fit vai usar a matriz `key`; done() liberta-a depois do último
+        with self.lock:
+            self.users[key] = self.users.get(key, 0) + 1
+
+    def done(self, key):
+        with self.lock:
+            self.users[key] -= 1
+            if not self.users[key]: self.cache.pop(key, None)
+
+    def matrix(self, key, rows, label, weight=None, ref=None):
+        # key = (modelo, fold): os candidatos da grelha no mesmo fold partilham a matriz.
+        # ref: a matriz de treino, para um conjunto de avaliação (o XGBoost exige os mesmos cortes)
+        def build():
+            take = slice(None) if rows is None else rows
+            return xgb.QuantileDMatrix(self.values[take], label=np.asarray(label)[take],
+                                       weight=None if weight is None else np.asarray(weight)[take],
+                                       ref=ref or self.reference(key[0], weight), max_bin=self.max_bin,
+                                       feature_names=self.features)
+        return self._once(self.cache, key, build)
+
+    def rows(self, rows):
+        return self.values[rows]
+
+
+def run_parallel(jobs, n_threads):
+    # jobs: lista de funções fn(nthread). Orçamento: workers x threads por fit <= n_threads
+    fit_threads = max(1, n_threads // max(1, len(jobs)))
+    workers = max(1, min(len(jobs), n_threads // fit_threads))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='train') as pool:
+        results = list(pool.map(lambda job: job(fit_threads), jobs))
+    return results, {'jobs': len(jobs), 'workers': workers, 'threads_per_fit': fit_threads}
+
+
+def _cv_score(qx, name, objective, y, params, train_idx, val_idx, fold, weight, random_state):
+    key = (name, fold)
+    qx.expect(key)
+
+    def job(nthread):
+        bp, rounds = booster_params(params, objective, nthread, random_state, qx.max_bin)
+        try:
+            booster = xgb.train(bp, qx.matrix(key, train_idx, y, weight), rounds)
+        finally:
+            qx.done(key)  # mesmo que o treino falhe, a matriz não fica presa
+        proba = booster.inplace_predict(qx.rows(val_idx))
+        if proba.ndim == 1: proba = np.column_stack([1 - proba, proba])
+        return -log_loss(np.asarray(y)[val_idx], proba, labels=np.arange(proba.shape[1]))
+    return job
+
+
+def _fit(qx, name, objective, y, params, weight, random_state):
+    key = (name, 'full')
+    qx.expect(key)
+
+    def job(nthread):
+        bp, rounds = booster_params(params, objective, nthread, random_state, qx.max_bin)
+        try:
+            booster = xgb.train(bp, qx.matrix(key, None, y, weight), rounds)
+        finally:
+            qx.done(key)
+        return to_sklearn(booster, dict(params, random_state=random_state), objective)
+    return job
+
+
+def model_targets(y_train):
+    # Alvo de cada classificador a partir do FTR codificado (0=Away, 1=Draw, 2=Home)
+    y = np.asarray(y_train)
+    return {'model_multi': y, 'model_sniper': (y == 2).astype(int), 'model_shield': (y != 0).astype(int)}
+
+
+@timed('training.train_models')
+def train_models(X_train, y_train, grids, fixed=None, sample_weight=None, n_splits=3, n_threads=None,
+                 random_state=42, max_bin=MAX_BIN):
+    # y_train: 0=Away, 1=Draw, 2=Home; grids: {'model_multi': grelha, 'model_sniper': grelha};
+    # fixed: {'model_goals_h': (params, golos casa), 'model_goals_a': (params, golos fora)}.
+    # O Shield usa os melhores parâmetros do Sniper. Devolve (modelos, relatório).
+    t0 = time.perf_counter()
+    n_threads = n_threads or os.cpu_count() or 1
+    targets = model_targets(y_train)
+    weights = {'model_multi': sample_weight}
+
+    qx = QuantizedFeatures(X_train, max_bin)
+    t_quantize = time.perf_counter() - t0
+    folds = list(TimeSeriesSplit(n_splits=n_splits).split(qx.values))
+
+    # Fase 1: validação cruzada das grelhas + modelos de golos (independentes)
+    jobs, slots = [], []
+    candidates = {name: list(ParameterGrid(grid)) for name, grid in grids.items()}
+    for name, cands in candidates.items():
+        if len(cands) == 1: continue  # um só candidato (ex: saído do hyperband_search): sem CV
+        for c, params in enumerate(cands):
+            for f, (train_idx, val_idx) in enumerate(folds):
+                jobs.append(_cv_score(qx, name, MODEL_OBJECTIVES[name], targets[name], params, train_idx, val_idx,
+                                      f, weights.get(name), random_state))
+                slots.append((name, c, f))
+    for name, (params, target) in (fixed or {}).items():
+        jobs.append(_fit(qx, name, MODEL_OBJECTIVES[name], np.asarray(target), params, None, random_state))
+        slots.append((name, None, None))
+    t1 = time.perf_counter()
+    results, stage1 = run_parallel(jobs, n_threads)
+    stage1['seconds'] = time.perf_counter() - t1
+
+    models, scores = {}, {name: np.zeros((len(cands), len(folds))) for name, cands in candidates.items()}
+    for (name, c, f), result in zip(slots, results):
+        if c is None: models[name] = result
+        else: scores[name][c, f] = result
+    best_params = {name: cands[int(np.argmax(scores[name].mean(axis=1)))] for name, cands in candidates.items()}
+
+    # Fase 2: refits com os melhores parâmetros + Shield (parâmetros do Sniper)
+    refit = {name: (best_params[name], weights.get(name)) for name in candidates}
+    if 'model_sniper' in best_params: refit['model_shield'] = (best_params['model_sniper'], None)
+    t2 = time.perf_counter()
+    names = list(refit)
+    results, stage2 = run_parallel([_fit(qx, name, MODEL_OBJECTIVES[name], targets[name], params, weight, random_state)
+                                    for name, (params, weight) in refit.items()], n_threads)
+    stage2['seconds'] = time.perf_counter() - t2
+    models.update(zip(names, results))
+
+    observe('training.quantize', t_quantize)
+    observe('training.cv_and_goals', stage1['seconds'])
+    observe('training.refit', stage2['seconds'])
+    report = {'best_params': best_params, 'cv_scores': {name: s.mean(axis=1).tolist() for name, s in scores.items()},
+              'quantize_seconds': t_quantize, 'stages': [stage1, stage2], 'n_threads': n_threads,
+              'seconds': time.perf_counter() - t0}
+    return models, report
+
+
+def print_report(report):
+    for name, params in report['best_params'].items():
+        scores = report['cv_scores'][name]
+        cv = f"log-loss CV {-max(scores):.4f}" if len(scores) > 1 else 'sem CV'
+        print(f"✅ Melhores Params ({name}): {params} ({cv})")
+    stages = ' | '.join(f"{s['jobs']} fits em {s['workers']} workers x {s['threads_per_fit']} threads: {s['seconds']:.1f}s"
+                        for s in report['stages'])
+    print(f"🏁 Treino: {report['seconds']:.1f}s (quantização {report['quantize_seconds']:.2f}s | {stages})")
+
+
+# --- PROCURA DE HIPERPARÂMETROS (SUCCESSIVE HALVING / HYPERBAND) ---
+# Em vez de treinar cada combinação da grelha até ao fim em todos os folds, cada bracket do
+# Hyperband sorteia n configurações, treina-as com poucas árvores e só a melhor fração (1/eta)
+# passa à ronda seguinte, com eta vezes mais árvores. Em cada fold do TimeSeriesSplit, a
+# última fatia (cronológica) do treino serve de early stopping e o bloco de validação do fold
+# dá o log-loss. Cada trial fica numa linha do trial log (JSONL): correr outra vez com o mesmo
+# log e seed retoma a procura sem repetir trials.
+
+SEARCH_SPACE = {
+    'max_depth': ('int', 2, 6),
+    'learning_rate': ('log', 0.005, 0.1),
+    'subsample': ('float', 0.6, 1.0),
+    'colsample_bytree': ('float', 0.5, 1.0),
+    'min_child_weight': ('log', 1.0, 50.0),
+    'reg_lambda': ('log', 0.1, 20.0),
+}
+
+
+def sample_params(space, rng):
+    params = {}
+    for name, (kind, low, high) in space.items():
+        if kind == 'int': params[name] = int(rng.integers(low, high + 1))
+        elif kind == 'log': params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else: params[name] = float(rng.uniform(low, high))
+    return params
+
+
+def trial_key(name, params, rounds, signature):
+    return hashlib.sha256(json.dumps([name, params, rounds, signature], sort_keys=True).encode()).hexdigest()[:16]
+
+
+class TrialLog:
+    # Um trial por linha (JSONL); os já gravados são reutilizados
+    def __init__(self, path=None):
+        self.path = path
+        self.trials = {}
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try: trial = json.loads(line)
+                    except ValueError: continue  # linha cortada por uma corrida interrompida
+                    self.trials[trial['key']] = trial
+
+    def get(self, key):
+        return self.trials.get(key)
+
+    def add(self, trial):
+        with self.lock:
+            self.trials[trial['key']] = trial
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(trial) + '\n')
+
+
+def _trial(qx, name, objective, y, params, rounds, folds, weight, early_stopping_rounds, random_state):
+    # Um job por fold: (log-loss negativo no bloco de validação, árvores até ao melhor ponto)
+    def fold_job(f, fit_idx, stop_idx, val_idx):
+        keys = ((name, f, 'fit'), (name, f, 'stop'))
+        for key in keys: qx.expect(key)
+
+        def job(nthread):
+            bp, _ = booster_params(params, objective, nthread, random_state, qx.max_bin)
+            try:
+                dfit = qx.matrix(keys[0], fit_idx, y, weight)
+                dstop = qx.matrix(keys[1], stop_idx, y, ref=dfit)
+                booster = xgb.train(bp, dfit, rounds, evals=[(dstop, 'stop')],
+                                    early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+            finally:
+                for key in keys: qx.done(key)
+            best = booster.best_iteration + 1
+            proba = booster.inplace_predict(qx.rows(val_idx), iteration_range=(0, best))
+            if proba.ndim == 1: proba = np.column_stack([1 - proba, proba])
+            return -log_loss(np.asarray(y)[val_idx], proba, labels=np.arange(proba.shape[1])), best
+        return job
+    return [fold_job(f, *idx) for f, idx in enumerate(folds)]
+
+
+@timed('training.search')
+def hyperband_search(X_train, y_train, name='model_multi', space=SEARCH_SPACE, min_rounds=50, max_rounds=800, eta=3,
+                     sample_weight=None, n_splits=3, stop_fraction=0.15, early_stopping_rounds=30, time_budget=None,
+                     max_iterations=None, log_path=None, seed=42, n_threads=None, random_state=42, max_bin=MAX_BIN):
+    # Devolve o relatório com os melhores parâmetros (n_estimators = árvores até ao melhor ponto,
+    # prontos para train_models) e o ritmo (trials/s). Sem time_budget corre uma iteração do
+    # Hyperband (todos os brackets); com time_budget (segundos) continua com iterações novas até
+    # o esgotar, e nenhuma ronda nova começa depois disso (retoma daí com o mesmo log_path).
+    t0 = time.perf_counter()
+    n_threads = n_threads or os.cpu_count() or 1
+    y = model_targets(y_train)[name]
+    objective = MODEL_OBJECTIVES[name]
+    qx = QuantizedFeatures(X_train, max_bin)
+
+    folds = []
+    for train_idx, val_idx in TimeSeriesSplit(n_splits=n_splits).split(qx.values):
+        cut = len(train_idx) - max(1, int(len(train_idx) * stop_fraction))
+        folds.append((train_idx[:cut], train_idx[cut:], val_idx))
+    signature = [len(qx.values), n_splits, stop_fraction, early_stopping_rounds, random_state, max_bin,
+                 sample_weight is not None]
+    log = TrialLog(log_path)
+
+    s_max = int(np.floor(np.log(max_rounds / min_rounds) / np.log(eta) + 1e-9))
+    iterations = range(max_iterations) if max_iterations else itertools.count() if time_budget else range(1)
+    brackets = ((iteration, s) for iteration in iterations for s in range(s_max, -1, -1))
+    rng = np.random.default_rng(seed)
+    trained = reused = 0
+    best = None
+    stopped = False
+    for iteration, s in brackets:
+        # Bracket s: n configurações com r árvores; em cada ronda fica 1/eta com eta vezes mais árvores
+        n = int(np.ceil((s_max + 1) / (s + 1) * eta ** s))
+        configs = [sample_params(space, rng) for _ in range(n)]
+        for i in range(s + 1):
+            if time_budget is not None and time.perf_counter() - t0 > time_budget:
+                stopped = True
+                break
+            rounds = int(round(max_rounds * eta ** (i - s)))
+            keys = [trial_key(name, p, rounds, signature) for p in configs]
+            todo = [c for c, key in enumerate(keys) if log.get(key) is None]
+            reused += len(configs) - len(todo)
+
+            t1 = time.perf_counter()
+            jobs = [job for c in todo for job in _trial(qx, name, objective, y, configs[c], rounds, folds,
+                                                         sample_weight, early_stopping_rounds, random_state)]
+            results, _ = run_parallel(jobs, n_threads) if jobs else ([], None)
+            seconds = (time.perf_counter() - t1) / max(1, len(todo))
+            for j, c in enumerate(todo):
+                fold_results = results[j * len(folds):(j + 1) * len(folds)]
+                log.add({'key': keys[c], 'name': name, 'iteration': iteration, 'bracket': s, 'rung': i, 'rounds': rounds,
+                         'params': configs[c], 'score': float(np.mean([r[0] for r in fold_results])),
+                         'fold_scores': [r[0] for r in fold_results], 'best_rounds': [r[1] for r in fold_results],
+                         'seconds': seconds})
+            trained += len(todo)
+
+            trials = [log.get(key) for key in keys]
+            for trial in trials:
+                if best is None or trial['score'] > best['score']: best = trial
+            order = np.argsort([-t['score'] for t in trials], kind='stable')
+            configs = [configs[c] for c in order[:max(1, len(configs) // eta)]]
+        if stopped: break
+
+    seconds = time.perf_counter() - t0
+    best_params = None
+    if best is not None:
+        best_params = dict(best['params'], n_estimators=int(np.ceil(np.mean(best['best_rounds']))))
+    return {'name': name, 'best_params': best_params, 'best_score': best['score'] if best else None,
+            'trials': trained, 'reused': reused, 'seconds': seconds, 'trials_per_second': trained / seconds if seconds else 0.0,
+            'complete': not stopped}
+
+
+def print_search_report(report):
+    status = 'completa' if report['complete'] else 'parada no orçamento de tempo (retoma com o mesmo log)'
+    print(f"🔍 Procura {report['name']}: {report['trials']} trials em {report['seconds']:.0f}s "
+          f"({report['trials_per_second']:.2f} trials/s, {report['reused']} reutilizados do log), {status}")
+    if report['best_params']:
+        print(f"✅ Melhores Params ({report['name']}): {report['best_params']} (log-loss CV {-report['best_score']:.4f})")
@@ -0,0 +1,151 @@
+import os
+import re
+import json
+import time
+import codecs
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from football_data import PartitionCache, partition_key
+
+# --- SCRAPER UNDERSTAT (xG) ---
+# Uma única sessão (cloudscraper) partilhada, N pedidos em voo e um token bucket a limitar o
+# ritmo (em vez de uma sessão nova + sleep aleatório de 2-5s por página). Cada liga/época é
+# gravada assim que chega (UNDERSTAT_CACHE_DIR/<época>/<liga>.csv): uma corrida interrompida
+# continua de onde parou e as épocas já terminadas nunca mais são pedidas.
+
+UNDERSTAT_URL = "https://understat.com/league"
+UNDERSTAT_LEAGUES = ['EPL', 'Bundesliga', 'La_liga', 'Ligue_1', 'Serie_A', 'Champions_League']
+UNDERSTAT_CACHE_DIR = 'understat_cache'
+
+JSON_PARSE_RE = re.compile(r"JSON\.parse\s*\(\s*(['\"])(.*?)\1\s*\)", re.DOTALL)
+DATES_DATA_RE = re.compile(r"var\s+datesData\s*=\s*(\[.*?\]);", re.DOTALL)
+
+
+def extract_matches_json(html):
+    # Lista de jogos embutida na página (JSON.parse('\x5B...') ou var datesData = [...]), ou None
+    for quote, content in JSON_PARSE_RE.findall(html):
+        try:
+            # Descodificar caracteres hexadecimais (\x5B -> [)
+            data = json.loads(codecs.decode(content, 'unicode_escape'))
+        except ValueError:
+            continue
+        # É a lista de jogos? Primeiro item com 'h' (casa), 'a' (fora), 'goals' e 'xG'
+        if isinstance(data, list) and data and isinstance(data[0], dict):
+            if all(k in data[0] for k in ['h', 'a', 'goals', 'xG']):
+                return data
+
+    direct_match = DATES_DATA_RE.search(html)
+    if direct_match:
+        try: return json.loads(direct_match.group(1))
+        except ValueError: pass
+    return None
+
+
+def matches_to_frame(data, league_name):
+    # Só jogos já realizados
+    matches = []
+    for m in data:
+        if m.get('isResult', False):
+            matches.append({
+                'Date': m['datetime'][:10],
+                'HomeTeam': m['h']['title'],
+                'AwayTeam': m['a']['title'],
+                'FTHG': int(m['goals']['h']),
+                'FTAG': int(m['goals']['a']),
+                'Home_xG': float(m['xG']['h']),
+                'Away_xG': float(m['xG']['a']),
+                'League': league_name
+            })
+    return pd.DataFrame(matches, columns=['Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'Home_xG', 'Away_xG', 'League'])
+
+
+class TokenBucket:
+    # rate pedidos/segundo em média, até `burst` seguidos
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class UnderstatScraper:
+    def __init__(self, cache_dir=UNDERSTAT_CACHE_DIR, max_in_flight=3, rate=0.5, burst=2,
+                 session=None, base_url=UNDERSTAT_URL, timeout=(5, 30)):
+        self.cache = PartitionCache(cache_dir)
+        self.max_in_flight = max_in_flight
+        self.bucket = TokenBucket(rate, burst)
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        if session is None:
+            import cloudscraper  # Passa pelo Cloudflare
+            session = cloudscraper.create_scraper()
+        self.session = session
+
+    def fetch(self, year, league_name):
+        # Descarrega e grava uma liga/época. Devolve o DataFrame (levanta exceção se falhar)
+        self.bucket.acquire()
+        response = self.session.get(f"{self.base_url}/{league_name}/{year}", timeout=self.timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"Erro HTTP: {response.status_code}")
+        data = extract_matches_json(response.text)
+        if not data:
+            raise RuntimeError("Proteção ativa ou dados não encontrados")
+        df = matches_to_frame(data, league_name)
+        self.cache.write(year, league_name, df.to_csv(index=False).encode('utf-8'))
+        self.cache.record(year, league_name, status='ok', rows=len(df),
+                          checked=datetime.now().isoformat(timespec='seconds'))
+        self.cache.save()  # gravado já: uma corrida interrompida retoma daqui
+        return df
+
+    def run(self, start_year, end_year, leagues=UNDERSTAT_LEAGUES, refresh_all=False):
+        # Relatório {'cached': [...], 'downloaded': [...], 'failed': {chave: erro}}
+        today = datetime.now()
+        current = today.year if today.month >= 8 else today.year - 1  # Understat não tem dados futuros
+        report = {'cached': [], 'downloaded': [], 'failed': {}}
+        todo = []
+        for year in range(start_year, min(end_year, current) + 1):
+            for league in leagues:
+                if not refresh_all and self.cache.is_final(year, league):
+                    report['cached'].append(partition_key(year, league))
+                else:
+                    todo.append((year, league))
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='understat') as pool:
+            futures = {pool.submit(self.fetch, year, league): (year, league) for year, league in todo}
+            for future in as_completed(futures):
+                year, league = futures[future]
+                key = partition_key(year, league)
+                try:
+                    df = future.result()
+                    report['downloaded'].append(key)
+                    print(f"   🕷️ xG {league} {year}/{year + 1}: {len(df)} jogos")
+                except Exception as e:
+                    report['failed'][key] = f"{e.__class__.__name__}: {e}"
+        return report
+
+
+def load_understat(start_year, end_year, leagues=UNDERSTAT_LEAGUES, cache_dir=UNDERSTAT_CACHE_DIR):
+    # Junta as ligas/épocas gravadas
+    cache = PartitionCache(cache_dir)
+    dfs = []
+    for year in range(start_year, end_year + 1):
+        for league in leagues:
+            entry = cache.entry(year, league)
+            if entry and entry.get('status') == 'ok' and os.path.exists(cache.path(year, league)):
+                dfs.append(pd.read_csv(cache.path(year, league)))
+    return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
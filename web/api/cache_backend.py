@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+
+# --- CACHE PARTILHADA ENTRE WORKERS ---
+# Com gunicorn cada worker é um processo: um dict global por worker significa N cópias,
+# N chamadas à Odds API por liga e a cache perdida em cada restart. Aqui:
+#   - LRUCache: cache em memória do processo (limitada);
+#   - SQLiteCache: ficheiro partilhado por todos os workers da máquina (escritas atómicas
+#     numa transação, WAL) com locks por chave, para só um worker atualizar cada liga;
+#   - TieredCache: junta as duas com TTL e contadores de hits/misses, e comporta-se como
+#     o dict api_cache ({chave: {'data': ..., 'ts': ...}}). Só o get conta nas stats;
+#     peek, `in` e items() leem a entrada sem contar.
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), 'football_api_cache.sqlite3')
+
+
+class LRUCache:
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is not None:
+                self.data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.data[key] = entry
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def keys(self):
+        with self.lock:
+            return list(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class SQLiteCache:
+    def __init__(self, path=DEFAULT_DB, lock_ttl=30):
+        self.path = path
+        self.lock_ttl = lock_ttl
+        self.local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, ts REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def _conn(self):
+        # Uma ligação por thread (sqlite3 não partilha ligações entre threads)
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get_ts(self, key):
+        row = self._conn().execute("SELECT ts FROM cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value, ts FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None: return None
+        return {'data': json.loads(row[0]), 'ts': row[1]}
+
+    def set(self, key, entry):
+        self._conn().execute("INSERT OR REPLACE INTO cache (key, value, ts) VALUES (?, ?, ?)",
+                             (key, json.dumps(entry['data']), entry['ts']))
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def keys(self):
+        return [r[0] for r in self._conn().execute("SELECT key FROM cache").fetchall()]
+
+    # --- LOCKS POR CHAVE (entre processos) ---
+    def acquire(self, key, owner, ttl=None):
+        # ttl: validade deste lock (por defeito lock_ttl); o mesmo owner pode voltar a pedir para o estender
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, expires FROM locks WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] > now and row[0] != owner:
+                conn.execute("COMMIT")
+                return False
+            conn.execute("INSERT OR REPLACE INTO locks (key, owner, expires) VALUES (?, ?, ?)", (key, owner, now + (ttl or self.lock_ttl)))
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, key, owner):
+        self._conn().execute("DELETE FROM locks WHERE key = ? AND owner = ?", (key, owner))
+
+    def is_locked(self, key):
+        row = self._conn().execute("SELECT expires FROM locks WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+
+class TieredCache:
+    def __init__(self, ttl, shared=None, maxsize=64):
+        self.ttl = ttl
+        self.local = LRUCache(maxsize)
+        self.shared = shared
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'stale': 0, 'lock_waits': 0}
+        self.stats_lock = threading.Lock()
+
+    @property
+    def owner(self):
+        return f"{os.getpid()}-{threading.get_ident()}"
+
+    def _count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def _lookup(self, key):
+        # (entrada mais recente, de onde veio: 'local' | 'shared'), expirada ou não
+        entry = self.local.get(key)
+        if entry is not None and time.time() - entry['ts'] < self.ttl:
+            return entry, 'local'
+        if self.shared is not None:
+            # Só descodifica o payload partilhado se for mais recente que a cópia local
+            ts = self.shared.get_ts(key)
+            if ts is not None and (entry is None or ts > entry['ts']):
+                shared_entry = self.shared.get(key)
+                if shared_entry is not None:
+                    self.local.set(key, shared_entry)
+                    return shared_entry, 'shared'
+        return entry, 'local'
+
+    def get(self, key, default=None):
+        entry, source = self._lookup(key)
+        if entry is None:
+            self._count('misses')
+            return default
+        self._count(f'{source}_hits' if time.time() - entry['ts'] < self.ttl else 'stale')
+        return entry
+
+    def peek(self, key, default=None):
+        # Como o get, mas sem contar nas stats (varrimentos internos, `in`, items())
+        entry, _ = self._lookup(key)
+        return default if entry is None else entry
+
+    def __getitem__(self, key):
+        entry = self.get(key)
+        if entry is None: raise KeyError(key)
+        return entry
+
+    def __setitem__(self, key, entry):
+        if self.shared is not None:
+            self.shared.set(key, entry)
+        self.local.set(key, entry)
+
+    def __delitem__(self, key):
+        if self.shared is not None:
+            self.shared.delete(key)
+        self.local.delete(key)
+
+    def __contains__(self, key):
+        return self.peek(key) is not None
+
+    def keys(self):
+        keys = self.local.keys()
+        if self.shared is not None:
+            keys += [k for k in self.shared.keys() if k not in keys]
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        for key in self.keys():
+            entry = self.peek(key)
+            if entry is not None:
+                yield key, entry
+
+    # --- REFRESH COORDENADO: só um worker vai à API por chave ---
+    def acquire(self, key, ttl=None):
+        if self.shared is None: return True
+        return self.shared.acquire(key, self.owner, ttl)
+
+    def release(self, key):
+        if self.shared is not None:
+            self.shared.release(key, self.owner)
+
+    def wait_for(self, key, newer_than=None, timeout=15, poll=0.1):
+        # Espera que o worker que tem o lock grave a chave (ou largue o lock)
+        self._count('lock_waits')
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            ts = self.shared.get_ts(key)
+            if ts is not None and (newer_than is None or ts > newer_than):
+                break
+            if not self.shared.is_locked(key):
+                break
+            time.sleep(poll)
+        return self.peek(key)
+
+    def snapshot_stats(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['evictions'] = self.local.evictions
+        stats['local_keys'] = len(self.local.keys())
+        stats['backend'] = 'sqlite' if self.shared is not None else 'memory'
+        return stats
@@ -0,0 +1,143 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# --- HISTÓRICO COMPACTO (TREINO E SITE) ---
+# O df_ready tem todas as features em float64 e Date/HomeTeam/AwayTeam/Div em object. Aqui fica:
+#   chaves    Date em datetime64, equipas e divisões em códigos inteiros (int8/int16/int32, -1 = vazio)
+#             com as categorias à parte; HomeTeam e AwayTeam partilham o mesmo vocabulário de equipas
+#   X         as features do modelo numa matriz float32 (linhas x features) contígua, pela ordem
+#             do modelo: é o input do treino/previsão sem cópias
+#   extra     as outras colunas numéricas que alguém lê (golos, posições...) noutra matriz float32
+# e um índice coluna -> (matriz, posição). Tudo o que não é pedido fica de fora.
+# O XGBoost converte sempre o input para float32, por isso as previsões não mudam.
+
+TEAM_COLUMNS = ('HomeTeam', 'AwayTeam')
+KEY_COLUMNS = ('Date', 'HomeTeam', 'AwayTeam', 'Div')
+FLOAT_TOLERANCE = 1e-6
+
+
+def _code_dtype(n):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(dtype).max: return dtype
+    return np.int64
+
+
+def _encode_keys(df, columns):
+    # (arrays, categorias): datas em datetime64, texto em códigos
+    keys, categories = {}, {}
+    teams = [c for c in columns if c in TEAM_COLUMNS]
+    if teams:
+        names = {c: df[c].astype(object) for c in teams}
+        names = {c: s.where(s.isna(), s.astype(str)) for c, s in names.items()}
+        vocab = sorted(set().union(*(s.dropna().unique() for s in names.values())))
+        for c, s in names.items():
+            categories[c] = vocab
+            keys[c] = pd.Categorical(s, categories=vocab).codes
+    for c in columns:
+        if c in keys: continue
+        s = df[c]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            keys[c] = s.to_numpy(dtype='datetime64[ns]')
+        else:
+            codes, uniques = pd.factorize(s.astype(object), sort=True)
+            keys[c], categories[c] = codes, [str(u) for u in uniques]
+    for c in categories:
+        keys[c] = np.asarray(keys[c]).astype(_code_dtype(len(categories[c])))
+    return keys, categories
+
+
+class CompactFrame:
+    def __init__(self, keys, categories, features, X, extra_columns, extra):
+        self.keys = keys                # {coluna: array} datas e códigos
+        self.categories = categories    # {coluna: [categorias]} das colunas em código
+        self.features, self.X = list(features), X
+        self.extra_columns, self.extra = list(extra_columns), extra
+        self.index = {c: (self.X, i) for i, c in enumerate(self.features)}
+        self.index.update({c: (self.extra, j) for j, c in enumerate(self.extra_columns)})
+
+    @classmethod
+    def from_frame(cls, df, features, extra=(), keys=KEY_COLUMNS, dtype=np.float32):
+        # features: colunas do modelo (pela ordem do modelo); extra: outras colunas numéricas a manter
+        df = df.reset_index(drop=True)
+        key_arrays, categories = _encode_keys(df, [c for c in keys if c in df.columns])
+        features = [f for f in features if f in df.columns]
+        extra = [c for c in extra if c in df.columns and c not in features and c not in key_arrays
+                 and pd.api.types.is_numeric_dtype(df[c]) and not isinstance(df[c].dtype, pd.CategoricalDtype)]
+        matrix = lambda cols: np.ascontiguousarray(df[cols].to_numpy(dtype=dtype) if cols else np.empty((len(df), 0), dtype=dtype))
+        return cls(key_arrays, categories, features, matrix(features), extra, matrix(extra))
+
+    @property
+    def columns(self):
+        return list(self.keys) + self.features + self.extra_columns
+
+    def __len__(self):
+        return len(self.X)
+
+    def __contains__(self, col):
+        return col in self.keys or col in self.index
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.keys.values()) + self.X.nbytes + self.extra.nbytes
+
+    def column(self, col):
+        if col in self.keys:
+            values = self.keys[col]
+            categories = self.categories.get(col)
+            return pd.Categorical.from_codes(values, categories) if categories is not None else values
+        matrix, i = self.index[col]
+        return matrix[:, i]
+
+    def features_frame(self, rows=slice(None)):
+        # Input dos modelos (DataFrame por cima da matriz X, sem cópia)
+        return pd.DataFrame(self.X[rows], columns=self.features, copy=False)
+
+    def to_frame(self, columns=None):
+        return pd.DataFrame({col: self.column(col) for col in (columns or self.columns)})
+
+    # Bundle: um .npy por chave + as duas matrizes, abertos com mmap
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for col, values in self.keys.items():
+            np.save(os.path.join(path, f"{col}.npy"), np.ascontiguousarray(values))
+        np.save(os.path.join(path, 'X.npy'), self.X)
+        np.save(os.path.join(path, 'extra.npy'), self.extra)
+        spec = {'rows': len(self), 'keys': list(self.keys), 'categories': self.categories,
+                'features': self.features, 'extra': self.extra_columns}
+        with open(os.path.join(path, 'compact.json'), 'w', encoding='utf-8') as f:
+            json.dump(spec, f, ensure_ascii=False)
+        return spec
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        with open(os.path.join(path, 'compact.json'), encoding='utf-8') as f:
+            spec = json.load(f)
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+        return cls({col: load(col) for col in spec['keys']}, spec['categories'],
+                   spec['features'], load('X'), spec['extra'], load('extra'))
+
+
+def compaction_report(df, compact):
+    before = int(df.memory_usage(deep=True).sum())
+    return {'rows': len(compact), 'before': before, 'after': compact.nbytes, 'saved': before - compact.nbytes,
+            'dropped': [c for c in df.columns if c not in compact]}
+
+
+def print_compaction(report):
+    print(f"📦 Histórico compacto: {report['rows']} linhas, {report['before'] / 1e6:.1f}MB -> {report['after'] / 1e6:.1f}MB "
+          f"({report['saved'] / 1e6:.1f}MB poupados, {len(report['dropped'])} colunas fora)")
+
+
+def output_diff(models, df, compact, rows=slice(None)):
+    # Diferença máxima entre as previsões com o df original (float64) e com a matriz compacta,
+    # por modelo (rows: as mesmas linhas nos dois)
+    full = df.reset_index(drop=True).iloc[rows][compact.features].astype(np.float64)
+    small = compact.features_frame(rows)
+    diffs = {}
+    for name, model in models.items():
+        if model is None: continue
+        predict = model.predict_proba if hasattr(model, 'predict_proba') else model.predict
+        diffs[name] = float(np.max(np.abs(predict(full) - predict(small)))) if len(full) else 0.0
+    return diffs
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+# --- MOTOR DE ELO INCREMENTAL ---
+# Ratings guardados num array NumPy indexado por equipa (em vez de um dict).
+# fit() faz o replay completo do histórico; update() aplica apenas os jogos mais
+# recentes que a marca d'água (watermark) guardada, por isso uma atualização diária
+# custa O(jogos novos). save()/load() usam um .npz compacto, sem pickle.
+
+BASE_ELO = 1500
+K_FACTOR = 20
+
+
+def elo_after(home_elo, away_elo, result, k=K_FACTOR):
+    # Elo das duas equipas depois do jogo, a partir do Elo pré-jogo e do resultado ('H'/'D'/'A');
+    # a mesma conta do _apply, mas vetorizada (resultado desconhecido = Elo sem mudança)
+    home_elo = np.asarray(home_elo, dtype=np.float64)
+    away_elo = np.asarray(away_elo, dtype=np.float64)
+    result = np.asarray(result, dtype=object)
+    actual = np.where(result == 'H', 1.0, np.where(result == 'D', 0.5, 0.0))
+    delta = k * (actual - 1 / (1 + 10 ** ((away_elo - home_elo) / 400)))
+    delta = np.where(np.isin(result, ['H', 'D', 'A']), delta, 0.0)
+    return home_elo + delta, away_elo - delta
+
+
+class EloEngine:
+    def __init__(self, k=K_FACTOR, base=BASE_ELO):
+        self.k = float(k)
+        self.base = float(base)
+        self.teams = []
+        self.index = {}
+        self.ratings = np.empty(0, dtype=np.float64)
+        self.watermark = None      # Data do último jogo aplicado
+        self.watermark_keys = set()  # (casa, fora) já aplicados nesse dia
+
+    # --- EQUIPAS ---
+    def _codes(self, names):
+        codes = np.empty(len(names), dtype=np.int64)
+        new = []
+        for i, name in enumerate(names):
+            code = self.index.get(name)
+            if code is None:
+                code = len(self.teams)
+                self.index[name] = code
+                self.teams.append(name)
+                new.append(name)
+            codes[i] = code
+        if new:
+            self.ratings = np.concatenate([self.ratings, np.full(len(new), self.base)])
+        return codes
+
+    def get(self, team, default=None):
+        code = self.index.get(team)
+        if code is None:
+            return self.base if default is None else default
+        return float(self.ratings[code])
+
+    def __contains__(self, team):
+        return team in self.index
+
+    def __len__(self):
+        return len(self.teams)
+
+    def as_dict(self):
+        return dict(zip(self.teams, self.ratings.tolist()))
+
+    @classmethod
+    def from_dict(cls, elos, k=K_FACTOR, base=BASE_ELO):
+        engine = cls(k=k, base=base)
+        engine._codes(list(elos))
+        engine.ratings = np.array([float(v) for v in elos.values()], dtype=np.float64)
+        return engine
+
+    # --- JOGOS ---
+    def _apply(self, results):
+        # Devolve o Elo PRÉ-JOGO de cada linha (features HomeElo/AwayElo)
+        results = results.sort_values('Date', kind='stable')
+        hc = self._codes(results['HomeTeam'].tolist())
+        ac = self._codes(results['AwayTeam'].tolist())
+        res = results['FTR'].to_numpy()
+        actual = np.where(res == 'H', 1.0, np.where(res == 'D', 0.5, 0.0)).tolist()
+
+        # O Elo é sequencial por natureza: loop em listas Python (sem pandas por linha)
+        r = self.ratings.tolist()
+        k = self.k
+        home_elo = np.empty(len(results)); away_elo = np.empty(len(results))
+        for i, (h, a, act) in enumerate(zip(hc.tolist(), ac.tolist(), actual)):
+            h_elo = r[h]; a_elo = r[a]
+            home_elo[i] = h_elo; away_elo[i] = a_elo
+            delta = k * (act - 1 / (1 + 10 ** ((a_elo - h_elo) / 400)))
+            r[h] = h_elo + delta
+            r[a] = a_elo - delta
+        self.ratings = np.array(r, dtype=np.float64)
+
+        if len(results):
+            last = results['Date'].max()
+            keys = set(zip(results.loc[results['Date'] == last, 'HomeTeam'], results.loc[results['Date'] == last, 'AwayTeam']))
+            if self.watermark is not None and last == self.watermark:
+                self.watermark_keys |= keys
+            else:
+                self.watermark, self.watermark_keys = last, keys
+
+        return pd.DataFrame({'HomeElo': home_elo, 'AwayElo': away_elo}, index=results.index)
+
+    def fit(self, history):
+        self.teams, self.index = [], {}
+        self.ratings = np.empty(0, dtype=np.float64)
+        self.watermark, self.watermark_keys = None, set()
+        return self._apply(history)
+
+    def update(self, new_results):
+        # Só entram jogos depois da watermark (e os do próprio dia ainda não aplicados)
+        new_results = new_results.dropna(subset=['Date'])
+        if self.watermark is not None:
+            dates = new_results['Date']
+            keep = (dates > self.watermark).to_numpy().copy()
+            same_day = np.flatnonzero((dates == self.watermark).to_numpy())
+            if len(same_day):
+                pairs = zip(new_results['HomeTeam'].iloc[same_day], new_results['AwayTeam'].iloc[same_day])
+                keep[same_day] = [p not in self.watermark_keys for p in pairs]
+            new_results = new_results[keep]
+        return self._apply(new_results)
+
+    # --- PERSISTÊNCIA ---
+    def save(self, path):
+        keys = sorted(self.watermark_keys)
+        np.savez_compressed(
+            path,
+            teams=np.array(self.teams, dtype=str),
+            ratings=self.ratings,
+            params=np.array([self.k, self.base]),
+            watermark=np.array([] if self.watermark is None else [np.datetime64(self.watermark, 'ns')], dtype='datetime64[ns]'),
+            watermark_keys=np.array(keys, dtype=str).reshape(-1, 2),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            k, base = data['params'].tolist()
+            engine = cls(k=k, base=base)
+            engine.teams = data['teams'].tolist()
+            engine.index = {t: i for i, t in enumerate(engine.teams)}
+            engine.ratings = data['ratings'].astype(np.float64)
+            if len(data['watermark']):
+                engine.watermark = pd.Timestamp(data['watermark'][0])
+            engine.watermark_keys = {tuple(k) for k in data['watermark_keys'].tolist()}
+        return engine
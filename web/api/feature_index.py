@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+from team_history import TeamHistory
+from elo_engine import EloEngine, BASE_ELO, K_FACTOR, elo_after
+
+# --- ÍNDICE DE FEATURES POR EQUIPA ---
+# Construído uma vez ao carregar o modelo: para cada equipa guarda as stats do seu
+# último jogo (do ponto de vista dela, casa ou fora) numa linha NumPy, mais o vetor
+# das médias de cada feature. Montar o input de um jogo passa a ser indexação de arrays
+# em vez de filtrar o histórico inteiro em cada pedido.
+# Com uma data, tudo é "as-of" dessa data, para previsões históricas sem fuga de informação:
+#   - stats do último jogo de cada equipa ANTES da data (TeamHistory: pesquisa binária por equipa);
+#   - Elo de cada equipa depois desse jogo (Elo pré-jogo guardado + a atualização pelo resultado;
+#     históricos sem HomeElo/AwayElo têm o Elo repetido aqui a partir dos resultados);
+#   - médias (fallback) só dos jogos anteriores à data (RunningMeans: somas acumuladas por dia).
+
+
+def _nanoseconds(dates):
+    return pd.DatetimeIndex(dates).as_unit('ns').asi8
+
+
+def match_results(history):
+    # 'H'/'D'/'A' de cada linha (FTR ou pelos golos); None se o resultado não for conhecido
+    if 'FTR' in history.columns:
+        return history['FTR'].astype(object).where(history['FTR'].notna(), None).to_numpy()
+    if {'FTHG', 'FTAG'} <= set(history.columns):
+        hg = pd.to_numeric(history['FTHG'], errors='coerce').to_numpy(dtype=np.float64)
+        ag = pd.to_numeric(history['FTAG'], errors='coerce').to_numpy(dtype=np.float64)
+        out = np.where(hg > ag, 'H', np.where(hg == ag, 'D', 'A')).astype(object)
+        out[np.isnan(hg) | np.isnan(ag)] = None
+        return out
+    return None
+
+
+class RunningMeans:
+    # Média de cada coluna só com as linhas antes de uma data: somas e contagens (sem NaN)
+    # acumuladas por dia, cada consulta é um searchsorted
+    def __init__(self, values, dates, fallback):
+        dates = _nanoseconds(dates)
+        order = np.argsort(dates, kind='stable')
+        values = np.asarray(values, dtype=np.float64)[order]
+        self.days, starts = np.unique(dates[order], return_index=True)
+        self.fallback = np.asarray(fallback, dtype=np.float64)
+        if len(values):
+            self.sums = np.cumsum(np.add.reduceat(np.nan_to_num(values), starts, axis=0), axis=0)
+            self.counts = np.cumsum(np.add.reduceat((~np.isnan(values)).astype(np.int64), starts, axis=0), axis=0)
+        else:
+            self.sums = self.counts = np.zeros((0, len(self.fallback)))
+
+    def before(self, dates):
+        # (n_datas x n_colunas); sem jogos antes da data (ou coluna sem valores): o fallback
+        rank = np.searchsorted(self.days, _nanoseconds(dates), side='left') - 1
+        out = np.tile(self.fallback, (len(rank), 1))
+        seen = rank >= 0
+        if seen.any():
+            counts = self.counts[rank[seen]]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = self.sums[rank[seen]] / counts
+            out[seen] = np.where(counts > 0, means, out[seen])
+        return out
+
+
+class TeamFeatureIndex:
+    def __init__(self, history, features, le_div=None, elo_k=K_FACTOR):
+        self.features = list(features)
+        self.position = {f: i for i, f in enumerate(self.features)}
+
+        # Médias (fallback para equipas sem histórico e features que não estão no histórico)
+        self.means = np.zeros(len(self.features), dtype=np.float64)
+        for i, f in enumerate(self.features):
+            if f in history.columns:
+                self.means[i] = pd.to_numeric(history[f], errors='coerce').mean()
+        self.means = np.nan_to_num(self.means)
+
+        # Stats "neutras" (X) que existem como Home_X e Away_X no histórico
+        self.stats = [c[5:] for c in history.columns if c.startswith('Home_') and f"Away_{c[5:]}" in history.columns]
+        stat_pos = {s: j for j, s in enumerate(self.stats)}
+
+        self.teams = {}
+        self.snapshots = np.empty((0, len(self.stats)), dtype=np.float64)
+        self.history = None
+        self.running_means = None
+        self.elo_home = self.elo_away = None  # Elo de cada lado depois de cada linha do histórico
+        if len(history) and 'Date' in history.columns:
+            in_history = [i for i, f in enumerate(self.features) if f in history.columns]
+            values = np.full((len(history), len(self.features)), np.nan)
+            for i in in_history:
+                values[:, i] = pd.to_numeric(history[self.features[i]], errors='coerce').to_numpy(dtype=np.float64)
+            self.running_means = RunningMeans(values, history['Date'], self.means)
+        if len(history) and self.stats and 'HomeTeam' in history.columns:
+            history = history.sort_values('Date', kind='stable') if 'Date' in history.columns else history
+            # Stats de cada linha (float32, o que o modelo usa) para as consultas por data
+            self.home_vals = history[[f"Home_{s}" for s in self.stats]].to_numpy(dtype=np.float32)
+            self.away_vals = history[[f"Away_{s}" for s in self.stats]].to_numpy(dtype=np.float32)
+            dates = history['Date'] if 'Date' in history.columns else np.arange(len(history))  # sem datas: a ordem
+            self.history = TeamHistory(history['HomeTeam'], history['AwayTeam'], dates)
+
+            results = match_results(history)
+            if results is not None:
+                if {'HomeElo', 'AwayElo'} <= set(history.columns):
+                    pre = history[['HomeElo', 'AwayElo']].to_numpy(dtype=np.float64)
+                else:
+                    # bundle/.pkl sem o Elo pré-jogo: replay dos resultados (EloEngine, mesma conta)
+                    replay = history[['Date', 'HomeTeam', 'AwayTeam']].assign(FTR=results)
+                    pre = EloEngine(k=elo_k).fit(replay)[['HomeElo', 'AwayElo']].to_numpy()  # já por data
+                self.elo_home, self.elo_away = elo_after(pre[:, 0], pre[:, 1], results, elo_k)
+
+            # Último jogo de cada equipa (casa ou fora, o mais recente)
+            teams = sorted(self.history.teams, key=str)
+            self.snapshots, _ = self.stats_before(teams)
+            self.teams = {t: i for i, t in enumerate(teams)}
+
+        # Mapeamento feature -> coluna do snapshot, por lado
+        self.home_feat, self.home_stat, self.away_feat, self.away_stat = [], [], [], []
+        for i, f in enumerate(self.features):
+            for prefix, feat_idx, stat_idx in (('Home_', self.home_feat, self.home_stat), ('Away_', self.away_feat, self.away_stat)):
+                if f.startswith(prefix) and f[len(prefix):] in stat_pos:
+                    feat_idx.append(i); stat_idx.append(stat_pos[f[len(prefix):]])
+        self.home_feat = np.array(self.home_feat, dtype=np.int64); self.home_stat = np.array(self.home_stat, dtype=np.int64)
+        self.away_feat = np.array(self.away_feat, dtype=np.int64); self.away_stat = np.array(self.away_stat, dtype=np.int64)
+
+        # le_div: LabelEncoder ou só a lista de divisões (bundle)
+        self.div_codes = {}
+        if le_div is not None:
+            self.div_codes = {d: i for i, d in enumerate(getattr(le_div, 'classes_', le_div))}
+
+    def __contains__(self, team):
+        return team in self.teams
+
+    @property
+    def has_elo(self):
+        return self.elo_home is not None
+
+    def elos_before(self, teams, dates):
+        # Elo de cada equipa antes da data (depois do seu último jogo); sem jogos antes: o Elo inicial
+        rows, home, _ = self.history.lookup(teams, dates)
+        found = rows >= 0
+        rows = np.where(found, rows, 0)
+        return np.where(found, np.where(home, self.elo_home[rows], self.elo_away[rows]), BASE_ELO)
+
+    def means_before(self, dates):
+        if self.running_means is None: return np.tile(self.means, (len(dates), 1))
+        return self.running_means.before(dates)
+
+    def stats_before(self, teams, dates=None):
+        # (stats do último jogo de cada equipa antes da data, encontrado?) por linha
+        if self.history is None:
+            return np.zeros((len(teams), len(self.stats))), np.zeros(len(teams), dtype=bool)
+        rows, home, _ = self.history.lookup(teams, dates)
+        found = rows >= 0
+        rows = np.where(found, rows, 0)
+        return np.where(home[:, None], self.home_vals[rows], self.away_vals[rows]).astype(np.float64), found
+
+    def build_rows(self, homes, aways, dates=None):
+        # Várias linhas de uma vez (ex: voltar a prever jogos passados), só com o histórico; com
+        # datas, as médias e o Elo também são os de antes de cada data
+        X = np.tile(self.means, (len(homes), 1)) if dates is None else self.means_before(dates)
+        for teams, feat, stat in ((homes, self.home_feat, self.home_stat), (aways, self.away_feat, self.away_stat)):
+            stats, found = self.stats_before(teams, dates)
+            X[np.ix_(found, feat)] = stats[np.ix_(found, stat)]
+        if dates is not None and self.has_elo:
+            elos = {'HomeElo': self.elos_before(homes, dates), 'AwayElo': self.elos_before(aways, dates)}
+            elos['EloDiff'] = elos['HomeElo'] - elos['AwayElo']
+            for f, v in elos.items():
+                if f in self.position: X[:, self.position[f]] = v
+        return X
+
+    def build_row(self, home, away, values=None, div=None, date=None):
+        # Linha de input (1 x n_features) pronta para os modelos; date: só jogos antes dessa data
+        if date is not None:
+            x = self.build_rows([home], [away], [date])[0]
+        else:
+            x = self.means.copy()
+            h = self.teams.get(home)
+            if h is not None: x[self.home_feat] = self.snapshots[h, self.home_stat]
+            a = self.teams.get(away)
+            if a is not None: x[self.away_feat] = self.snapshots[a, self.away_stat]
+
+        if div is not None and 'Div_Code' in self.position:
+            x[self.position['Div_Code']] = self.div_codes.get(div, 0)
+        for f, v in (values or {}).items():
+            i = self.position.get(f)
+            if i is not None: x[i] = v
+        return x[None, :]
@@ -0,0 +1,93 @@
+import threading
+
+# --- ÍNDICE DE JOGOS / ODDS ---
+# Reconstruído para uma liga sempre que o payload dessa liga é atualizado (não em cada
+# pedido): update_league é o on_update do OddsClient, a única via de entrada. Guarda:
+# fixture_id -> jogo já tratado (linha do /api/fixtures + odds por casa de apostas +
+# melhores odds) e data -> linhas já ordenadas por hora. O /api/odds passa a ser um lookup
+# num dict e o /api/fixtures devolve a lista pronta desse dia.
+
+
+def parse_bookmakers(game):
+    # {casa de apostas: {'h', 'd', 'a'}} a partir do mercado h2h (0 se não houver)
+    books = {}
+    for b in game.get('bookmakers', []):
+        odds = {'h': 0, 'd': 0, 'a': 0}
+        for m in b.get('markets', []):
+            if m['key'] == 'h2h':
+                for out in m['outcomes']:
+                    if out['name'] == game['home_team']: odds['h'] = out['price']
+                    elif out['name'] == game['away_team']: odds['a'] = out['price']
+                    elif out['name'] == 'Draw': odds['d'] = out['price']
+        books[b['title']] = odds
+    return books
+
+
+class FixtureStore:
+    def __init__(self, league_order, build_row, preferred_bookie='Betclic'):
+        self.league_order = {k: i for i, k in enumerate(league_order)}
+        self.build_row = build_row  # (sport_key, game) -> linha do /api/fixtures
+        self.preferred_bookie = preferred_bookie
+        self.games = {}       # fixture_id -> entrada
+        self.league_ids = {}  # sport_key -> [fixture_id]
+        self.by_date = {}     # 'YYYY-MM-DD' -> {sport_key: [linhas]}
+        self.days = {}        # 'YYYY-MM-DD' -> [linhas] ordenadas por hora
+        self.versions = {}    # sport_key -> ts do payload indexado
+        self.lock = threading.Lock()
+
+    def _entry(self, sport_key, game):
+        books = parse_bookmakers(game)
+        chosen = next((o for t, o in books.items() if self.preferred_bookie in t), None)
+        if chosen is None: chosen = next(iter(books.values()), {'h': 0, 'd': 0, 'a': 0})
+        best = {k: max((o[k] for o in books.values()), default=0) for k in ('h', 'd', 'a')}
+        return {
+            'sport_key': sport_key,
+            'game': game,
+            'date': game['commence_time'].split('T')[0],
+            'row': self.build_row(sport_key, game),
+            'bookmakers': books,
+            'best': best,
+            'odds': {
+                'odd_h': chosen['h'], 'odd_d': chosen['d'], 'odd_a': chosen['a'],
+                'odd_1x': 0, 'odd_12': 0, 'odd_x2': 0
+            },
+        }
+
+    def update_league(self, sport_key, games, version=None):
+        entries = []
+        for game in games:
+            try: entries.append(self._entry(sport_key, game))
+            except (KeyError, IndexError, TypeError) as e:
+                print(f"⚠️ Jogo ignorado em {sport_key}: {e}")
+
+        with self.lock:
+            touched = set()
+            for fid in self.league_ids.get(sport_key, []):
+                old = self.games.pop(fid, None)
+                if old is not None:
+                    touched.add(old['date'])
+                    self.by_date.get(old['date'], {}).pop(sport_key, None)
+
+            ids = []
+            for e in entries:
+                fid = e['game']['id']
+                self.games[fid] = e
+                ids.append(fid)
+                touched.add(e['date'])
+                self.by_date.setdefault(e['date'], {}).setdefault(sport_key, []).append(e['row'])
+            self.league_ids[sport_key] = ids
+            self.versions[sport_key] = version
+
+            for day in touched:
+                leagues = self.by_date.get(day, {})
+                rows = [r for k in sorted(leagues, key=lambda k: self.league_order.get(k, len(self.league_order))) for r in leagues[k]]
+                if rows:
+                    self.days[day] = sorted(rows, key=lambda x: x['match_time'])
+                else:
+                    self.days.pop(day, None); self.by_date.pop(day, None)
+
+    def fixtures_on(self, date):
+        return self.days.get(date, [])
+
+    def get(self, fixture_id):
+        return self.games.get(fixture_id)
@@ -1,15 +1,30 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory
 from flask_cors import CORS
 import joblib
 import os
-import requests
 import pandas as pd
 import numpy as np
-from scipy.stats import poisson
 import traceback
 import time
+import sys
+import threading
 from datetime import datetime
 
+# Módulos locais (web/api) — também usados pelo notebook
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from elo_engine import EloEngine
+from feature_index import TeamFeatureIndex
+from odds_client import OddsClient, ODDS_API_BASE
+from fixture_store import FixtureStore
+from cache_backend import TieredCache, SQLiteCache, DEFAULT_DB
+from model_bundle import ModelBundle
+from score_grid import score_grid, derive_markets, match_markets
+from team_names import TeamResolver
+from value_bets import expected_value, value_status
+from prewarm import Prewarmer
+from prediction_memo import PredictionMemo
+from metrics import timer, observe, add_collector, render as render_metrics
+
 # --- CONFIGURAÇÃO (RENDER) ---
 app = Flask(__name__, static_folder='../public', static_url_path='')
 CORS(app)
@@ -78,128 +93,208 @@ MODEL_DIV_MAP = {
 }
 
 # --- CACHE ---
-api_cache = {} 
+# Partilhada entre os workers do gunicorn (SQLite local) com uma LRU em memória à frente.
+# CACHE_BACKEND=memory volta ao comportamento antigo (só memória do processo).
 CACHE_DURATION = 21600 # 6 Horas
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")
+try:
+    shared_cache = SQLiteCache(os.getenv("CACHE_DB", DEFAULT_DB)) if CACHE_BACKEND == "sqlite" else None
+except Exception as e:
+    print(f"⚠️ Cache partilhada indisponível ({e}): a usar só memória.")
+    shared_cache = None
+api_cache = TieredCache(CACHE_DURATION, shared=shared_cache)
+
+# --- ODDS API: pedidos em paralelo, sessão partilhada e stale-while-revalidate ---
+odds_client = OddsClient(
+    API_KEY, api_cache, CACHE_DURATION,
+    base_url=os.getenv("ODDS_API_BASE", ODDS_API_BASE),
+    max_workers=int(os.getenv("ODDS_MAX_WORKERS", 6)),
+    timeout=(3.05, float(os.getenv("ODDS_TIMEOUT", 10))),
+    stale_while_revalidate=os.getenv("ODDS_STALE_WHILE_REVALIDATE", "1") == "1",
+    on_update=lambda sport_key, data, ts: index_league(sport_key, data, ts),
+)
+
+def index_league(sport_key, data, ts):
+    with timer('fixtures.parse', league=sport_key):
+        fixture_store.update_league(sport_key, data, ts)
 
 # --- CARREGAMENTO ---
+# Preferência: bundle versionado (football_brain/, escrito pelo notebook). Abrir o bundle só
+# lê o manifest; os modelos e o índice de features são carregados no primeiro pedido.
+# Sem bundle, usa o football_brain.pkl antigo (tudo carregado já). Se o manifest do bundle (ou o
+# .pkl) mudar no disco, o modelo é recarregado no pedido seguinte, tal como o elo_state.npz.
+# MODEL_RUNTIME: 'numpy' (árvores em arrays, sem importar o xgboost; tree_predictor.py) ou 'xgboost'.
+bundle_path = os.getenv("MODEL_BUNDLE", os.path.join(os.path.dirname(__file__), 'football_brain'))
+model_runtime = os.getenv("MODEL_RUNTIME", "numpy")
 model_path = os.path.join(os.path.dirname(__file__), 'football_brain.pkl')
-model_multi = None
-xgb_goals_h = None
-df_ready = pd.DataFrame()
+elo_path = os.path.join(os.path.dirname(__file__), 'elo_state.npz')
+models = None
+models_source = None
+model_lock = threading.Lock()
+feature_index = None
+feature_lock = threading.Lock()
+elo_engine = EloEngine()
+elo_mtime = None
+
+def model_source():
+    # Ficheiro do modelo em uso no disco (manifest do bundle ou .pkl): muda a cada exportação
+    for path in (os.path.join(bundle_path, 'manifest.json'), model_path):
+        try:
+            st = os.stat(path)
+            return (path, st.st_mtime_ns, st.st_size)
+        except OSError:
+            continue
+    return None
+
+def load_models():
+    global models, models_source, feature_index, elo_engine, elo_mtime
+    models_source = model_source()
+    loaded = None
+    if os.path.isdir(bundle_path):
+        try:
+            loaded = ModelBundle(bundle_path, runtime=model_runtime)
+            print(f"✅ BUNDLE DO MODELO: versão {loaded.version} ({len(loaded.history)} linhas de histórico, "
+                  f"runtime {model_runtime}, carregamento lazy)")
+        except Exception as e:
+            print(f"❌ ERRO AO ABRIR O BUNDLE: {e}")
 
-if os.path.exists(model_path):
+    if loaded is None and os.path.exists(model_path):
+        try:
+            loaded = ModelBundle.from_artifacts(joblib.load(model_path), version=f"pkl-{os.stat(model_path).st_mtime_ns}",
+                                                runtime=model_runtime)
+            print(f"✅ MODELOS CARREGADOS! (football_brain.pkl)")
+        except Exception as e:
+            print(f"❌ ERRO CRÍTICO MODELO: {e}")
+
+    if loaded is not None:
+        # Modelo novo: índice de features e Elo refeitos (o elo_state.npz volta a ser lido)
+        models, feature_index, elo_engine, elo_mtime = loaded, None, loaded.elo_engine(), None
+    return models
+
+def get_models():
+    if model_source() != models_source:
+        with model_lock:
+            if model_source() != models_source: load_models()
+    return models
+
+load_models()
+
+# --- HELPER: Índice de features (construído no primeiro pedido) ---
+def get_feature_index():
+    global feature_index
+    if feature_index is None:
+        with feature_lock:
+            if feature_index is None:
+                feature_index = TeamFeatureIndex(models.history_frame(), models.features, models.divisions)
+                team_resolver.set_known(feature_index.teams)
+                print(f"✅ ÍNDICE DE FEATURES: {len(feature_index.teams)} equipas")
+    return feature_index
+
+# --- HELPER: Elo (recarrega o elo_state.npz se o ficheiro mudar, sem novo .pkl) ---
+def get_elo_engine():
+    global elo_engine, elo_mtime
     try:
-        artifacts = joblib.load(model_path)
-        model_multi = artifacts.get('model_multi')
-        model_shield = artifacts.get('model_shield')
-        xgb_goals_h = artifacts.get('xgb_goals_h') or artifacts.get('model_goals_h')
-        xgb_goals_a = artifacts.get('xgb_goals_a') or artifacts.get('model_goals_a')
-        le_div = artifacts.get('le_div')
-        features = artifacts.get('features')
-        current_elos = artifacts.get('current_elos', {})
-        df_ready = artifacts.get('df_ready', pd.DataFrame())
-        print("✅ MODELOS CARREGADOS!")
+        mtime = os.path.getmtime(elo_path)
+        if mtime != elo_mtime:
+            elo_engine = EloEngine.load(elo_path)
+            elo_mtime = mtime
+            print(f"✅ ELO RECARREGADO ({len(elo_engine)} equipas, até {elo_engine.watermark})")
+    except OSError:
+        pass
     except Exception as e:
-        print(f"❌ ERRO CRÍTICO MODELO: {e}")
+        print(f"❌ Erro ao carregar Elo: {e}")
+    return elo_engine
+
+get_elo_engine()
+
+def model_version():
+    # Muda com um bundle/.pkl novo ou um elo_state.npz novo (recarregados aqui se mudaram)
+    get_models()
+    get_elo_engine()
+    return f"{models.version if models is not None else None}-{elo_mtime}"
 
 # --- HELPER: Normalizar Nomes ---
+# Mapa único de aliases (team_names.py, o mesmo do notebook). Com o índice de features carregado,
+# um nome pedido só é resolvido por alias ou chave exata; os que ficam sem correspondência (contagem
+# limitada) aparecem em /api/teams/unresolved, com uma sugestão para acrescentar aos aliases.
+team_resolver = TeamResolver()
+
 def normalize_name(name):
-    # Mapa expandido para cobrir mais equipas das novas ligas
-    name_map = {
-        'Sporting Lisbon': 'Sporting CP', 'Sporting': 'Sporting CP',
-        'Benfica': 'Benfica', 'FC Porto': 'Porto',
-        'Manchester United': 'Man United', 'Manchester City': 'Man City',
-        'Paris Saint Germain': 'Paris SG', 'PSG': 'Paris SG',
-        'Bayern Munich': 'Bayern Munich', 'Leverkusen': 'Bayer Leverkusen',
-        'Inter Milan': 'Inter', 'AC Milan': 'Milan',
-        'Atletico Madrid': 'Ath Madrid', 'Real Madrid': 'Real Madrid',
-        'Sheffield Utd': 'Sheffield United', 'Leeds United': 'Leeds',
-        'Leicester City': 'Leicester', 'Norwich City': 'Norwich',
-        'PSV Eindhoven': 'PSV', 'Feyenoord Rotterdam': 'Feyenoord',
-        'AZ Alkmaar': 'AZ Alkmaar',
-        'Club Brugge': 'Club Brugge', 'Anderlecht': 'Anderlecht',
-        'Galatasaray': 'Galatasaray', 'Fenerbahce': 'Fenerbahce',
-        'Olympiacos': 'Olympiakos', 'Panathinaikos': 'Panathinaikos',
-        'Celtic': 'Celtic', 'Rangers': 'Rangers'
-    }
-    return name_map.get(name, name)
+    return team_resolver.resolve(name)
+
+def resolve_teams(*names):
+    if models is not None: get_feature_index()  # define as equipas conhecidas
+    return [normalize_name(n) for n in names]
 
 # --- ROTAS ---
 
+# --- MÉTRICAS (metrics.py): tempo de cada pedido por rota; etapas medidas nos helpers ---
+@app.before_request
+def start_timer():
+    g.t0 = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    if 't0' in g:
+        route = request.url_rule.rule if request.url_rule is not None else 'desconhecida'
+        observe('http.request', time.perf_counter() - g.t0, route=route, method=request.method, status=response.status_code)
+    return response
+
 @app.route('/')
 def serve_index():
     return send_from_directory(app.static_folder, 'index.html')
 
+# --- ÍNDICE DE JOGOS: linhas do /api/fixtures e odds já tratadas, por id e por data ---
+def build_fixture_row(sport_key, game):
+    return {
+        'id': game['id'], 
+        'home_team': normalize_name(game['home_team']),
+        'away_team': normalize_name(game['away_team']),
+        'division': MODEL_DIV_MAP.get(sport_key, 'E0'), # Default E0 se falhar
+        'league_name': game['sport_title'],
+        'country': 'World',
+        'match_time': game['commence_time'].split('T')[1][:5],
+        'homeTeam': normalize_name(game['home_team']),
+        'awayTeam': normalize_name(game['away_team']),
+        'status_short': 'NS' 
+    }
+
+fixture_store = FixtureStore(SUPPORTED_LEAGUES, build_fixture_row)
+
+def fixture_entry(fid):
+    # Jogo indexado; se não estiver, pode ser de uma liga que outro worker renovou na cache
+    # partilhada: anunciar as ligas (só as chaves das ligas, sem ir à API) e tentar de novo
+    entry = fixture_store.get(fid)
+    if entry is None and fid:
+        odds_client.announce(SUPPORTED_LEAGUES)
+        entry = fixture_store.get(fid)
+    return entry
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    return jsonify({'cache': api_cache.snapshot_stats(), 'odds_api': odds_client.snapshot_stats(),
+                    'predictions': prediction_cache.snapshot_stats(), 'prewarm': prewarmer.snapshot_stats(),
+                    'memo': prediction_memo.snapshot_stats(), 'pid': os.getpid()})
+
+@app.route('/api/teams/unresolved')
+def teams_unresolved():
+    # Nomes pedidos que não existem no histórico (contagem) e a grafia conhecida mais parecida
+    # (só sugestão: um pedido nunca é resolvido por aproximação)
+    return jsonify(team_resolver.report(top=int(request.args.get('top', 50))))
+
 @app.route('/api/fixtures', methods=['POST'])
 def get_fixtures():
     try:
         data = request.get_json()
         target_date_str = data.get('date')
         
-        all_matches = []
-        current_time = time.time()
-
-        for sport_key in SUPPORTED_LEAGUES:
-            # 1. Cache
-            league_data = []
-            if sport_key in api_cache and (current_time - api_cache[sport_key]['ts'] < CACHE_DURATION):
-                league_data = api_cache[sport_key]['data']
-            else:
-                # 2. API
-                print(f"📡 API CALL: Atualizando {sport_key}...")
-                url = f"https://api.the-odds-api.com/v4/sports/{sport_key}/odds"
-                params = {
-                    'apiKey': API_KEY,
-                    'regions': 'eu',
-                    'markets': 'h2h',
-                    'oddsFormat': 'decimal'
-                }
-                
-                res = requests.get(url, params=params)
-                
-                # --- MONITORIZAÇÃO DE QUOTA (NOVO) ---
-                if 'x-requests-remaining' in res.headers:
-                    restantes = res.headers['x-requests-remaining']
-                    usados = res.headers['x-requests-used']
-                    print(f"   📊 API STATUS: Usaste {usados}. Restam {restantes}.")
-                # -------------------------------------
-
-                if res.status_code == 200:
-                    league_data = res.json()
-                    api_cache[sport_key] = {'data': league_data, 'ts': current_time}
-                else:
-                    print(f"❌ Erro API {sport_key}: {res.status_code}")
-
-            # 3. Processar
-            for game in league_data:
-                game_date = game['commence_time'].split('T')[0]
-                
-                if game_date == target_date_str:
-                    odds_h, odds_d, odds_a = 0, 0, 0
-                    bookmakers = game.get('bookmakers', [])
-                    if bookmakers:
-                        markets = bookmakers[0].get('markets', [])
-                        if markets:
-                            outcomes = markets[0].get('outcomes', [])
-                            for out in outcomes:
-                                if out['name'] == game['home_team']: odds_h = out['price']
-                                elif out['name'] == game['away_team']: odds_a = out['price']
-                                elif out['name'] == 'Draw': odds_d = out['price']
-
-                    all_matches.append({
-                        'id': game['id'], 
-                        'home_team': normalize_name(game['home_team']),
-                        'away_team': normalize_name(game['away_team']),
-                        'division': MODEL_DIV_MAP.get(sport_key, 'E0'), # Default E0 se falhar
-                        'league_name': game['sport_title'],
-                        'country': 'World',
-                        'match_time': game['commence_time'].split('T')[1][:5],
-                        'homeTeam': normalize_name(game['home_team']),
-                        'awayTeam': normalize_name(game['away_team']),
-                        'status_short': 'NS' 
-                    })
-
-        all_matches.sort(key=lambda x: x['match_time'])
+        # 1. Cache / API (ligas em falta pedidas em paralelo)
+        with timer('fixtures.cache'):
+            odds_client.get_leagues(SUPPORTED_LEAGUES)
+
+        # 2. Linhas já construídas e ordenadas para esta data (o get_leagues já indexou as ligas novas)
+        all_matches = fixture_store.fixtures_on(target_date_str)
+
         print(f"✅ Jogos encontrados para {target_date_str}: {len(all_matches)}")
         return jsonify(all_matches)
 
@@ -213,162 +308,291 @@ def get_odds():
         data = request.get_json()
         fid = data.get('fixture_id')
         
-        found_game = None
-        for sport_key in api_cache:
-            for game in api_cache[sport_key]['data']:
-                if game['id'] == fid:
-                    found_game = game
-                    break
-            if found_game: break
-            
-        if not found_game:
+        entry = fixture_entry(fid)
+        if not entry:
             return jsonify({"error": "Odds não encontradas (Tente recarregar)"})
 
-        odds = {'h': 0, 'd': 0, 'a': 0}
-        bookmakers = found_game.get('bookmakers', [])
-        
-        if bookmakers:
-            target_bookie = next((b for b in bookmakers if 'Betclic' in b['title']), None)
-            if not target_bookie: target_bookie = bookmakers[0]
-            
-            markets = target_bookie.get('markets', [])
-            for m in markets:
-                if m['key'] == 'h2h':
-                    for out in m['outcomes']:
-                        if out['name'] == found_game['home_team']: odds['h'] = out['price']
-                        elif out['name'] == found_game['away_team']: odds['a'] = out['price']
-                        elif out['name'] == 'Draw': odds['d'] = out['price']
-
-        return jsonify({
-            'odd_h': odds['h'], 'odd_d': odds['d'], 'odd_a': odds['a'],
-            'odd_1x': 0, 'odd_12': 0, 'odd_x2': 0 
-        })
+        return jsonify(entry['odds'])
 
     except Exception as e:
         print(f"Erro Odds: {e}")
         return jsonify({"error": "Erro servidor"})
 
+# --- PREVISÃO: helpers partilhados por /api/predict e /api/predict/batch ---
+MATRIX_GOALS = 5  # o site mostra a matriz 0-5 golos
+
+def parse_odds(data):
+    # Levanta ValueError/TypeError se as odds não forem números
+    return {
+        'h': float(data.get('odd_h', 0) or 0),
+        'd': float(data.get('odd_d', 0) or 0),
+        'a': float(data.get('odd_a', 0) or 0),
+        '1x': float(data.get('odd_1x')) if data.get('odd_1x') else None,
+        '12': float(data.get('odd_12')) if data.get('odd_12') else None,
+        'x2': float(data.get('odd_x2')) if data.get('odd_x2') else None,
+    }
+
+def parse_match_date(value):
+    # Data do jogo no pedido ('YYYY-MM-DD' ou ISO); sem data (ou inválida) = último jogo de cada equipa
+    if not value: return None
+    date = pd.to_datetime(value, errors='coerce')
+    if pd.isna(date): return None
+    return date.tz_convert(None) if date.tzinfo is not None else date
+
+def build_features(home, away, div, odds, date=None):
+    input_data = {}
+    index = get_feature_index()
+
+    # Elo atual só para jogos depois do último resultado aplicado; numa data passada, o build_row
+    # põe o Elo de cada equipa antes dessa data (do histórico)
+    elos = get_elo_engine()
+    if date is None or not index.has_elo or (elos.watermark is not None and date > elos.watermark):
+        h_elo = elos.get(home, 1500)
+        a_elo = elos.get(away, 1500)
+        input_data['HomeElo'] = h_elo; input_data['AwayElo'] = a_elo
+        input_data['EloDiff'] = h_elo - a_elo
+
+    if odds['h'] > 0: input_data['Imp_Home'] = 1/odds['h']
+    if odds['d'] > 0: input_data['Imp_Draw'] = 1/odds['d']
+    if odds['a'] > 0: input_data['Imp_Away'] = 1/odds['a']
+
+    # Índice pré-calculado: stats do último jogo de cada equipa antes da data (pesquisa binária
+    # por equipa, ver team_history.py) + médias até essa data, sem filtrar o histórico
+    return index.build_row(home, away, input_data, div=div, date=date)
+
+# Memo das previsões (prediction_memo.py): pedidos repetidos com o mesmo modelo não voltam aos modelos
+prediction_memo = PredictionMemo(maxsize=int(os.getenv("PREDICTION_MEMO_SIZE", 4096)),
+                                 ttl=int(os.getenv("PREDICTION_MEMO_TTL", 3600)))
+
+def predict_many(items):
+    # items: [(home, away, div, odds, date)] -> [previsão]; os que não estão no memo passam
+    # pelos modelos numa só matriz
+    if not items: return []
+    with timer('predict.memo'):
+        version = model_version()
+        keys = [PredictionMemo.key(*item) for item in items]
+        results = [prediction_memo.get(key, version) for key in keys]
+        missing = [k for k, payload in enumerate(results) if payload is None]
+    if missing:
+        with timer('predict.features'):
+            X = np.vstack([build_features(*items[k]) for k in missing])
+        exp_h, exp_a, probs, conf_shield, grids, markets = run_models(X)
+        with timer('predict.payload'):
+            for j, k in enumerate(missing):
+                home, away, _, odds, _ = items[k]
+                results[k] = build_prediction(home, away, odds, exp_h[j], exp_a[j], probs[j], conf_shield[j], grids[j], match_markets(markets, j))
+                prediction_memo.set(keys[k], results[k], version)
+    return results
+
+def run_models(X):
+    # Cada modelo corre UMA vez sobre todas as linhas de X
+    with timer('predict.model', model='model_goals_h'):
+        exp_h = models.model('model_goals_h').predict(X).astype(np.float64)
+    with timer('predict.model', model='model_goals_a'):
+        exp_a = models.model('model_goals_a').predict(X).astype(np.float64)
+    with timer('predict.model', model='model_multi'):
+        probs = models.model('model_multi').predict_proba(X)
+    with timer('predict.model', model='model_shield'):
+        try: conf_shield = models.model('model_shield').predict_proba(X)[:, 1]
+        except: conf_shield = probs[:, 2] + probs[:, 1]
+
+    # Matriz de resultados exatos (com cauda "10+") para todos os jogos + mercados derivados
+    with timer('predict.score_grid'):
+        grids = score_grid(exp_h, exp_a)
+        markets = derive_markets(grids)
+    return exp_h, exp_a, probs, conf_shield, grids, markets
+
+def build_prediction(home, away, odds, exp_h, exp_a, probs, conf_shield, grid, markets):
+    exp_h, exp_a = float(exp_h), float(exp_a)
+    prob_a, prob_d, prob_h = float(probs[0]), float(probs[1]), float(probs[2])
+    conf_shield = float(conf_shield)
+
+    best = markets['best_score']
+    best_score, best_prob = f"{best['home']} - {best['away']}", best['prob']
+    score_matrix = grid[:MATRIX_GOALS + 1, :MATRIX_GOALS + 1].tolist()
+    prob_btts = markets['btts']
+
+    opportunities = [] 
+    def add(name, odd, prob):
+        if not odd or odd <= 1: return
+        ev = float(expected_value(prob, odd))
+        implied_prob = 1/odd
+        status = value_status(ev)
+        opportunities.append({
+            "name": name, "odd": odd, "odd_prob": f"{implied_prob:.1%}", 
+            "prob_raw": prob, "prob_txt": f"{prob:.1%}", 
+            "fair_odd": f"{1/prob:.2f}" if prob > 0 else "99", "ev": ev, "status": status
+        })
+
+    add(f"Vitoria {home}", odds['h'], prob_h)
+    add("Empate", odds['d'], prob_d)
+    add(f"Vitoria {away}", odds['a'], prob_a)
+    
+    p1x = ((prob_h + prob_d) + conf_shield)/2
+    if odds['1x']: add(f"DC 1X ({home} ou Empate)", odds['1x'], p1x)
+    if odds['12']: add(f"DC 12 ({home} ou {away})", odds['12'], prob_h + prob_a)
+    if odds['x2']: add(f"DC X2 ({away} ou Empate)", odds['x2'], prob_a + prob_d)
+
+    sorted_by_ev = sorted(opportunities, key=lambda x: x['ev'], reverse=True)
+    rational = sorted_by_ev[0] if sorted_by_ev else None
+    safe_list = sorted(opportunities, key=lambda x: x['prob_raw'], reverse=True)
+    safe = safe_list[0] if safe_list else None
+
+    return {
+        'home': home, 'away': away,
+        'xg': {'home': f"{exp_h:.2f}", 'away': f"{exp_a:.2f}"},
+        'btts': f"{prob_btts:.1%}",
+        'score': {'placar': best_score, 'prob': f"{best_prob:.1%}"},
+        'matrix': score_matrix, 
+        'markets': markets,
+        'scanner': opportunities,
+        'rational': rational,
+        'safe': safe
+    }
+
+# --- PRÉ-AQUECIMENTO: odds renovadas antes de expirar + previsões dos próximos dias já feitas ---
+# As previsões usam o mesmo backend partilhado das ligas (chaves 'prediction:jogo:odds:versão';
+# o índice de jogos só lê as chaves das ligas) com uma LRU local própria, maior. Um pedido com
+# fixture_id e as mesmas odds é só um lookup. Por defeito só arranca com a API key configurada.
+PREWARM = os.getenv("PREWARM", "1" if API_KEY else "0") == "1"
+prediction_cache = TieredCache(CACHE_DURATION, shared=shared_cache, maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", 2048)))
+
+def score_fixtures(entries):
+    # Entradas do FixtureStore -> previsões, exatamente como o /api/predict as faria
+    items = []
+    for entry in entries:
+        home, away = resolve_teams(entry['row']['home_team'], entry['row']['away_team'])
+        items.append((home, away, entry['row']['division'], parse_odds(entry['odds']), parse_match_date(entry['date'])))
+    return predict_many(items)
+
+prewarmer = Prewarmer(
+    odds_client, fixture_store, api_cache, prediction_cache, score_fixtures, SUPPORTED_LEAGUES, CACHE_DURATION,
+    version=model_version, odds_of=lambda entry: parse_odds(entry['odds']),
+    horizon_days=int(os.getenv("PREWARM_DAYS", 3)),
+    refresh_ahead=int(os.getenv("PREWARM_REFRESH_AHEAD", 900)),
+    interval=int(os.getenv("PREWARM_INTERVAL", 300)),
+    lock_ttl=int(os.getenv("PREWARM_LOCK_TTL", 900)),
+)
+if PREWARM and models is not None:
+    prewarmer.start()
+    print(f"✅ PRÉ-AQUECIMENTO ATIVO: próximos {prewarmer.horizon_days} dias, a cada {prewarmer.interval}s")
+
+def cached_prediction(fid, home, away, odds, date=None):
+    # Previsão pré-calculada deste jogo (mesmas equipas, odds e dia) ou None
+    if not fid: return None
+    entry = fixture_store.get(fid)
+    if date is not None and (entry is None or date.strftime('%Y-%m-%d') != entry['date']): return None
+    payload = prewarmer.get(fid, odds)
+    if payload is None or (payload['home'], payload['away']) != (home, away): return None
+    return payload
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
-    global model_multi, xgb_goals_h, xgb_goals_a, df_ready
-    
     try:
-        if model_multi is None: return jsonify({"error": "Modelos offline"}), 500
+        if get_models() is None: return jsonify({"error": "Modelos offline"}), 500
         data = request.get_json()
         
-        home, away = data.get('home_team'), data.get('away_team')
+        home, away = resolve_teams(data.get('home_team'), data.get('away_team'))
         div = data.get('division', 'E0')
-        date_str = data.get('date')
-        
-        input_data = {}
-        
-        def get_latest_stats(team_name):
-            if 'Team' not in df_ready.columns: 
-                return {f: df_ready[f].mean() if f in df_ready.columns else 0 for f in features}
-            team_history = df_ready[df_ready['Team'] == team_name]
-            if team_history.empty: 
-                return {f: df_ready[f].mean() if f in df_ready.columns else 0 for f in features}
-            return team_history.iloc[-1].to_dict()
-
-        home_stats = get_latest_stats(home)
-        away_stats = get_latest_stats(away)
-
-        for f in features:
-            if f in home_stats: input_data[f] = home_stats[f]
-            else: input_data[f] = df_ready[f].mean() if not df_ready.empty and f in df_ready else 0
-
-        match_date = pd.to_datetime(date_str)
-        if not df_ready.empty:
-            h_elo = current_elos.get(home, 1500)
-            a_elo = current_elos.get(away, 1500)
-            input_data['HomeElo'] = h_elo; input_data['AwayElo'] = a_elo
-            input_data['EloDiff'] = h_elo - a_elo
+        date = parse_match_date(data.get('date'))
 
-        try:
-            odd_h = float(data.get('odd_h', 0))
-            odd_d = float(data.get('odd_d', 0))
-            odd_a = float(data.get('odd_a', 0))
-            odd_1x = float(data.get('odd_1x')) if data.get('odd_1x') else None
-            odd_12 = float(data.get('odd_12')) if data.get('odd_12') else None
-            odd_x2 = float(data.get('odd_x2')) if data.get('odd_x2') else None
+        try: odds = parse_odds(data)
         except: return jsonify({"error": "Odds inválidas"}), 400
 
-        if odd_h > 0: input_data['Imp_Home'] = 1/odd_h
-        if odd_d > 0: input_data['Imp_Draw'] = 1/odd_d
-        if odd_a > 0: input_data['Imp_Away'] = 1/odd_a
-
-        try: input_data['Div_Code'] = le_div.transform([div])[0]
-        except: input_data['Div_Code'] = 0
+        cached = cached_prediction(data.get('fixture_id'), home, away, odds, date)
+        if cached is not None: return jsonify(cached)
+        return jsonify(predict_many([(home, away, div, odds, date)])[0])
 
-        X = pd.DataFrame([input_data])[features]
-        exp_h = float(xgb_goals_h.predict(X)[0])
-        exp_a = float(xgb_goals_a.predict(X)[0])
-        probs = model_multi.predict_proba(X)[0]
-        prob_a, prob_d, prob_h = float(probs[0]), float(probs[1]), float(probs[2])
-        
-        try: conf_shield = float(model_shield.predict_proba(X)[0][1])
-        except: conf_shield = prob_h + prob_d
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
-        score_matrix = []
-        best_score, best_prob = "0-0", -1
-        
-        for h in range(6):
-            row = []
-            for a in range(6):
-                p = poisson.pmf(h, exp_h) * poisson.pmf(a, exp_a)
-                row.append(p)
-                if p > best_prob: 
-                    best_prob = p; best_score = f"{h} - {a}"
-            score_matrix.append(row)
-
-        # --- CALCULO AMBAS MARCAM (BTTS) ---
-        prob_home_scores = 1 - poisson.pmf(0, exp_h)
-        prob_away_scores = 1 - poisson.pmf(0, exp_a)
-        prob_btts = prob_home_scores * prob_away_scores
-
-        opportunities = [] 
-        def add(name, odd, prob):
-            if not odd or odd <= 1: return
-            ev = (prob * odd) - 1
-            implied_prob = 1/odd
-            if ev > 0.05: status = "💎 MUITO VALOR!"
-            elif ev > 0: status = "✅ VALOR"
-            elif ev > -0.05: status = "😐 JUSTO"
-            else: status = "❌ FRACO"
-            opportunities.append({
-                "name": name, "odd": odd, "odd_prob": f"{implied_prob:.1%}", 
-                "prob_raw": prob, "prob_txt": f"{prob:.1%}", 
-                "fair_odd": f"{1/prob:.2f}" if prob > 0 else "99", "ev": ev, "status": status
-            })
-
-        add(f"Vitoria {home}", odd_h, prob_h)
-        add("Empate", odd_d, prob_d)
-        add(f"Vitoria {away}", odd_a, prob_a)
-        
-        p1x = ((prob_h + prob_d) + conf_shield)/2
-        if odd_1x: add(f"DC 1X ({home} ou Empate)", odd_1x, p1x)
-        if odd_12: add(f"DC 12 ({home} ou {away})", odd_12, prob_h + prob_a)
-        if odd_x2: add(f"DC X2 ({away} ou Empate)", odd_x2, prob_a + prob_d)
-
-        sorted_by_ev = sorted(opportunities, key=lambda x: x['ev'], reverse=True)
-        rational = sorted_by_ev[0] if sorted_by_ev else None
-        safe_list = sorted(opportunities, key=lambda x: x['prob_raw'], reverse=True)
-        safe = safe_list[0] if safe_list else None
-
-        return jsonify({
-            'home': home, 'away': away,
-            'xg': {'home': f"{exp_h:.2f}", 'away': f"{exp_a:.2f}"},
-            'btts': f"{prob_btts:.1%}",
-            'score': {'placar': best_score, 'prob': f"{best_prob:.1%}"},
-            'matrix': score_matrix, 
-            'scanner': opportunities,
-            'rational': rational,
-            'safe': safe
-        })
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    # Recebe uma lista de jogos (ex: a resposta do /api/fixtures) e corre cada modelo
+    # uma única vez sobre a matriz de todos os jogos. Jogos sem odds no pedido usam as
+    # odds em cache (pelo 'id'), tal como o /api/odds. Com 'date' em cada jogo, as stats são
+    # as de antes dessa data (dá para voltar a prever jogos passados). Jogos já pré-calculados
+    # (mesmo id e odds) não voltam a passar pelos modelos.
+    try:
+        if get_models() is None: return jsonify({"error": "Modelos offline"}), 500
+        data = request.get_json()
+        fixtures = data if isinstance(data, list) else (data.get('fixtures', []) if isinstance(data, dict) else None)
+        if not isinstance(fixtures, list): return jsonify({"error": "Esperada uma lista de jogos"}), 400
+        results = [None] * len(fixtures)
+        valid, items = [], []
+        for i, fx in enumerate(fixtures):
+            # Um jogo inválido só estraga a sua posição na resposta, não o batch inteiro
+            if not isinstance(fx, dict):
+                results[i] = {'id': None, 'error': "Jogo inválido"}
+                continue
+            if not isinstance(fx.get('id'), (str, int, type(None))):
+                results[i] = {'id': None, 'error': "Id inválido"}
+                continue
+            home, away = resolve_teams(fx.get('home_team') or fx.get('homeTeam'), fx.get('away_team') or fx.get('awayTeam'))
+            div = fx.get('division', 'E0')
+            odds_src = fx
+            if 'odd_h' not in fx and fx.get('id'):
+                entry = fixture_entry(fx['id'])
+                odds_src = entry['odds'] if entry else {}
+            try: odds = parse_odds(odds_src)
+            except:
+                results[i] = {'id': fx.get('id'), 'error': "Odds inválidas"}
+                continue
+            date = parse_match_date(fx.get('date'))
+            cached = cached_prediction(fx.get('id'), home, away, odds, date)
+            if cached is not None:
+                results[i] = {'id': fx.get('id'), **cached}
+                continue
+            valid.append((i, fx.get('id')))
+            items.append((home, away, div, odds, date))
+
+        for (i, fid), payload in zip(valid, predict_many(items)):
+            results[i] = {'id': fid, **payload}
+
+        return jsonify(results)
 
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+# --- MÉTRICAS: contadores que já existem (caches, Odds API, memo, pré-aquecimento), lidos no scrape ---
+def cache_metrics():
+    rows = []
+    for cache, stats in (('odds', api_cache.snapshot_stats()), ('predictions', prediction_cache.snapshot_stats())):
+        for event in ('local_hits', 'shared_hits', 'misses', 'stale', 'lock_waits', 'evictions'):
+            rows.append(('cache_events', 'counter', {'cache': cache, 'event': event}, stats.get(event)))
+        rows.append(('cache_keys', 'gauge', {'cache': cache}, stats.get('local_keys')))
+    memo = prediction_memo.snapshot_stats()
+    for event in ('hits', 'misses', 'expired', 'evictions', 'invalidations'):
+        rows.append(('cache_events', 'counter', {'cache': 'memo', 'event': event}, memo[event]))
+    rows.append(('cache_keys', 'gauge', {'cache': 'memo'}, memo['size']))
+    odds_stats = odds_client.snapshot_stats()
+    quota = odds_stats['quota_remaining']
+    rows += [('odds_api_calls', 'counter', {}, odds_stats['upstream_calls']),
+             ('odds_api_errors', 'counter', {}, odds_stats['upstream_errors']),
+             ('odds_api_quota_remaining', 'gauge', {}, float(quota) if quota not in (None, '') else None)]
+    prewarm_stats = prewarmer.snapshot_stats()
+    rows += [('prewarm_fixtures', 'counter', {'result': r}, prewarm_stats[r]) for r in ('computed', 'unchanged')]
+    rows.append(('prewarm_runs', 'counter', {}, prewarm_stats['runs']))
+    rows.append(('prewarm_pruned', 'counter', {}, prewarm_stats['pruned']))
+    return rows
+
+add_collector(cache_metrics, help={
+    'cache_events': 'Hits/misses/etc. das caches de odds, de previsões pré-calculadas e do memo.',
+    'cache_keys': 'Entradas em memória em cada cache.',
+    'odds_api_calls': 'Pedidos à The Odds API.',
+    'odds_api_errors': 'Pedidos à The Odds API que falharam.',
+    'odds_api_quota_remaining': 'Pedidos restantes na quota da The Odds API (x-requests-remaining).',
+    'prewarm_fixtures': 'Jogos calculados / sem alterações nos ciclos de pré-aquecimento.',
+    'prewarm_runs': 'Ciclos de pré-aquecimento feitos por este processo.',
+    'prewarm_pruned': 'Previsões pré-calculadas apagadas (odds/modelo antigos ou jogos expirados).',
+})
+
+@app.route('/api/metrics')
+def get_metrics():
+    # Formato de texto do Prometheus (por processo: com gunicorn, um scrape por worker)
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import bisect
+import threading
+from datetime import datetime
+
+# --- MÉTRICAS: TEMPOS POR ETAPA, HISTOGRAMAS E CONTADORES ---
+# Um registo por processo, partilhado pelo site e pelo pipeline do notebook:
+#   timer(etapa, **labels)   context manager: mede a etapa e junta o tempo ao histograma
+#                            football_stage_seconds{stage=..., ...}; timed(etapa) é o decorador
+#   Stopwatch(prefixo).lap() etapas seguidas de uma função longa sem a reindentar
+#   inc / set_gauge          contadores e gauges; collectors são lidos só no scrape (stats que
+#                            já existem noutros objetos, ex.: caches, quota da Odds API)
+#   render()                 formato de texto do Prometheus (GET /api/metrics)
+#   profile() / write_profile()  resumo por etapa de uma corrida (n, total, média, p50, p95, máx.),
+#                            gravado em JSON e comparado com a corrida anterior
+# Os histogramas só guardam contagens por bucket + soma/mín./máx.: custo fixo por medição.
+# METRICS=0 desliga tudo (os timers passam a não fazer nada).
+
+PREFIX = 'football'
+STAGE_METRIC = 'stage_seconds'
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+PROFILE_DIR = 'profiles'
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'): return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # o último é o +Inf
+        self.count, self.sum = 0, 0.0
+        self.min, self.max = None, None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min: self.min = value
+        if self.max is None or value > self.max: self.max = value
+
+    def quantile(self, q):
+        # Estimativa por interpolação dentro do bucket (como o histogram_quantile do Prometheus)
+        if not self.count: return None
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else self.max
+                value = low + (high - low) * (rank - seen) / n
+                return min(max(value, self.min), self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'total': self.sum, 'mean': self.sum / self.count if self.count else None,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'min': self.min, 'max': self.max}
+
+
+class Timer:
+    # with timer('etapa'): ...
+    __slots__ = ('registry', 'key', 't0', 'seconds')
+
+    def __init__(self, registry, key):
+        self.registry, self.key = registry, key
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.t0
+        self.registry._observe(self.key, self.seconds)
+        return False
+
+
+class Stopwatch:
+    # Etapas seguidas: cada lap(nome) mede desde o lap anterior (ou desde a criação)
+    def __init__(self, prefix, registry=None, **labels):
+        self.prefix, self.labels = prefix, labels
+        self.registry = registry or default_registry
+        self.t0 = self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        seconds, self.last = now - self.last, now
+        self.registry.observe(f"{self.prefix}.{name}", seconds, **self.labels)
+        return seconds
+
+    def total(self, name='total'):
+        self.registry.observe(f"{self.prefix}.{name}", time.perf_counter() - self.t0, **self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self, prefix=PREFIX, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.buckets = buckets
+        self.histograms = {}  # (etapa, labels) -> Histogram
+        self.counters = {}    # (nome, labels) -> valor
+        self.gauges = {}      # (nome, labels) -> valor
+        self.help = {}
+        self.collectors = []  # () -> [(nome, 'counter'|'gauge', labels, valor)]
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    # --- REGISTO ---
+    def observe(self, stage, seconds, **labels):
+        if self.enabled:
+            self._observe((stage, _labels_key(labels) if labels else ()), seconds)
+
+    def _observe(self, key, seconds):
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(self.buckets)
+            hist.observe(seconds)
+
+    def timer(self, stage, **labels):
+        if not self.enabled: return _NULL_TIMER
+        return Timer(self, (stage, _labels_key(labels) if labels else ()))
+
+    def timed(self, stage, **labels):
+        # Decorador (o estado enabled é lido em cada chamada)
+        def decorate(fn):
+            def wrapper(*args, **kwargs):
+                with self.timer(stage, **labels):
+                    return fn(*args, **kwargs)
+            wrapper.__name__, wrapper.__doc__, wrapper.__wrapped__ = fn.__name__, fn.__doc__, fn
+            return wrapper
+        return decorate
+
+    def inc(self, name, value=1, help=None, **labels):
+        if not self.enabled: return
+        key = (name, _labels_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            if help: self.help[name] = help
+
+    def set_gauge(self, name, value, help=None, **labels):
+        if not self.enabled: return
+        with self.lock:
+            self.gauges[(name, _labels_key(labels))] = value
+            if help: self.help[name] = help
+
+    def add_collector(self, fn, help=None):
+        # fn() -> [(nome, 'counter'|'gauge', {labels}, valor)]; help: {nome: texto}
+        self.collectors.append(fn)
+        self.help.update(help or {})
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear(); self.counters.clear(); self.gauges.clear()
+            self.started = time.time()
+
+    # --- EXPOSIÇÃO (PROMETHEUS) ---
+    def _collected(self):
+        with self.lock:
+            counters, gauges = dict(self.counters), dict(self.gauges)
+        for fn in self.collectors:
+            try: rows = fn()
+            except Exception as e:
+                print(f"⚠️ Collector de métricas falhou: {e}")
+                continue
+            for name, kind, labels, value in rows:
+                if value is None: continue
+                (counters if kind == 'counter' else gauges)[(name, _labels_key(labels))] = value
+        return counters, gauges
+
+    def render(self):
+        lines = []
+        with self.lock:
+            histograms = {k: (h.buckets, list(h.counts), h.sum, h.count) for k, h in self.histograms.items()}
+        counters, gauges = self._collected()
+
+        name = f"{self.prefix}_{STAGE_METRIC}"
+        lines += [f"# HELP {name} Duração de cada etapa (site e pipeline) em segundos.", f"# TYPE {name} histogram"]
+        for (stage, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            labels = (('stage', stage),) + labels
+            cumulative = 0
+            for bound, n in zip(buckets + (float('inf'),), counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(float(bound)))])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for kind, values in (('counter', counters), ('gauge', gauges)):
+            for metric in sorted({n for n, _ in values}):
+                full = f"{self.prefix}_{metric}" + ('_total' if kind == 'counter' and not metric.endswith('_total') else '')
+                if metric in self.help: lines.append(f"# HELP {full} {self.help[metric]}")
+                lines.append(f"# TYPE {full} {kind}")
+                for (n, labels), value in sorted(values.items(), key=lambda kv: kv[0]):
+                    if n == metric: lines.append(f"{full}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    # --- PERFIL DE UMA CORRIDA ---
+    def profile(self):
+        # {etapa (com labels): resumo}, pela ordem em que as etapas apareceram
+        with self.lock:
+            items = list(self.histograms.items())
+        out = {}
+        for (stage, labels), hist in items:
+            name = stage + (_format_labels(labels) if labels else '')
+            out[name] = {k: (round(v, 6) if isinstance(v, float) else v) for k, v in hist.summary().items()}
+        return out
+
+
+class _NullTimer:
+    seconds = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+default_registry = MetricsRegistry(enabled=os.getenv("METRICS", "1") == "1")
+
+observe = default_registry.observe
+timer = default_registry.timer
+timed = default_registry.timed
+inc = default_registry.inc
+set_gauge = default_registry.set_gauge
+add_collector = default_registry.add_collector
+render = default_registry.render
+
+
+def last_profile(directory=PROFILE_DIR):
+    # Perfil mais recente gravado em directory (ou None)
+    if not os.path.isdir(directory): return None
+    files = sorted(f for f in os.listdir(directory) if f.startswith('profile-') and f.endswith('.json'))
+    if not files: return None
+    with open(os.path.join(directory, files[-1]), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_profile(directory=PROFILE_DIR, meta=None, registry=None):
+    # Grava o perfil desta corrida (profile-AAAAMMDD-HHMMSS.json) e devolve o caminho
+    registry = registry or default_registry
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(directory, f"profile-{stamp}.json")
+    report = {'created': stamp, 'seconds': round(time.time() - registry.started, 3), 'meta': meta or {},
+              'stages': registry.profile()}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def print_profile(previous=None, registry=None):
+    # Tabela por etapa; com previous (um perfil gravado), a variação do tempo total de cada etapa
+    stages = (registry or default_registry).profile()
+    if not stages:
+        print("📊 Perfil: nenhuma etapa medida.")
+        return
+    before = (previous or {}).get('stages', {})
+    width = max(len(s) for s in stages)
+    print(f"📊 Perfil da corrida ({len(stages)} etapas):")
+    for stage, s in stages.items():
+        line = (f"   {stage:<{width}}  n={s['count']:<5} total {s['total']:9.3f}s  média {s['mean'] * 1000:9.2f}ms  "
+                f"p95 {s['p95'] * 1000:9.2f}ms  máx. {s['max'] * 1000:9.2f}ms")
+        old = before.get(stage)
+        if old and old.get('total'):
+            change = s['total'] / old['total'] - 1
+            line += f"  ({change:+.0%} vs anterior{' ⚠️' if change > 0.2 else ''})"
+        print(line)
@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import threading
+import pandas as pd
+from elo_engine import EloEngine
+from compact_frame import CompactFrame
+from tree_predictor import TreeEnsemble, TreeModel, save_trees
+
+# --- BUNDLE DO MODELO (em vez de um único football_brain.pkl) ---
+# Diretório versionado, escrito pelo notebook:
+#   manifest.json       formato, versão (hash do conteúdo), features, divisões, modelos e colunas
+#   models/<nome>.ubj   cada XGBoost no formato nativo do booster (sem pickle)
+#   models/<nome>.npz   as mesmas árvores em arrays planos, para o previsor NumPy (tree_predictor.py)
+#   history/            histórico compacto (compact_frame.py): chaves em códigos + matrizes float32,
+#                       abertos com mmap (só as páginas lidas vão para a RAM)
+#   elo_state.npz       estado do EloEngine
+# Abrir o bundle só lê o manifest: os modelos ficam para o primeiro uso. Com runtime='numpy'
+# (o do site) os modelos são os arrays .npz e o xgboost nunca é importado; runtime='xgboost'
+# carrega os .ubj.
+
+BUNDLE_FORMAT = 1
+MODEL_NAMES = ['model_multi', 'model_sniper', 'model_shield', 'model_goals_h', 'model_goals_a']
+# Colunas do histórico que a inferência lê (além das features do modelo): chaves, golos (resultado
+# para o Elo numa data), posição, valor de mercado, Elo pré-jogo e as médias móveis (Avg_)
+HISTORY_COLUMNS = ['Date', 'HomeTeam', 'AwayTeam', 'Div', 'FTHG', 'FTAG', 'Home_Pos', 'Away_Pos',
+                   'Home_Value', 'Away_Value', 'HomeElo', 'AwayElo']
+
+
+def history_columns(columns):
+    # HISTORY_COLUMNS que existem + as médias móveis, pela ordem do histórico
+    return [c for c in HISTORY_COLUMNS if c in columns] + [c for c in columns if 'Avg_' in c]
+
+
+def _model_kind(model):
+    return 'classifier' if hasattr(model, 'predict_proba') else 'regressor'
+
+
+def _content_hash(path):
+    # Hash de todos os ficheiros do bundle (exceto o manifest), por ordem de caminho
+    digest = hashlib.sha256()
+    for root, _, files in sorted(os.walk(path)):
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            if full == os.path.join(path, 'manifest.json'): continue
+            digest.update(os.path.relpath(full, path).replace(os.sep, '/').encode())
+            with open(full, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def export_bundle(path, models, features, le_div, history, elo_engine=None):
+    # models: {nome: XGBClassifier/XGBRegressor}. Escreve num diretório temporário e troca no fim,
+    # para o site nunca ver um bundle a meio.
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(os.path.join(tmp, 'models'))
+
+    model_specs = {}
+    for name, model in models.items():
+        if model is None: continue
+        file = f"models/{name}.ubj"
+        model.save_model(os.path.join(tmp, file))
+        trees = f"models/{name}.npz"
+        save_trees(os.path.join(tmp, trees), model)
+        model_specs[name] = {'file': file, 'trees': trees, 'kind': _model_kind(model)}
+
+    # history: CompactFrame ou DataFrame (compactado aqui: features + history_columns, o resto fica fora)
+    if not isinstance(history, CompactFrame):
+        history = CompactFrame.from_frame(history, features, extra=history_columns(history.columns))
+    history.save(os.path.join(tmp, 'history'))
+
+    if elo_engine is not None:
+        elo_engine.save(os.path.join(tmp, 'elo_state.npz'))
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'version': _content_hash(tmp),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'features': list(features),
+        'divisions': [str(d) for d in getattr(le_div, 'classes_', le_div if le_div is not None else [])],
+        'models': model_specs,
+        'history': {'rows': len(history), 'layout': 'compact', 'path': 'history'},
+    }
+    with open(os.path.join(tmp, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    old = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path): os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest['version']
+
+
+class ModelBundle:
+    def __init__(self, path, runtime='xgboost'):
+        self.path = path
+        self.runtime = runtime
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != BUNDLE_FORMAT:
+            raise ValueError(f"Formato de bundle não suportado: {self.manifest.get('format')}")
+        self.version = self.manifest['version']
+        self.features = self.manifest['features']
+        self.divisions = self.manifest['divisions']
+        spec = self.manifest['history']
+        if spec.get('layout') != 'compact':
+            raise ValueError(f"Layout do histórico não suportado: {spec.get('layout')}")
+        self.history = CompactFrame.load(os.path.join(path, spec['path']))
+        self.models = {}
+        self.elos = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_artifacts(cls, artifacts, version=None, runtime='xgboost'):
+        # Compatibilidade com o football_brain.pkl antigo (tudo já em memória)
+        bundle = cls.__new__(cls)
+        bundle.path = None
+        bundle.runtime = runtime
+        bundle.manifest = {'models': {}}
+        bundle.version = version
+        bundle.features = artifacts.get('features')
+        le_div = artifacts.get('le_div')
+        bundle.divisions = [str(d) for d in le_div.classes_] if le_div is not None else []
+        history = artifacts.get('df_ready')
+        history = history if history is not None else artifacts.get('history_df', pd.DataFrame())
+        # Em memória fica só a versão compacta (o DataFrame do .pkl é largado)
+        bundle.history = history if isinstance(history, CompactFrame) else \
+            CompactFrame.from_frame(history, bundle.features or [], extra=history_columns(history.columns))
+        bundle.models = {name: artifacts.get(name) for name in MODEL_NAMES if artifacts.get(name) is not None}
+        for side in ('h', 'a'):
+            if artifacts.get(f'xgb_goals_{side}') is not None:
+                bundle.models[f'model_goals_{side}'] = artifacts[f'xgb_goals_{side}']
+        if runtime == 'numpy':
+            bundle.models = {name: TreeModel(TreeEnsemble.from_booster(m), _model_kind(m)) for name, m in bundle.models.items()}
+        bundle.elos = artifacts.get('current_elos') or artifacts.get('elos', {})
+        bundle.lock = threading.Lock()
+        return bundle
+
+    def __contains__(self, name):
+        return name in self.models or name in self.manifest['models']
+
+    def model(self, name):
+        model = self.models.get(name)
+        if model is not None: return model
+        spec = self.manifest['models'].get(name)
+        if spec is None: return None
+        with self.lock:
+            model = self.models.get(name)
+            if model is None and self.runtime == 'numpy' and spec.get('trees'):
+                model = TreeModel(TreeEnsemble.load(os.path.join(self.path, spec['trees'])), spec['kind'])
+                self.models[name] = model
+            elif model is None:
+                import xgboost as xgb
+                model = xgb.XGBClassifier() if spec['kind'] == 'classifier' else xgb.XGBRegressor()
+                model.load_model(os.path.join(self.path, spec['file']))
+                self.models[name] = model
+        return model
+
+    def history_frame(self, columns=None):
+        return self.history.to_frame(columns)
+
+    def elo_engine(self):
+        if self.elos is not None:
+            return EloEngine.from_dict(self.elos)
+        path = os.path.join(self.path, 'elo_state.npz')
+        return EloEngine.load(path) if os.path.exists(path) else EloEngine()
+
+
+def convert_pickle(pkl_path, path):
+    # football_brain.pkl -> bundle (para não ter de voltar a treinar)
+    import joblib
+    artifacts = joblib.load(pkl_path)
+    old = ModelBundle.from_artifacts(artifacts)
+    engine = old.elo_engine()
+    return export_bundle(path, old.models, old.features, old.divisions, old.history, engine)
+
+
+if __name__ == '__main__':
+    # python model_bundle.py football_brain.pkl football_brain
+    src, dst = sys.argv[1], sys.argv[2]
+    print(f"✅ Bundle '{dst}' criado (versão {convert_pickle(src, dst)}).")
@@ -0,0 +1,187 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import timer
+
+# --- CLIENTE DA THE ODDS API ---
+# Uma sessão HTTP partilhada (keep-alive) com pool de ligações, timeouts em todos os
+# pedidos e um pool limitado de threads para ir buscar as ligas em paralelo.
+# Com stale_while_revalidate=True, uma liga expirada é servida logo a partir da cache
+# enquanto a atualização corre em segundo plano. Cada liga só tem um pedido em voo
+# de cada vez, mesmo com vários pedidos do site ao mesmo tempo. Se a cache tiver locks
+# (TieredCache com backend partilhado), só um worker do gunicorn vai à API por liga.
+# on_update é chamado uma vez por payload novo de cada liga, seja o que este processo foi
+# buscar, seja o que outro worker gravou na cache partilhada (lido ao servir a liga): é a
+# única via por onde o índice de jogos (FixtureStore) é atualizado.
+
+ODDS_API_BASE = "https://api.the-odds-api.com/v4"
+
+
+class OddsClient:
+    def __init__(self, api_key, cache, ttl, base_url=ODDS_API_BASE, max_workers=6,
+                 timeout=(3.05, 10), stale_while_revalidate=True, retry_after=60, on_update=None):
+        self.api_key = api_key
+        self.cache = cache  # {sport_key: {'data': [...], 'ts': epoch}}
+        self.ttl = ttl
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.stale_while_revalidate = stale_while_revalidate
+        self.retry_after = retry_after
+        self.failures = {}  # sport_key -> epoch da última falha (ligas sem cache)
+        self.on_update = on_update  # callback(sport_key, data, ts) após cada payload novo
+        self.announced = {}  # sport_key -> ts do último payload passado ao on_update
+        self.stats = {'upstream_calls': 0, 'upstream_errors': 0, 'quota_remaining': None}
+        self.stats_lock = threading.Lock()  # os pedidos correm nas threads do pool
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='odds')
+        self.inflight = {}
+        self.lock = threading.RLock()
+
+    def fetch(self, sport_key, max_age=None):
+        # Atualiza uma liga. Devolve os dados ou None. max_age: idade (s) a partir da qual a
+        # entrada já conta como velha (por defeito o ttl; o pré-aquecimento usa menos)
+        if getattr(self.cache, 'acquire', None) is None:
+            return self.request(sport_key)
+
+        # Leituras internas com peek: só a leitura do pedido (get_leagues) conta como hit/miss
+        previous = self.cache.peek(sport_key)
+        if not self.cache.acquire(sport_key):
+            # Outro worker está a atualizar esta liga: usar o resultado dele
+            wait_timeout = sum(self.timeout) if isinstance(self.timeout, tuple) else self.timeout
+            entry = self.cache.wait_for(sport_key, newer_than=previous['ts'] if previous else None, timeout=wait_timeout + 2)
+            return self._adopt(sport_key, entry)
+        try:
+            entry = self.cache.peek(sport_key)
+            if entry is not None and time.time() - entry['ts'] < (self.ttl if max_age is None else max_age):
+                return self._adopt(sport_key, entry)  # atualizada entretanto
+            return self.request(sport_key)
+        finally:
+            self.cache.release(sport_key)
+
+    def _adopt(self, sport_key, entry):
+        if entry is None: return None
+        self._announce(sport_key, entry)
+        return entry['data']
+
+    def _announce(self, sport_key, entry):
+        # on_update só para payloads que ainda não foram anunciados
+        with self.lock:
+            if self.announced.get(sport_key) == entry['ts']: return
+            self.announced[sport_key] = entry['ts']
+        if self.on_update is not None:
+            self.on_update(sport_key, entry['data'], entry['ts'])
+
+    def announce(self, sport_keys):
+        # Anuncia as ligas que outro worker atualizou na cache partilhada (sem ir à API)
+        peek = getattr(self.cache, 'peek', self.cache.get)  # não conta como hit/miss da cache
+        for key in sport_keys:
+            entry = peek(key)
+            if entry is not None:
+                self._announce(key, entry)
+
+    def _count(self, name, value=1):
+        with self.stats_lock:
+            self.stats[name] += value
+
+    def snapshot_stats(self):
+        with self.stats_lock:
+            return dict(self.stats)
+
+    def request(self, sport_key):
+        # Pedido HTTP de uma liga; grava na cache se correr bem. Devolve os dados ou None.
+        self._count('upstream_calls')
+        print(f"📡 API CALL: Atualizando {sport_key}...")
+        url = f"{self.base_url}/sports/{sport_key}/odds"
+        params = {
+            'apiKey': self.api_key,
+            'regions': 'eu',
+            'markets': 'h2h',
+            'oddsFormat': 'decimal'
+        }
+        try:
+            with timer('odds.upstream', league=sport_key):
+                res = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"❌ Erro API {sport_key}: {e.__class__.__name__}")
+            return self._failed(sport_key)
+
+        # --- MONITORIZAÇÃO DE QUOTA ---
+        if 'x-requests-remaining' in res.headers:
+            restantes = res.headers['x-requests-remaining']
+            usados = res.headers.get('x-requests-used')
+            with self.stats_lock:
+                self.stats['quota_remaining'] = restantes
+            print(f"   📊 API STATUS: Usaste {usados}. Restam {restantes}.")
+
+        if res.status_code != 200:
+            print(f"❌ Erro API {sport_key}: {res.status_code}")
+            return self._failed(sport_key)
+        try:
+            with timer('odds.decode', league=sport_key):
+                data = res.json()
+        except ValueError:
+            print(f"❌ Erro API {sport_key}: resposta inválida")
+            return self._failed(sport_key)
+        entry = {'data': data, 'ts': time.time()}
+        self.cache[sport_key] = entry
+        self.failures.pop(sport_key, None)
+        self._announce(sport_key, entry)
+        return data
+
+    def _failed(self, sport_key):
+        self._count('upstream_errors')
+        self.failures[sport_key] = time.time()
+        return None
+
+    def submit(self, sport_key, max_age=None):
+        # Agenda a atualização (ou devolve a que já está em curso para esta liga)
+        with self.lock:
+            future = self.inflight.get(sport_key)
+            if future is None:
+                future = self.pool.submit(self.fetch, sport_key, max_age)
+                self.inflight[sport_key] = future
+                future.add_done_callback(lambda _f, k=sport_key: self._done(k))
+            return future
+
+    def _done(self, sport_key):
+        with self.lock:
+            self.inflight.pop(sport_key, None)
+
+    def get_leagues(self, sport_keys, wait_timeout=30):
+        # {sport_key: jogos}. Ligas frescas vêm da cache; expiradas são servidas já
+        # (stale-while-revalidate) ou pedidas; ligas sem cache são pedidas em paralelo.
+        # Uma liga sem cache que falhou há menos de retry_after segundos devolve vazio sem
+        # voltar à API (nem em segundo plano): numa falha da API, cada visita não gasta quota.
+        now = time.time()
+        result, pending = {}, {}
+        for key in sport_keys:
+            entry = self.cache.get(key)
+            if entry is not None and now - entry['ts'] < self.ttl:
+                self._announce(key, entry)
+                result[key] = entry['data']
+            elif entry is not None and self.stale_while_revalidate:
+                self._announce(key, entry)
+                result[key] = entry['data']
+                self.submit(key)
+            elif entry is None and now - self.failures.get(key, 0) < self.retry_after:
+                result[key] = []
+            else:
+                pending[key] = self.submit(key)
+
+        if pending:
+            wait(pending.values(), timeout=wait_timeout)
+            peek = getattr(self.cache, 'peek', self.cache.get)
+            for key, future in pending.items():
+                data = future.result() if future.done() else None
+                entry = peek(key) if data is None else None
+                if entry is not None:
+                    self._announce(key, entry)  # falhou: melhor a cache antiga que nada
+                    data = entry['data']
+                result[key] = data or []
+        return result
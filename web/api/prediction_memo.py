@@ -0,0 +1,62 @@
+import time
+import threading
+from cache_backend import LRUCache
+
+# --- MEMO DE PREVISÕES ---
+# O mesmo jogo popular é pedido vezes sem conta com as mesmas equipas, divisão e odds, e cada
+# pedido repetia features + 4 modelos + matriz de Poisson. Aqui a previsão pronta fica numa LRU
+# limitada (com TTL), com a chave = pedido normalizado (equipas já resolvidas, divisão, odds
+# arredondadas, data) + versão do modelo (bundle/.pkl + Elo). Quando a versão muda, o memo é
+# esvaziado, por isso nunca sai uma previsão de um modelo antigo. maxsize=0 desliga o memo.
+
+ODDS_KEYS = ('h', 'd', 'a', '1x', '12', 'x2')
+
+
+class PredictionMemo:
+    def __init__(self, maxsize=4096, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache = LRUCache(max(maxsize, 1))
+        self.version = None
+        self.lock = threading.Lock()  # versão e stats (pedidos e pré-aquecimento em paralelo)
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidations': 0}
+
+    @staticmethod
+    def key(home, away, div, odds, date=None):
+        # Pedido normalizado (odds pela mesma ordem, 3 casas; data ao nanossegundo, como o as-of)
+        return (home, away, div, tuple(round(odds[k], 3) if odds.get(k) else 0 for k in ODDS_KEYS),
+                None if date is None else date.value)
+
+    def check_version(self, version):
+        # Modelo novo: tudo o que está no memo é de outro modelo
+        if version == self.version: return
+        with self.lock:
+            if version != self.version:
+                if self.version is not None: self.stats['invalidations'] += 1
+                self.cache.clear()
+                self.version = version
+
+    def get(self, key, version):
+        if self.maxsize <= 0: return None
+        self.check_version(version)
+        entry = self.cache.get(key)
+        if entry is not None and time.time() - entry['ts'] >= self.ttl:
+            self.cache.delete(key)
+            entry = None
+            with self.lock: self.stats['expired'] += 1
+        with self.lock:
+            self.stats['hits' if entry is not None else 'misses'] += 1
+        return entry['data'] if entry is not None else None
+
+    def set(self, key, payload, version):
+        # Calculada com um modelo que entretanto mudou: não entra
+        if self.maxsize <= 0 or version != self.version: return
+        self.cache.set(key, {'data': payload, 'ts': time.time()})
+
+    def snapshot_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        total = stats['hits'] + stats['misses']
+        stats.update({'evictions': self.cache.evictions, 'size': len(self.cache), 'maxsize': self.maxsize,
+                      'hit_rate': round(stats['hits'] / total, 4) if total else None, 'version': self.version})
+        return stats
@@ -0,0 +1,176 @@
+import json
+import time
+import hashlib
+import threading
+import traceback
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import wait
+
+# --- PRÉ-AQUECIMENTO: ODDS E PREVISÕES EM SEGUNDO PLANO ---
+# Uma thread do site (ou um worker à parte) que, de `interval` em `interval` segundos:
+#   1. pede de novo as ligas cujas odds expiram em breve (antes do CACHE_DURATION acabar),
+#      para nenhum pedido do site ficar à espera da The Odds API;
+#   2. calcula features + modelos para todos os jogos dos próximos `horizon_days` dias, num só
+#      batch, e guarda a previsão pronta com a chave (fixture_id, impressão digital das odds,
+#      versão do modelo).
+# Um jogo só volta a ser calculado se as odds mexerem ou se o bundle/Elo mudar (a chave muda);
+# o resto é um lookup. A chave antiga desse jogo é apagada no mesmo ciclo, e as previsões de jogos
+# que saíram da janela quando expiram (ts + ttl): o store não cresce ciclo após ciclo.
+# Com a cache partilhada, só um worker do gunicorn faz cada ciclo: o lock dura lock_ttl (bem mais
+# que os 30s por defeito do SQLiteCache, um ciclo com a API lenta demora mais) e é renovado entre etapas.
+
+PREWARM_LOCK = 'prewarm'
+PREDICTION_PREFIX = 'prediction:'
+
+
+def odds_fingerprint(odds):
+    # Hash curto das odds (já normalizadas pelo parse_odds): muda só quando alguma odd mexe
+    values = {k: round(float(v), 3) if v else 0 for k, v in odds.items()}
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class Prewarmer:
+    def __init__(self, odds_client, fixtures, odds_cache, store, score, leagues, ttl, version=lambda: None,
+                 odds_of=lambda entry: entry['odds'], horizon_days=3, refresh_ahead=900, interval=300,
+                 wait_timeout=30, lock_ttl=900):
+        self.odds_client = odds_client
+        self.fixtures = fixtures          # FixtureStore (alimentado pelo on_update do odds_client)
+        self.odds_cache = odds_cache      # cache das ligas ({sport_key: {'data', 'ts'}})
+        self.store = store                # cache das previsões ({chave: {'data', 'ts'}})
+        self.score = score                # [entradas do FixtureStore] -> [previsões]
+        self.leagues = list(leagues)
+        self.ttl = ttl
+        self.version = version            # () -> versão do modelo (bundle + Elo)
+        self.odds_of = odds_of            # entrada -> odds normalizadas (as mesmas do /api/predict)
+        self.horizon_days = horizon_days
+        self.refresh_ahead = refresh_ahead  # segundos antes de expirar em que a liga é pedida de novo
+        self.interval = interval
+        self.wait_timeout = wait_timeout
+        self.lock_ttl = lock_ttl
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stats_lock = threading.Lock()  # get() corre nas threads dos pedidos
+        self.stats = {'runs': 0, 'skipped_runs': 0, 'leagues_refreshed': 0, 'computed': 0, 'unchanged': 0,
+                      'pruned': 0, 'errors': 0, 'hits': 0, 'misses': 0, 'last_run': None, 'last_seconds': None}
+
+    def _count(self, name, value=1):
+        with self.stats_lock:
+            self.stats[name] += value
+
+    def snapshot_stats(self):
+        with self.stats_lock:
+            return dict(self.stats)
+
+    def key(self, fixture_id, odds, version):
+        return f"{PREDICTION_PREFIX}{fixture_id}:{odds_fingerprint(odds)}:{version}"
+
+    def get(self, fixture_id, odds):
+        # Previsão pronta para este jogo com estas odds (None se as odds/modelo não baterem)
+        entry = self.store.get(self.key(fixture_id, odds, self.version())) if fixture_id else None
+        self._count('hits' if entry is not None else 'misses')
+        return entry['data'] if entry is not None else None
+
+    def refresh_odds(self, now=None):
+        # Pede as ligas que faltam ou que expiram nos próximos refresh_ahead segundos
+        now = now or time.time()
+        peek = getattr(self.odds_cache, 'peek', self.odds_cache.get)  # leituras internas não contam nas stats
+        due = []
+        for key in self.leagues:
+            entry = peek(key)
+            if entry is None or now - entry['ts'] >= self.ttl - self.refresh_ahead:
+                due.append(key)
+        if due:
+            max_age = self.ttl - self.refresh_ahead
+            wait([self.odds_client.submit(k, max_age=max_age) for k in due], timeout=self.wait_timeout)
+            self._count('leagues_refreshed', len(due))
+        return due
+
+    def upcoming(self, today=None):
+        # Entradas do FixtureStore dos próximos horizon_days dias (UTC, como o commence_time)
+        today = today or datetime.now(timezone.utc).date()
+        days = [(today + timedelta(days=i)).isoformat() for i in range(self.horizon_days)]
+        entries = (self.fixtures.get(row['id']) for day in days for row in self.fixtures.fixtures_on(day))
+        return [e for e in entries if e is not None]
+
+    def warm(self, today=None):
+        # Calcula só os jogos cuja chave (odds + versão) ainda não está guardada
+        self.odds_client.announce(self.leagues)  # ligas que outro worker renovou
+        version = self.version()
+        peek = getattr(self.store, 'peek', self.store.get)
+        pending, current = [], {}
+        for entry in self.upcoming(today):
+            key = current[str(entry['game']['id'])] = self.key(entry['game']['id'], self.odds_of(entry), version)
+            if peek(key) is not None:
+                self._count('unchanged')
+            else:
+                pending.append((key, entry))
+        if pending:
+            payloads = self.score([e for _, e in pending])
+            ts = time.time()
+            for (key, _), payload in zip(pending, payloads):
+                if payload is None: continue
+                self.store[key] = {'data': payload, 'ts': ts}
+                self._count('computed')
+        self.prune(current)
+        return len(pending)
+
+    def prune(self, current, now=None):
+        # current: {fixture_id: chave atual} dos jogos da janela. Apaga as outras chaves desses jogos
+        # (odds/modelo antigos) e as dos restantes jogos já expiradas
+        now = now or time.time()
+        peek = getattr(self.store, 'peek', self.store.get)
+        removed = 0
+        for key in list(self.store.keys()):
+            if not key.startswith(PREDICTION_PREFIX): continue
+            fixture_id = key[len(PREDICTION_PREFIX):].split(':', 1)[0]
+            if fixture_id in current:
+                if key == current[fixture_id]: continue
+            else:
+                entry = peek(key)
+                if entry is not None and now - entry['ts'] < self.ttl: continue
+            del self.store[key]
+            removed += 1
+        self._count('pruned', removed)
+        return removed
+
+    def run_once(self, now=None, today=None):
+        # Um ciclo (odds + previsões); outro worker com o lock = ciclo saltado
+        acquire = getattr(self.store, 'acquire', None)
+        if acquire is not None and not acquire(PREWARM_LOCK, self.lock_ttl):
+            self._count('skipped_runs')
+            return None
+        t0 = time.perf_counter()
+        try:
+            self.refresh_odds(now)
+            if acquire is not None: acquire(PREWARM_LOCK, self.lock_ttl)  # renova o lock para os modelos
+            computed = self.warm(today)
+        finally:
+            if acquire is not None: self.store.release(PREWARM_LOCK)
+        with self.stats_lock:
+            self.stats['runs'] += 1
+            self.stats['last_run'] = time.time()
+            self.stats['last_seconds'] = round(time.perf_counter() - t0, 3)
+        return computed
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            try:
+                computed = self.run_once()
+                if computed:
+                    print(f"✅ PRÉ-AQUECIMENTO: {computed} previsões calculadas ({self.stats['last_seconds']}s)")
+            except Exception:
+                self._count('errors')
+                traceback.print_exc()
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._loop, name='prewarm', daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
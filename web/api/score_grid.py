@@ -0,0 +1,102 @@
+from functools import lru_cache
+import numpy as np
+
+# --- MATRIZ DE RESULTADOS EXATOS (POISSON) E MERCADOS DERIVADOS ---
+# Usado pelo site (index.py) e pelo notebook (predict_match_advanced).
+# A partir dos vetores de golos esperados (λ casa / λ fora) de N jogos, calcula a matriz
+# N x (G+1) x (G+1) como produto externo das duas Poisson, sem loops nem scipy
+# (pmf[k] = pmf[k-1] * λ / k). Com tail=True a última linha/coluna é "G ou mais golos",
+# por isso a matriz soma 1 e os mercados saem exatos (as células abaixo de G são iguais às
+# da Poisson truncada). Da matriz saem: 1X2, over/under, BTTS, handicap asiático e
+# resultado mais provável.
+
+MAX_GOALS = 10
+OU_LINES = (0.5, 1.5, 2.5, 3.5, 4.5)
+AH_LINES = (-2.5, -2, -1.5, -1, -0.5, 0, 0.5, 1, 1.5, 2, 2.5)  # handicap aplicado à equipa da casa
+
+
+def poisson_pmf(lam, max_goals=MAX_GOALS, tail=True):
+    lam = np.asarray(lam, dtype=np.float64).reshape(-1)
+    pmf = np.empty((len(lam), max_goals + 1), dtype=np.float64)
+    pmf[:, 0] = np.exp(-lam)
+    pmf[:, 1:] = pmf[:, :1] * np.cumprod(lam[:, None] / np.arange(1, max_goals + 1), axis=1)
+    if tail:
+        pmf[:, -1] = np.maximum(1.0 - pmf[:, :-1].sum(axis=1), 0.0)
+    return pmf
+
+
+def score_grid(lam_h, lam_a, max_goals=MAX_GOALS, tail=True):
+    # grid[i, h, a] = P(casa marca h e fora marca a) no jogo i
+    pmf_h = poisson_pmf(lam_h, max_goals, tail)
+    pmf_a = poisson_pmf(lam_a, max_goals, tail)
+    return pmf_h[:, :, None] * pmf_a[:, None, :]
+
+
+@lru_cache(maxsize=8)
+def _cell_maps(size):
+    # Matrizes 0/1 célula -> diferença (casa - fora) e célula -> total de golos
+    goals = np.arange(size)
+    diff_of_cell = (goals[:, None] - goals[None, :]).ravel() + (size - 1)
+    total_of_cell = (goals[:, None] + goals[None, :]).ravel()
+    to_diff = (diff_of_cell[:, None] == np.arange(2 * size - 1)[None, :]).astype(np.float64)
+    to_total = (total_of_cell[:, None] == np.arange(2 * size - 1)[None, :]).astype(np.float64)
+    return to_diff, to_total
+
+
+def _at_most(cum, values, offset=0):
+    # P(X <= v) para cada v (colunas), a partir da distribuição acumulada
+    idx = np.floor(np.asarray(values, dtype=np.float64)).astype(np.int64) + offset
+    out = cum[:, np.clip(idx, 0, cum.shape[1] - 1)]
+    out[:, idx < 0] = 0.0
+    return out
+
+
+def derive_markets(grid, ou_lines=OU_LINES, ah_lines=AH_LINES):
+    # Devolve arrays de tamanho N (um valor por jogo)
+    n, size = grid.shape[0], grid.shape[1]
+    flat = grid.reshape(n, -1)
+    mass = flat.sum(axis=1)  # 1 com tail=True
+
+    # Distribuições acumuladas da diferença (casa - fora) e do total de golos
+    to_diff, to_total = _cell_maps(size)
+    cum_diff = np.cumsum(flat @ to_diff, axis=1)
+    cum_total = np.cumsum(flat @ to_total, axis=1)
+    offset = size - 1  # coluna da diferença 0
+
+    home_or_draw = _at_most(cum_diff, [-1, 0], offset)
+    lines = np.asarray(ou_lines, dtype=np.float64)
+    under = _at_most(cum_total, np.ceil(lines) - 1)
+    over = mass[:, None] - _at_most(cum_total, lines)
+    # Handicap asiático (linhas inteiras e .5): ganha se diferença + linha > 0, devolve se = 0
+    threshold = -np.asarray(ah_lines, dtype=np.float64)
+    ah_win = mass[:, None] - _at_most(cum_diff, threshold, offset)
+    ah_lose = _at_most(cum_diff, np.ceil(threshold) - 1, offset)
+
+    markets = {
+        'home': mass - home_or_draw[:, 1],
+        'draw': home_or_draw[:, 1] - home_or_draw[:, 0],
+        'away': home_or_draw[:, 0],
+        'btts': grid[:, 1:, 1:].sum(axis=(1, 2)),
+        'over': {line: over[:, j] for j, line in enumerate(ou_lines)},
+        'under': {line: under[:, j] for j, line in enumerate(ou_lines)},
+        'ah': {line: {'win': ah_win[:, j], 'push': mass - ah_win[:, j] - ah_lose[:, j], 'lose': ah_lose[:, j]}
+               for j, line in enumerate(ah_lines)},
+    }
+
+    best = flat.argmax(axis=1)
+    markets['best_score'] = np.stack([best // size, best % size], axis=1)
+    markets['best_prob'] = flat[np.arange(n), best]
+    return markets
+
+
+def match_markets(markets, i):
+    # Mercados do jogo i como dict de floats (para JSON / relatórios)
+    h, a = markets['best_score'][i]
+    return {
+        '1x2': {'home': float(markets['home'][i]), 'draw': float(markets['draw'][i]), 'away': float(markets['away'][i])},
+        'btts': float(markets['btts'][i]),
+        'over_under': {str(line): {'over': float(markets['over'][line][i]), 'under': float(markets['under'][line][i])}
+                       for line in markets['over']},
+        'asian_handicap': {f"{line:+g}": {k: float(v[i]) for k, v in out.items()} for line, out in markets['ah'].items()},
+        'best_score': {'home': int(h), 'away': int(a), 'prob': float(markets['best_prob'][i])},
+    }
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# --- HISTÓRICO POR EQUIPA, INDEXADO PELA DATA ---
+# Cada jogo entra duas vezes (pela equipa da casa e pela de fora). As entradas ficam ordenadas
+# por (equipa, data), por isso os jogos de uma equipa são um bloco contíguo (offsets) com as
+# datas ordenadas. "Último jogo da equipa T antes da data D" é uma pesquisa binária nesse bloco
+# e devolve a posição da linha no histórico (sem filtrar nem copiar o DataFrame). Para pedir
+# muitos (equipa, data) de uma vez, a chave de ordenação é equipa x (nº de datas + 1) + posição
+# da data, e todas as pesquisas são um único np.searchsorted.
+
+
+def _nanoseconds(dates):
+    # Datas (strings, Timestamps, datetime64...) -> int64 em ns
+    return pd.DatetimeIndex(dates).as_unit('ns').asi8
+
+
+class TeamHistory:
+    def __init__(self, home, away, dates):
+        # home / away: equipa de cada linha do histórico; dates: data de cada linha
+        dates = _nanoseconds(dates)
+        n = len(dates)
+        codes, names = pd.factorize(np.concatenate([np.asarray(home, dtype=object), np.asarray(away, dtype=object)]))
+        self.teams = {t: i for i, t in enumerate(names)}
+        rows = np.tile(np.arange(n, dtype=np.int64), 2)
+        entry_dates = np.concatenate([dates, dates])
+        order = np.lexsort((rows, entry_dates, codes))  # equipa, data, linha
+        codes = codes[order]
+        self.rows = rows[order]                     # linha do histórico de cada entrada
+        self.is_home = order < n                    # a equipa jogou em casa nessa linha
+        self.dates = entry_dates[order]
+        self.offsets = np.searchsorted(codes, np.arange(len(names) + 1))  # bloco de cada equipa
+        self.days = np.unique(entry_dates)
+        self.keys = codes * (len(self.days) + 1) + np.searchsorted(self.days, self.dates)
+
+    def __contains__(self, team):
+        return team in self.teams
+
+    def __len__(self):
+        return len(self.teams)
+
+    @property
+    def start(self):
+        # Data do primeiro jogo do histórico
+        return pd.Timestamp(self.days[0]) if len(self.days) else None
+
+    def _positions(self, teams, dates=None):
+        # (posição da última entrada antes da data ou -1, início do bloco da equipa)
+        codes = np.array([self.teams.get(t, -1) for t in teams], dtype=np.int64)
+        known = codes >= 0
+        codes = np.where(known, codes, 0)
+        if dates is None:
+            rank = np.full(len(codes), len(self.days))  # sem data: o último jogo
+        else:
+            rank = np.searchsorted(self.days, _nanoseconds(dates), side='left')  # só datas estritamente anteriores
+        pos = np.searchsorted(self.keys, codes * (len(self.days) + 1) + rank, side='left') - 1
+        start = self.offsets[codes]
+        return np.where(known & (pos >= start), pos, -1), start
+
+    def lookup(self, teams, dates=None):
+        # Para cada (equipa, data): linha do último jogo antes da data (-1 se não houver), se foi em
+        # casa, e quantos jogos a equipa tinha feito até aí
+        pos, start = self._positions(teams, dates)
+        found = pos >= 0
+        return (np.where(found, self.rows[pos], -1), found & self.is_home[pos],
+                np.where(found, pos - start + 1, 0))
+
+    def latest(self, team, date=None):
+        # (linha, em casa, nº de jogos) de uma equipa; linha = -1 se não jogou antes da data
+        rows, home, games = self.lookup([team], None if date is None else [date])
+        return int(rows[0]), bool(home[0]), int(games[0])
+
+    def recent(self, team, n=20, date=None):
+        # Linhas dos últimos n jogos da equipa antes da data (mais antigo primeiro)
+        pos, start = self._positions([team], None if date is None else [date])
+        if pos[0] < 0: return self.rows[:0]
+        return self.rows[max(start[0], pos[0] - n + 1):pos[0] + 1]
@@ -0,0 +1,278 @@
+import re
+import threading
+import unicodedata
+from collections import Counter
+from difflib import get_close_matches
+import numpy as np
+import pandas as pd
+
+# --- NOMES DE EQUIPAS (UM SÓ MAPA PARA O PIPELINE E PARA O SITE) ---
+# Nome canónico = o nome com que a equipa aparece no histórico de treino (Football-Data
+# depois desta limpeza). O notebook (data_utils) e o site (index.py) resolvem pelo mesmo
+# mapa, por isso um nome vindo da The Odds API encontra o histórico/Elo da equipa.
+# O TeamResolver aplica-o por códigos (cada nome distinto é resolvido uma vez) e, quando
+# conhece o vocabulário de destino (equipas do histórico), resolve só por alias ou pela chave
+# exata (sem acentos, pontuação nem siglas: 'FC Porto' = 'Porto'). Nunca por prefixo ou
+# parecença: 'Real Madrid Castilla', 'Inter Miami CF' ou 'FC Bayern München II' não são a
+# equipa principal. O que fica por resolver é contado e o relatório sugere a grafia mais
+# parecida (para acrescentar aos aliases à mão). Os nomes vêm também de pedidos ao site, por
+# isso a memória (cache e contagens) tem limite.
+
+TEAM_ALIASES = {
+    # --- PORTUGAL ---
+    'Sp Braga': 'Braga', 'SC Braga': 'Braga',
+    'Sp Lisbon': 'Sporting CP', 'Sporting Lisbon': 'Sporting CP', 'Sporting': 'Sporting CP',
+    'Benfica': 'Benfica', 'SL Benfica': 'Benfica',
+    'FC Porto': 'Porto', 'Porto': 'Porto',
+    'Vitoria Guimaraes': 'Vitoria SC', 'Vitoria de Guimaraes': 'Vitoria SC',
+    'Rio Ave': 'Rio Ave', 'Rio Ave FC': 'Rio Ave',
+    'Estoril': 'Estoril', 'GD Estoril Praia': 'Estoril',
+    'Arouca': 'Arouca', 'FC Arouca': 'Arouca',
+    'Famalicao': 'Famalicao', 'FC Famalicão': 'Famalicao',
+    'Boavista': 'Boavista', 'Boavista FC': 'Boavista',
+    'Gil Vicente': 'Gil Vicente', 'Gil Vicente FC': 'Gil Vicente',
+    'Estrela': 'Estrela Amadora', 'Estrela Amadora': 'Estrela Amadora',
+    'Casa Pia': 'Casa Pia', 'Casa Pia AC': 'Casa Pia',
+    'Moreirense': 'Moreirense', 'Moreirense FC': 'Moreirense',
+    'Farense': 'Farense', 'SC Farense': 'Farense',
+    'Nacional': 'Nacional', 'CD Nacional': 'Nacional',
+    'Santa Clara': 'Santa Clara', 'CD Santa Clara': 'Santa Clara',
+    'AVS': 'AVS', 'AVS FS': 'AVS',
+
+    # --- HOLANDA ---
+    'PSV Eindhoven': 'PSV', 'PSV': 'PSV',
+    'Ajax': 'Ajax', 'Ajax Amsterdam': 'Ajax',
+    'Feyenoord': 'Feyenoord', 'Feyenoord Rotterdam': 'Feyenoord',
+    'AZ Alkmaar': 'AZ Alkmaar', 'AZ': 'AZ Alkmaar',
+    'Twente': 'Twente', 'FC Twente': 'Twente',
+
+    # --- BÉLGICA ---
+    'Club Brugge': 'Club Brugge', 'Brugge': 'Club Brugge',
+    'Anderlecht': 'Anderlecht', 'RSC Anderlecht': 'Anderlecht',
+    'Gent': 'Gent', 'KAA Gent': 'Gent',
+    'Genk': 'Genk', 'KRC Genk': 'Genk',
+    'Union St Gilloise': 'Union SG', 'Royale Union Saint-Gilloise': 'Union SG',
+
+    # --- TURQUIA ---
+    'Galatasaray': 'Galatasaray',
+    'Fenerbahce': 'Fenerbahce', 'Fenerbahçe': 'Fenerbahce',
+    'Besiktas': 'Besiktas', 'Beşiktaş': 'Besiktas',
+    'Trabzonspor': 'Trabzonspor',
+    'Basaksehir': 'Basaksehir',
+
+    # --- GRÉCIA ---
+    'Olympiakos': 'Olympiacos', 'Olympiacos': 'Olympiacos',
+    'PAOK': 'PAOK', 'PAOK Salonika': 'PAOK',
+    'Panathinaikos': 'Panathinaikos',
+    'AEK': 'AEK Athens', 'AEK Athens': 'AEK Athens',
+
+    # --- ESCÓCIA ---
+    'Celtic': 'Celtic',
+    'Rangers': 'Rangers',
+
+    # --- INGLATERRA ---
+    'Manchester United': 'Man United', 'Manchester City': 'Man City',
+    'Newcastle United': 'Newcastle', 'West Ham United': 'West Ham', 
+    'Wolverhampton Wanderers': 'Wolves', 'Brighton': 'Brighton',
+    'Leicester City': 'Leicester', 'Leeds United': 'Leeds',
+    'Tottenham Hotspur': 'Tottenham', 'Nottingham Forest': "Nott'm Forest", 
+    'Sheffield United': 'Sheffield United', 'Luton': 'Luton', 
+    'Brentford': 'Brentford', 'Bournemouth': 'Bournemouth',
+    'West Brom': 'West Bromwich Albion', 'West Bromwich': 'West Bromwich Albion',
+    'QPR': 'Queens Park Rangers', 'Blackburn': 'Blackburn Rovers',
+    'Coventry': 'Coventry City', 'Stoke': 'Stoke City', 'Hull': 'Hull City',
+    
+    # --- ALEMANHA ---
+    'Bayern Munich': 'Bayern Munich', 'Bayern München': 'Bayern Munich',
+    'Borussia Dortmund': 'Borussia Dortmund', 'Dortmund': 'Borussia Dortmund',
+    'Bayer Leverkusen': 'Bayer Leverkusen', 'Leverkusen': 'Bayer Leverkusen',
+    'RB Leipzig': 'RB Leipzig', 'Leipzig': 'RB Leipzig',
+    'Borussia Monchengladbach': 'Borussia M.Gladbach', "M'gladbach": 'Borussia M.Gladbach',
+    'Eintracht Frankfurt': 'Eintracht Frankfurt', 'Frankfurt': 'Eintracht Frankfurt',
+    'Wolfsburg': 'Wolfsburg', 'VfL Wolfsburg': 'Wolfsburg',
+    'Mainz 05': 'Mainz 05', 'Mainz': 'Mainz 05',
+    'Stuttgart': 'VfB Stuttgart', 'VfB Stuttgart': 'VfB Stuttgart',
+    'Freiburg': 'Freiburg', 'SC Freiburg': 'Freiburg',
+    'Union Berlin': 'Union Berlin', 'FC Union Berlin': 'Union Berlin',
+    'Bochum': 'VfL Bochum', 'VfL Bochum': 'VfL Bochum',
+    'Koln': 'FC Koln', 'FC Köln': 'FC Koln',
+    'Hertha': 'Hertha Berlin', 'Hertha BSC': 'Hertha Berlin',
+    'Schalke 04': 'Schalke 04', 'Schalke': 'Schalke 04',
+    'Hamburg': 'Hamburger SV', 'Hamburger': 'Hamburger SV',
+    'Hannover': 'Hannover 96', 'Kaiserslautern': 'FC Kaiserslautern',
+    'Nurnberg': 'FC Nurnberg', 'Dusseldorf': 'Fortuna Dusseldorf',
+
+    # --- ESPANHA ---
+    'Ath Bilbao': 'Athletic Club', 'Athletic Bilbao': 'Athletic Club',
+    'Atl Madrid': 'Atletico Madrid', 'Atletico': 'Atletico Madrid',
+    'Barcelona': 'Barcelona', 'Real Madrid': 'Real Madrid',
+    'Betis': 'Real Betis', 'Real Betis': 'Real Betis',
+    'Celta': 'Celta Vigo', 'Celta Vigo': 'Celta Vigo',
+    'Espanol': 'Espanyol', 'Espanyol': 'Espanyol',
+    'Sociedad': 'Real Sociedad', 'Real Sociedad': 'Real Sociedad',
+    'Valencia': 'Valencia', 'Valladolid': 'Real Valladolid', 
+    'Villarreal': 'Villarreal', 'Girona': 'Girona',
+    'Alaves': 'Alaves', 'Cadiz': 'Cadiz', 'Almeria': 'Almeria',
+    'Sp Gijon': 'Sporting Gijon', 'Zaragoza': 'Real Zaragoza',
+    'Levante': 'Levante', 'Tenerife': 'Tenerife', 'Eibar': 'Eibar',
+
+    # --- FRANÇA ---
+    'Paris SG': 'Paris Saint Germain', 'PSG': 'Paris Saint Germain',
+    'Marseille': 'Marseille', 'Lyon': 'Lyon', 'Monaco': 'Monaco',
+    'Lille': 'Lille', 'Nice': 'Nice', 'Rennes': 'Rennes',
+    'Lens': 'Lens', 'Montpellier': 'Montpellier', 'Nantes': 'Nantes',
+    'Reims': 'Reims', 'Strasbourg': 'Strasbourg', 'Toulouse': 'Toulouse',
+    'Brest': 'Brest', 'Lorient': 'Lorient', 'Metz': 'Metz',
+    'St Etienne': 'Saint-Etienne', 'Saint-Etienne': 'Saint-Etienne',
+    'Bordeaux': 'Girondins Bordeaux', 'Auxerre': 'Auxerre',
+    'Ajaccio': 'AC Ajaccio', 'Troyes': 'Troyes',
+
+    # --- ITÁLIA ---
+    'Inter': 'Inter', 'Internazionale': 'Inter',
+    'Milan': 'AC Milan', 'Juventus': 'Juventus', 'Roma': 'Roma', 
+    'Lazio': 'Lazio', 'Napoli': 'Napoli', 'Atalanta': 'Atalanta', 
+    'Fiorentina': 'Fiorentina', 'Torino': 'Torino', 'Udinese': 'Udinese',
+    'Bologna': 'Bologna', 'Verona': 'Verona', 'Hellas Verona': 'Verona',
+    'Empoli': 'Empoli', 'Lecce': 'Lecce', 'Sassuolo': 'Sassuolo',
+    'Monza': 'Monza', 'Genoa': 'Genoa', 'Salernitana': 'Salernitana',
+    'Parma': 'Parma', 'Sampdoria': 'Sampdoria', 'Cremonese': 'Cremonese',
+    'Venezia': 'Venezia', 'Palermo': 'Palermo', 'Bari': 'Bari',
+
+    # --- OUTROS (CHAMPIONS LEAGUE) ---
+    'Shakhtar Donetsk': 'Shakhtar Donetsk',
+    'Salzburg': 'RB Salzburg', 'Red Bull Salzburg': 'RB Salzburg',
+
+    # --- GRAFIAS DA THE ODDS API / FOOTBALL-DATA ---
+    'Ath Madrid': 'Atletico Madrid', 'Inter Milan': 'Inter', 'AC Milan': 'AC Milan',
+    'Sheffield Utd': 'Sheffield United', 'Norwich City': 'Norwich',
+    'Brighton and Hove Albion': 'Brighton',
+}
+
+# Palavras que não distinguem clubes (FC Porto = Porto, AC Milan = Milan)
+NOISE_WORDS = {'fc', 'afc', 'cf', 'ac', 'sc', 'cd', 'ssc', 'as', 'us', 'ud', 'sd', 'rc', 'rcd', 'the', 'and'}
+
+
+def name_key(name):
+    # Chave de comparação: sem acentos, minúsculas, sem pontuação nem siglas genéricas
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode().lower()
+    return ' '.join(w for w in re.split(r"[^a-z0-9]+", text) if w and w not in NOISE_WORDS)
+
+
+def _canonical(aliases, name):
+    # Segue cadeias (A -> B -> C) até ao nome final
+    seen = {name}
+    while name in aliases and aliases[name] not in seen:
+        name = aliases[name]
+        seen.add(name)
+    return name
+
+
+class TeamResolver:
+    # known: nomes que existem no destino (ex: equipas do histórico). Sem known só aplica os aliases.
+    # max_names: nomes distintos guardados na cache e nas contagens de nomes por resolver.
+    def __init__(self, aliases=TEAM_ALIASES, known=None, cutoff=0.88, max_names=10_000):
+        self.aliases = {alias: _canonical(aliases, alias) for alias in aliases}
+        by_key = {}
+        for alias, target in list(self.aliases.items()) + [(t, t) for t in self.aliases.values()]:
+            by_key.setdefault(name_key(alias), set()).add(target)
+        # Chaves ambíguas (duas equipas diferentes) ficam de fora
+        self.by_key = {k: next(iter(v)) for k, v in by_key.items() if len(v) == 1}
+        self.cutoff = cutoff  # parecença mínima das sugestões do relatório
+        self.max_names = max_names
+        self.known = None
+        self.cache = {}
+        self.unresolved = Counter()
+        self.overflow = 0  # células de nomes por resolver que já não couberam nas contagens
+        self.lock = threading.Lock()
+        if known is not None: self.set_known(known)
+
+    def set_known(self, names):
+        with self.lock:
+            self.known = {str(n) for n in names if isinstance(n, str)}
+            # Nome canónico -> grafia conhecida (um histórico antigo pode ter 'Ath Madrid' em vez de
+            # 'Atletico Madrid'), e chaves de comparação -> grafia conhecida
+            self.by_canonical = {}
+            for n in sorted(self.known, key=lambda n: self.aliases.get(n, n) != n):
+                self.by_canonical.setdefault(self.aliases.get(n, n), n)
+            self.candidates = {}
+            for n in sorted(self.known):
+                self.candidates.setdefault(name_key(n), n)
+            for alias, target in self.aliases.items():
+                if target in self.by_canonical: self.candidates.setdefault(name_key(alias), self.by_canonical[target])
+            self.cache.clear()
+            self.unresolved.clear()
+            self.overflow = 0
+
+    def suggest(self, name):
+        # Equipa conhecida com a grafia mais parecida (só para o relatório, nunca aplicada)
+        if self.known is None: return None
+        match = get_close_matches(name_key(name), list(self.candidates), n=1, cutoff=self.cutoff)
+        return self.candidates[match[0]] if match else None
+
+    def _resolve(self, name):
+        target = self.aliases.get(name)
+        if target is None:
+            target = self.by_key.get(name_key(name), name)
+        if self.known is None or target in self.known:
+            return target, None
+        if target in self.by_canonical:
+            return self.by_canonical[target], None
+        for key in dict.fromkeys([name_key(target), name_key(name)]):
+            if key in self.candidates: return self.candidates[key], None
+        return target, 'unresolved'
+
+    def resolve(self, name, count=1):
+        if not isinstance(name, str): return name
+        hit = self.cache.get(name)
+        if hit is None:
+            hit = self._resolve(name)
+            with self.lock:
+                if len(self.cache) >= self.max_names: self.cache.clear()
+                self.cache[name] = hit
+        if hit[1] == 'unresolved':
+            with self.lock:
+                if name in self.unresolved or len(self.unresolved) < self.max_names:
+                    self.unresolved[name] += count
+                else:
+                    self.overflow += count
+        return hit[0]
+
+    def resolve_series(self, s):
+        # Cada nome distinto resolvido uma vez; o resultado volta a ser espalhado pelos códigos
+        codes, uniques = pd.factorize(s)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        targets = [self.resolve(u, int(c)) for u, c in zip(uniques, counts)]
+        categories, inverse = np.unique(np.array(targets, dtype=object), return_inverse=True)
+        new_codes = np.where(codes >= 0, inverse[codes], -1) if len(uniques) else codes
+        out = pd.Categorical.from_codes(new_codes, categories=pd.Index(categories, dtype=object))
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            return pd.Series(out, index=s.index, name=s.name)
+        return pd.Series(np.asarray(out, dtype=object), index=s.index, name=s.name)
+
+    def resolve_frame(self, df, columns=('HomeTeam', 'AwayTeam')):
+        df = df.copy()
+        for col in columns:
+            if col in df.columns: df[col] = self.resolve_series(df[col])
+        return df
+
+    def report(self, top=None):
+        # {'unresolved': {nome: células}, 'suggestions': {nome: equipa parecida}, 'overflow': células}
+        with self.lock:
+            unresolved, overflow = dict(self.unresolved.most_common(top)), self.overflow
+        suggestions = {name: self.suggest(name) for name in unresolved}
+        return {'unresolved': unresolved, 'suggestions': {k: v for k, v in suggestions.items() if v is not None},
+                'overflow': overflow}
+
+    def print_report(self, label='Equipas', top=15):
+        report = self.report(top)
+        print(f"   🏷️ {label}: {len(self.unresolved)} nomes sem correspondência")
+        for name, cells in report['unresolved'].items():
+            hint = report['suggestions'].get(name)
+            print(f"      ❓ {name} ({cells}x)" + (f" — parecido com {hint}? (acrescentar aos aliases)" if hint else ''))
+
+
+resolver = TeamResolver()
+
+
+def resolve_team(name):
+    return resolver.resolve(name)
@@ -0,0 +1,176 @@
+import json
+import threading
+import numpy as np
+
+# --- PREVISOR DE ÁRVORES EM NUMPY (SEM XGBOOST NO SITE) ---
+# Os boosters do bundle são exportados para arrays planos e contíguos, com todas as árvores
+# seguidas (ids de nó globais):
+#   feature / threshold      split de cada nó (vai para a esquerda se x < threshold, como o XGBoost)
+#   left / right             filhos; numa folha apontam para o próprio nó
+#   default_left             para onde vão os valores em falta (NaN)
+#   value                    valor da folha (0 nos nós internos)
+#   roots / tree_class       nó raiz e classe de cada árvore; base_margin por classe
+# A previsão desce todas as árvores ao mesmo tempo, nível a nível (depth passos de np.take),
+# sobre buffers reutilizados por thread: não há alocações na descida, nem wrappers do sklearn,
+# nem DataFrames. O site não importa o xgboost nem o scikit-learn.
+
+TREE_FORMAT = 1
+CHUNK_ROWS = 256  # linhas por passagem (tamanho máximo dos buffers)
+
+
+def _margin(score, objective):
+    # base_score do XGBoost -> margem (no multi:softprob já é a margem de cada classe)
+    if objective in ('binary:logistic', 'reg:logistic'):
+        return np.log(score / (1 - score))
+    if objective in ('count:poisson', 'reg:gamma', 'reg:tweedie'):
+        return np.log(score)
+    return score
+
+
+def export_trees(booster):
+    # Booster (ou XGBClassifier/XGBRegressor) -> {nome: array} (ver TreeEnsemble)
+    booster = booster.get_booster() if hasattr(booster, 'get_booster') else booster
+    learner = json.loads(booster.save_raw('json'))['learner']
+    objective = learner['objective']['name']
+    model = learner['gradient_booster']['model']
+    base = np.array(json.loads(learner['learner_model_param']['base_score']), dtype=np.float64).ravel()
+    n_classes = max(int(learner['learner_model_param']['num_class']), 1)
+
+    feature, threshold, left, right, default_left, value, roots, depths = [], [], [], [], [], [], [], []
+    offset = 0
+    for tree in model['trees']:
+        if any(tree['split_type']):
+            raise ValueError("Splits categóricos não são suportados")
+        lc, rc = np.array(tree['left_children']), np.array(tree['right_children'])
+        ids = np.arange(len(lc))
+        leaf = lc < 0
+        feature.append(np.where(leaf, 0, tree['split_indices']))
+        threshold.append(np.where(leaf, np.inf, tree['split_conditions']))
+        left.append(offset + np.where(leaf, ids, lc))
+        right.append(offset + np.where(leaf, ids, rc))
+        default_left.append(np.array(tree['default_left'], dtype=bool))
+        value.append(np.where(leaf, tree['split_conditions'], 0))
+        roots.append(offset)
+        # Profundidade: nº de passos até todas as folhas
+        depth, level = 0, [0]
+        while True:
+            level = [c for n in level if lc[n] >= 0 for c in (lc[n], rc[n])]
+            if not level: break
+            depth += 1
+        depths.append(depth)
+        offset += len(lc)
+
+    return {
+        'format': np.array(TREE_FORMAT), 'objective': np.array(objective), 'n_features': np.array(int(learner['learner_model_param']['num_feature'])),
+        'feature': np.concatenate(feature).astype(np.int32), 'threshold': np.concatenate(threshold).astype(np.float32),
+        'left': np.concatenate(left).astype(np.int32), 'right': np.concatenate(right).astype(np.int32),
+        'default_left': np.concatenate(default_left), 'value': np.concatenate(value).astype(np.float32),
+        'roots': np.array(roots, dtype=np.int32), 'tree_class': np.array(model['tree_info'], dtype=np.int32),
+        'base_margin': _margin(np.resize(base, n_classes), objective), 'depth': np.array(max(depths, default=0)),
+    }
+
+
+def save_trees(path, booster):
+    np.savez(path, **export_trees(booster))
+
+
+class TreeEnsemble:
+    def __init__(self, arrays):
+        if int(arrays['format']) != TREE_FORMAT:
+            raise ValueError(f"Formato de árvores não suportado: {int(arrays['format'])}")
+        self.objective = str(arrays['objective'])
+        self.n_features = int(arrays['n_features'])
+        self.feature = np.ascontiguousarray(arrays['feature'], dtype=np.int64)
+        self.threshold = np.ascontiguousarray(arrays['threshold'], dtype=np.float32)
+        self.left = np.ascontiguousarray(arrays['left'], dtype=np.int32)
+        self.right = np.ascontiguousarray(arrays['right'], dtype=np.int32)
+        self.default_left = np.ascontiguousarray(arrays['default_left'], dtype=bool)
+        self.value = np.ascontiguousarray(arrays['value'], dtype=np.float64)
+        self.roots, self.tree_class = arrays['roots'], arrays['tree_class']
+        self.base_margin = np.asarray(arrays['base_margin'], dtype=np.float64)
+        self.depth = int(arrays['depth'])
+        self.n_classes = len(self.base_margin)
+        # Soma das folhas por classe = produto por uma matriz árvore x classe (0/1)
+        self.class_matrix = np.zeros((len(self.roots), self.n_classes), dtype=np.float64)
+        self.class_matrix[np.arange(len(self.roots)), self.tree_class] = 1.0
+        self.local = threading.local()
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({k: data[k] for k in data.files})
+
+    @classmethod
+    def from_booster(cls, booster):
+        return cls(export_trees(booster))
+
+    def _workspace(self, n):
+        # Buffers da descida (por thread, crescem com o nº de linhas e são reutilizados)
+        ws = getattr(self.local, 'ws', None)
+        if ws is None or ws['n'] < n:
+            t = len(self.roots)
+            ws = {'n': n, 'x': np.empty((n, self.n_features), dtype=np.float32),
+                  'base': (np.arange(n, dtype=np.int64) * self.n_features)[:, None],
+                  'node': np.empty((n, t), dtype=np.int32), 'next': np.empty((n, t), dtype=np.int32),
+                  'idx': np.empty((n, t), dtype=np.int64), 'xv': np.empty((n, t), dtype=np.float32),
+                  'tv': np.empty((n, t), dtype=np.float32), 'go': np.empty((n, t), dtype=bool),
+                  'miss': np.empty((n, t), dtype=bool), 'dl': np.empty((n, t), dtype=bool),
+                  'lt': np.empty((n, t), dtype=np.int32), 'leaf': np.empty((n, t), dtype=np.float64)}
+            self.local.ws = ws
+        return {k: (v[:n] if isinstance(v, np.ndarray) else v) for k, v in ws.items()}
+
+    def predict_margin(self, X):
+        X = np.asarray(X)
+        if X.ndim == 1: X = X[None, :]
+        if len(X) <= CHUNK_ROWS:
+            return self._margin_chunk(X)
+        # Muitas linhas: por blocos, para os buffers ficarem pequenos (e na cache do CPU)
+        return np.concatenate([self._margin_chunk(X[i:i + CHUNK_ROWS]) for i in range(0, len(X), CHUNK_ROWS)])
+
+    def _margin_chunk(self, X):
+        ws = self._workspace(len(X))
+        x, node, nxt, idx, xv, tv, go, miss, dl, lt = (ws[k] for k in ('x', 'node', 'next', 'idx', 'xv', 'tv', 'go', 'miss', 'dl', 'lt'))
+        np.copyto(x, X, casting='unsafe')  # o XGBoost compara em float32
+        flat = x.reshape(-1)
+        node[:] = self.roots
+        for _ in range(self.depth):
+            np.take(self.feature, node, out=idx)
+            np.add(idx, ws['base'], out=idx)
+            np.take(flat, idx, out=xv)
+            np.take(self.threshold, node, out=tv)
+            np.less(xv, tv, out=go)
+            np.isnan(xv, out=miss)
+            np.take(self.default_left, node, out=dl)
+            np.copyto(go, dl, where=miss)         # em falta: direção por defeito
+            np.take(self.right, node, out=nxt)
+            np.take(self.left, node, out=lt)
+            np.copyto(nxt, lt, where=go)
+            node, nxt = nxt, node
+        return np.take(self.value, node, out=ws['leaf']) @ self.class_matrix + self.base_margin
+
+    def predict(self, X):
+        # Saída no espaço do objetivo (probabilidades / média), como o Booster.predict
+        margin = self.predict_margin(X)
+        if self.objective == 'multi:softprob':
+            e = np.exp(margin - margin.max(axis=1, keepdims=True))
+            return e / e.sum(axis=1, keepdims=True)
+        if self.objective in ('binary:logistic', 'reg:logistic'):
+            return 1.0 / (1.0 + np.exp(-margin[:, 0]))
+        if self.objective in ('count:poisson', 'reg:gamma', 'reg:tweedie'):
+            return np.exp(margin[:, 0])
+        return margin[:, 0] if self.n_classes == 1 else margin
+
+
+class TreeModel:
+    # Mesma interface que o XGBClassifier/XGBRegressor no site (predict_proba / predict)
+    def __init__(self, ensemble, kind):
+        self.ensemble, self.kind = ensemble, kind
+
+    def predict_proba(self, X):
+        p = self.ensemble.predict(X)
+        return p if p.ndim == 2 else np.column_stack([1 - p, p])
+
+    def predict(self, X):
+        if self.kind == 'classifier':
+            return self.predict_proba(X).argmax(axis=1)
+        return self.ensemble.predict(X)
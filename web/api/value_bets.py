@@ -0,0 +1,32 @@
+import numpy as np
+
+# --- APOSTAS DE VALOR (EV) ---
+# Regra do scanner do /api/predict, partilhada com o backtest (backtest.py): EV = prob x odd - 1
+# e o estado pelo EV. As funções aceitam escalares ou arrays (um valor por jogo / mercado).
+
+EV_STRONG = 0.05   # acima: 💎 MUITO VALOR!
+EV_VALUE = 0.0     # acima: ✅ VALOR
+EV_FAIR = -0.05    # acima: 😐 JUSTO, senão ❌ FRACO
+STATUS_LABELS = ("❌ FRACO", "😐 JUSTO", "✅ VALOR", "💎 MUITO VALOR!")
+
+
+def expected_value(prob, odd):
+    return np.asarray(prob) * np.asarray(odd) - 1
+
+
+def value_level(ev):
+    # 0 = fraco, 1 = justo, 2 = valor, 3 = muito valor
+    ev = np.asarray(ev)
+    return (ev > EV_FAIR).astype(np.int8) + (ev > EV_VALUE) + (ev > EV_STRONG)
+
+
+def value_status(ev):
+    return STATUS_LABELS[int(value_level(ev))]
+
+
+def kelly_fraction(prob, odd):
+    # Fração da banca pelo critério de Kelly (0 quando o EV não é positivo)
+    odd = np.asarray(odd, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = expected_value(prob, odd) / (odd - 1)
+    return np.where(np.isfinite(f), np.clip(f, 0.0, 1.0), 0.0)
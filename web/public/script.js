@@ -163,6 +163,7 @@ document.addEventListener('DOMContentLoaded', () => {
             home_team: homeInput.value, // Usa sempre o valor da caixa de texto
             away_team: awayInput.value,
             division: mData.division || 'E0',
+            fixture_id: mData.id || null,
             odd_h: parseFloat(inputH.value) || 0, 
             odd_d: parseFloat(inputD.value) || 0, 
             odd_a: parseFloat(inputA.value) || 0,